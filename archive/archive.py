@@ -1,10 +1,19 @@
-"""Script that selects data that is older than 24 hours, saves it as a .CSV, uploads it to an S3 bucket, then deletes it from the DB"""
+"""Script that selects data that is older than 24 hours, streams it as .CSV and partitioned Parquet files
+to an S3 bucket, then deletes it from the DB"""
+import io
 import os
 import csv
+import json
 import logging
-from datetime import datetime, timezone
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from functools import partial
+from time import monotonic
 
 import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
 import pyodbc
 
 
@@ -13,14 +22,100 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s"
 )
 
+FETCH_SIZE = 10_000
+
+# Archived columns as (name, SQL expression, Parquet type). The recording columns come first
+# in both export modes, so plant_id and recording_taken keep their positions for partitioning.
+RECORDING_COLUMNS = [
+    ("plant_id", "r.plant_id", pa.int16()),
+    ("botanist_id", "r.botanist_id", pa.int16()),
+    ("origin_location_id", "r.origin_location_id", pa.int64()),
+    ("last_watered", "r.last_watered", pa.timestamp("ms")),
+    ("image_id", "r.image_id", pa.int16()),
+    ("recording_taken", "r.recording_taken", pa.timestamp("ms")),
+    ("soil_moisture", "r.soil_moisture", pa.float64()),
+    ("temperature", "r.temperature", pa.float64()),
+]
+
+DIMENSION_COLUMNS = [
+    ("common_name", "p.common_name", pa.string()),
+    ("scientific_name", "p.scientific_name", pa.string()),
+    ("botanist_name", "b.botanist_name", pa.string()),
+    ("email", "b.email", pa.string()),
+    ("phone", "b.phone", pa.string()),
+    ("origin_city_name", "o.origin_city_name", pa.string()),
+    ("country_name", "c.country_name", pa.string()),
+    ("longitude", "o.longitude", pa.float64()),
+    ("latitude", "o.latitude", pa.float64()),
+    ("licence", "i.licence", pa.int64()),
+    ("licence_name", "i.licence_name", pa.string()),
+    ("licence_url", "i.licence_url", pa.string()),
+    ("thumbnail", "i.thumbnail", pa.string()),
+]
+
+DIMENSION_JOINS = """
+    JOIN beta.plant p ON p.plant_id = r.plant_id
+    JOIN beta.botanist b ON b.botanist_id = r.botanist_id
+    JOIN beta.origin_location o ON o.origin_location_id = r.origin_location_id
+    JOIN beta.country c ON c.country_id = o.country_id
+    LEFT JOIN beta.plant_image i ON i.image_id = r.image_id
+"""
+
+# Snapshots of the dimension tables written alongside every archive
+DIMENSION_TABLES = {
+    "plant": "SELECT plant_id, common_name, scientific_name FROM beta.plant;",
+    "botanist": "SELECT botanist_id, botanist_name, email, phone FROM beta.botanist;",
+    "origin_location": """
+        SELECT o.origin_location_id, o.origin_city_name, o.country_id, c.country_name,
+            o.longitude, o.latitude
+        FROM beta.origin_location o JOIN beta.country c ON c.country_id = o.country_id;
+    """,
+    "plant_image": "SELECT image_id, licence, licence_name, licence_url, thumbnail FROM beta.plant_image;",
+}
+
 
 def get_s3_details():
     """Retrieves S3 details from .ENV"""
     bucket = os.environ["S3_BUCKET"]
     prefix = os.getenv("S3_PREFIX", "archive/")
-    date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    s3_key = f"{prefix}past_data_{date_str}.csv"
-    return bucket, s3_key
+    date_str = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H%M%S")
+    return bucket, prefix, date_str
+
+
+def get_archive_formats():
+    """Returns the archive file formats to write, from ARCHIVE_FORMATS in .ENV"""
+    formats = os.getenv("ARCHIVE_FORMATS", "csv,parquet")
+    return {file_format.strip().lower() for file_format in formats.split(",")}
+
+
+def get_export_columns():
+    """Returns the archived columns for ARCHIVE_EXPORT_MODE in .ENV: the recording ids only,
+    or with the plant, botanist, origin and image details joined on when it is denormalised"""
+    if os.getenv("ARCHIVE_EXPORT_MODE", "ids").lower() == "denormalised":
+        return RECORDING_COLUMNS + DIMENSION_COLUMNS
+    return RECORDING_COLUMNS
+
+
+def get_parquet_s3_key(prefix, partition_path, run_str):
+    """Returns the S3 key of a Parquet file, under its Hive style partition directories"""
+    return f"{prefix}parquet/{partition_path}/past_data_{run_str}.parquet"
+
+
+def get_checkpoint_key():
+    """Returns the S3 key of the checkpoint for an unfinished deletion"""
+    prefix = os.getenv("S3_PREFIX", "archive/")
+    return f"{prefix}delete_checkpoint.json"
+
+
+def get_manifest_key():
+    """Returns the S3 key of the manifest listing every archived file"""
+    prefix = os.getenv("S3_PREFIX", "archive/")
+    return f"{prefix}manifest.json"
+
+
+def get_cutoff():
+    """Returns the time before which rows are archived: 24 hours ago, in UTC"""
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=24)
 
 
 def get_db_connection():
@@ -38,94 +133,542 @@ def get_db_connection():
     return pyodbc.connect(conn_str)
 
 
-def write_old_data_to_csv(conn, csv_path, columns):
-    """Produces CSV file containing selected rows"""
-    select_sql = """
-    SELECT
-        plant_id,
-        botanist_id,
-        origin_location_id,
-        last_watered,
-        image_id,
-        recording_taken,
-        soil_moisture,
-        temperature
-    FROM beta.recording
-    WHERE recording_taken < DATEADD(hour, -24, GETUTCDATE());
+def get_recording_id_range(conn, cutoff):
+    """Returns the lowest and highest recording_id of the rows older than the cutoff.
+    Both are None if there are no such rows."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT MIN(recording_id), MAX(recording_id)
+        FROM beta.recording
+        WHERE recording_taken < ?;
+        """,
+        (cutoff,),
+    )
+    min_id, max_id = cur.fetchone()
+    cur.close()
+    return min_id, max_id
+
+
+def iter_old_data(conn, cutoff, max_id, export_columns):
+    """Yields the export columns of the rows older than the cutoff, up to max_id,
+    in batches of FETCH_SIZE rows. Any dimension columns are joined on in the same query"""
+    joins = DIMENSION_JOINS if len(export_columns) > len(RECORDING_COLUMNS) else ""
+    select_sql = f"""
+    SELECT {", ".join(expression for _, expression, _ in export_columns)}
+    FROM beta.recording r {joins}
+    WHERE r.recording_taken < ? AND r.recording_id <= ?
+    ORDER BY r.recording_id;
     """
 
-    logging.info("Selecting rows older than 24 hour")
+    logging.info("Selecting rows older than %s", cutoff)
     cur = conn.cursor()
-    cur.execute(select_sql)
+    cur.execute(select_sql, (cutoff, max_id))
+
+    rows = cur.fetchmany(FETCH_SIZE)
+    while rows:
+        yield rows
+        rows = cur.fetchmany(FETCH_SIZE)
+
+    cur.close()
+
+
+def get_partition_path(row, partition_by_plant):
+    """Returns the Hive style partition directory of a row: its recording date,
+    then optionally its plant"""
+    partition_path = f"date={row[5]:%Y-%m-%d}"
+    if partition_by_plant:
+        partition_path += f"/plant_id={row[0]}"
+    return partition_path
+
+
+def get_parquet_schema(export_columns):
+    """Returns the Parquet schema of the export columns"""
+    return pa.schema([(name, parquet_type) for name, _, parquet_type in export_columns])
+
+
+def rows_to_table(rows, schema):
+    """Returns the rows as an Arrow table with the schema"""
+    columns = zip(*rows)
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
 
+
+def encode_csv_rows(rows):
+    """Returns the rows as UTF-8 encoded CSV lines"""
+    text = io.StringIO()
+    csv.writer(text).writerows(rows)
+    return text.getvalue().encode("utf-8")
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """Writable binary file that streams to an S3 object without touching the disk.
+    Writes are buffered in memory and each full buffer of part_size bytes is uploaded as a part
+    of a multipart upload on the executor, so uploading overlaps with producing the data.
+    At most max_pending_parts parts are in flight, which bounds the memory used.
+    An object that never fills a part is uploaded with a single PUT on close."""
+
+    def __init__(self, s3, bucket, key, executor, part_size, max_pending_parts=2):
+        super().__init__()
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.executor = executor
+        self.part_size = part_size
+        self.max_pending_parts = max_pending_parts
+        self.buffer = bytearray()
+        self.position = 0
+        self.upload_id = None
+        self.pending_parts = []
+        self.parts = []
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        self.buffer += data
+        self.position += len(data)
+
+        if len(self.buffer) >= self.part_size:
+            self.upload_part(bytes(self.buffer))
+            self.buffer = bytearray()
+
+        return len(data)
+
+    def upload_part(self, body):
+        """Starts uploading a part, first waiting for the oldest part if too many are in flight"""
+        if self.upload_id is None:
+            logging.info("Streaming to s3://%s/%s", self.bucket, self.key)
+            self.upload_id = self.s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key)["UploadId"]
+
+        if len(self.pending_parts) >= self.max_pending_parts:
+            self.finish_oldest_part()
+
+        part_number = len(self.parts) + len(self.pending_parts) + 1
+        future = self.executor.submit(
+            self.s3.upload_part, Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+            PartNumber=part_number, Body=body)
+        self.pending_parts.append((part_number, future))
+
+    def finish_oldest_part(self):
+        """Waits for the oldest part in flight to finish uploading"""
+        part_number, future = self.pending_parts.pop(0)
+        self.parts.append({"PartNumber": part_number, "ETag": future.result()["ETag"]})
+
+    def close(self):
+        """Uploads whatever is buffered and completes the object"""
+        if self.closed:
+            return
+
+        if self.upload_id is None:
+            logging.info("Uploading to s3://%s/%s", self.bucket, self.key)
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+        else:
+            if self.buffer:
+                self.upload_part(bytes(self.buffer))
+            while self.pending_parts:
+                self.finish_oldest_part()
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts})
+
+        self.buffer = bytearray()
+        super().close()
+
+    def abort(self):
+        """Discards the object, aborting the multipart upload if one was started"""
+        if self.closed:
+            return
+
+        if self.upload_id is not None:
+            for _, future in self.pending_parts:
+                future.cancel()
+            self.s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+        self.buffer = bytearray()
+        super().close()
+
+
+def flush_parquet_buffers(buffers, writers, files, open_file, get_parquet_key, schema):
+    """Writes each partition's buffered rows as a row group of that partition's Parquet object,
+    opening the object on its first write, then empties the buffers"""
+    for partition_path, rows in buffers.items():
+        if partition_path not in writers:
+            parquet_key = get_parquet_key(partition_path)
+            files[parquet_key] = open_file(parquet_key)
+            writers[partition_path] = pq.ParquetWriter(
+                files[parquet_key], schema,
+                compression=os.getenv("ARCHIVE_PARQUET_COMPRESSION", "zstd"),
+                write_statistics=True,
+            )
+        writers[partition_path].write_table(rows_to_table(rows, schema))
+    buffers.clear()
+
+
+def write_old_data(batches, export_columns, open_file, csv_key=None, get_parquet_key=None):
+    """Streams the batches of rows of the export columns to a CSV object and/or
+    partitioned Parquet objects in one pass.
+    open_file(key) returns a writable binary file for an S3 key, and get_parquet_key(partition_path)
+    returns the key of a partition's Parquet object.
+    Parquet rows are buffered per partition and flushed as row groups of up to
+    ARCHIVE_ROW_GROUP_SIZE rows in total, so memory stays bounded.
+    Every object is aborted if anything fails, so no partial archive is left behind.
+    Returns the row count, the keys of the objects written and the first and last dates
+    the rows were recorded on, or None if there were no rows."""
+    row_group_size = int(os.getenv("ARCHIVE_ROW_GROUP_SIZE", "100000"))
+    partition_by_plant = os.getenv("ARCHIVE_PARTITION_BY_PLANT", "false").lower() == "true"
+
+    schema = get_parquet_schema(export_columns)
+    files = {}
+    buffers = {}
+    writers = {}
+    buffered_count = 0
     row_count = 0
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(columns)
+    first_taken = last_taken = None
+
+    try:
+        if csv_key is not None:
+            files[csv_key] = open_file(csv_key)
+            files[csv_key].write(encode_csv_rows([schema.names]))
 
-        rows = cur.fetchmany(10_000)
-        while rows:
-            writer.writerows(rows)
+        for rows in batches:
             row_count += len(rows)
-            rows = cur.fetchmany(10_000)
+            batch_first = min(row[5] for row in rows)
+            batch_last = max(row[5] for row in rows)
+            first_taken = batch_first if first_taken is None else min(first_taken, batch_first)
+            last_taken = batch_last if last_taken is None else max(last_taken, batch_last)
 
-    cur.close()
-    return row_count
+            if csv_key is not None:
+                files[csv_key].write(encode_csv_rows(rows))
+
+            if get_parquet_key is not None:
+                for row in rows:
+                    buffers.setdefault(get_partition_path(row, partition_by_plant), []).append(row)
+                buffered_count += len(rows)
+
+                if buffered_count >= row_group_size:
+                    flush_parquet_buffers(buffers, writers, files, open_file, get_parquet_key,
+                                          schema)
+                    buffered_count = 0
 
+        if get_parquet_key is not None:
+            flush_parquet_buffers(buffers, writers, files, open_file, get_parquet_key, schema)
+
+        for writer in writers.values():
+            writer.close()
+        for file in files.values():
+            file.close()
+    except BaseException:
+        for file in files.values():
+            file.abort()
+        raise
 
-def upload_csv_to_s3(csv_path, bucket, s3_key):
-    """Upload created CSV files to the S3 bucket"""
-    logging.info("Uploading to s3://%s/%s", bucket, s3_key)
-    boto3.client("s3").upload_file(csv_path, bucket, s3_key)
     logging.info("Upload complete")
+    date_range = (first_taken.date(), last_taken.date()) if row_count else None
+    return row_count, list(files), date_range
+
+
+def write_dimension_tables(conn, open_file, archive_formats, prefix, run_str):
+    """Writes a snapshot of each dimension table as a small sidecar file per archive format,
+    once per archive, so the archived ids can be resolved without the database.
+    Returns the keys written"""
+    s3_keys = []
+    cur = conn.cursor()
 
+    for table_name, select_sql in DIMENSION_TABLES.items():
+        cur.execute(select_sql)
+        columns = [column[0] for column in cur.description]
+        rows = [tuple(row) for row in cur.fetchall()]
 
-def delete_old_data(conn):
-    """Deletes the selected data from the DB"""
+        for file_format in sorted(archive_formats):
+            s3_key = f"{prefix}dimensions/{table_name}_{run_str}.{file_format}"
+            file = open_file(s3_key)
+            try:
+                if file_format == "parquet":
+                    table = pa.table({column: [row[i] for row in rows]
+                                      for i, column in enumerate(columns)})
+                    pq.write_table(table, file, compression=os.getenv(
+                        "ARCHIVE_PARQUET_COMPRESSION", "zstd"))
+                else:
+                    file.write(encode_csv_rows([columns, *rows]))
+            except BaseException:
+                file.abort()
+                raise
+            file.close()
+            s3_keys.append(s3_key)
+
+    cur.close()
+    return s3_keys
+
+
+def is_recording_partitioned(conn):
+    """Returns True if beta.recording is partitioned by day, by the optional
+    partition_recording_by_day migration"""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COUNT(*)
+        FROM sys.indexes i JOIN sys.partition_schemes ps ON ps.data_space_id = i.data_space_id
+        WHERE i.object_id = OBJECT_ID('beta.recording') AND ps.name = 'ps_recording_day';
+        """,
+        (),
+    )
+    partitioned = bool(cur.fetchone()[0])
+    cur.close()
+    return partitioned
+
+
+def add_day_partitions(conn):
+    """Adds the day partitions of beta.recording up to ARCHIVE_PARTITION_DAYS_AHEAD days from now,
+    so new readings never land in the last partition"""
+    days_ahead = int(os.getenv("ARCHIVE_PARTITION_DAYS_AHEAD", "7"))
+    until = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=days_ahead)
+
+    cur = conn.cursor()
+    cur.execute("EXEC beta.add_recording_day_partitions @until = ?;", (until,))
+    conn.commit()
+    cur.close()
+    logging.info("Added day partitions up to %s", until)
+
+
+def truncate_archived_days(conn, checkpoint):
+    """Truncates the day partitions of beta.recording wholly before the cutoff, which hold only
+    archived rows, and returns the checkpoint moved on to the first archived row left to delete.
+    Nothing is truncated if a row newer than the archived ids has since landed in those days,
+    so only archived rows are ever removed."""
+    cutoff = datetime.fromisoformat(checkpoint["cutoff"])
+    cutoff_day = datetime.combine(cutoff.date(), datetime.min.time())
+
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COUNT(*) FROM beta.recording
+        WHERE recording_taken < ? AND recording_id > ?;
+        """,
+        (cutoff_day, checkpoint["max_id"]),
+    )
+
+    if cur.fetchone()[0]:
+        logging.info("Unarchived rows found before %s, deleting instead of truncating", cutoff_day)
+        cur.close()
+        return checkpoint
+
+    cur.execute("EXEC beta.truncate_recording_days_before @cutoff = ?;", (cutoff,))
+    conn.commit()
+    logging.info("Truncated the day partitions before %s", cutoff)
+
+    cur.execute(
+        """
+        SELECT MIN(recording_id) FROM beta.recording
+        WHERE recording_taken < ? AND recording_id >= ? AND recording_id <= ?;
+        """,
+        (cutoff, checkpoint["next_id"], checkpoint["max_id"]),
+    )
+    next_id = cur.fetchone()[0]
+    cur.close()
+
+    return {**checkpoint, "next_id": checkpoint["max_id"] + 1 if next_id is None else next_id}
+
+
+def delete_old_data(conn, checkpoint, batch_size, deadline):
+    """Deletes the archived rows described by the checkpoint in batches of recording_id ranges,
+    committing after each batch. Stops once the deadline (a monotonic time) has passed.
+    Returns the checkpoint to resume from, or None once every archived row is deleted."""
     delete_sql = """
-    DELETE FROM recording
-    WHERE recording_taken < DATEADD(hour, -24, GETUTCDATE());
+    DELETE FROM beta.recording
+    WHERE recording_id >= ? AND recording_id < ? AND recording_taken < ?;
     """
 
+    cutoff = datetime.fromisoformat(checkpoint["cutoff"])
+    next_id = checkpoint["next_id"]
+    deleted_count = 0
+
     logging.info("Deleting archived rows from SQL server")
-    conn.cursor().execute(delete_sql)
-    conn.commit()
-    logging.info("Rows have been deleted.")
+    cur = conn.cursor()
+
+    while next_id <= checkpoint["max_id"]:
+        if monotonic() >= deadline:
+            logging.info("Time budget used up after deleting %d rows", deleted_count)
+            cur.close()
+            return {**checkpoint, "next_id": next_id}
+
+        end_id = min(next_id + batch_size, checkpoint["max_id"] + 1)
+        cur.execute(delete_sql, (next_id, end_id, cutoff))
+        deleted_count += cur.rowcount
+        conn.commit()
+        next_id = end_id
+
+    cur.close()
+    logging.info("%d rows have been deleted.", deleted_count)
+    return None
+
+
+def get_checkpoint(s3, bucket):
+    """Returns the checkpoint of an unfinished deletion from S3, or None if there is none"""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=get_checkpoint_key())
+    except s3.exceptions.NoSuchKey:
+        return None
+    return json.loads(response["Body"].read())
+
+
+def save_checkpoint(s3, bucket, checkpoint):
+    """Saves the checkpoint of an unfinished deletion to S3, or removes it if None"""
+    if checkpoint is None:
+        s3.delete_object(Bucket=bucket, Key=get_checkpoint_key())
+    else:
+        s3.put_object(Bucket=bucket, Key=get_checkpoint_key(),
+                      Body=json.dumps(checkpoint).encode("utf-8"))
+
+
+def get_manifest_entry(key, run_str, date_range=None):
+    """Returns the manifest entry of an archived file: its key, the run that wrote it,
+    the first and last dates of its rows, and whether it holds recordings or a dimension
+    table snapshot.
+    The dates are taken from the file's date partition if it has one, then from the date range
+    of the rows exported, if known. Dimension snapshots are dated by their run, and the rows of
+    any other file were recorded at least a day before its run, from an unknown first date."""
+    partition_date = re.search(r"date=(\d{4}-\d{2}-\d{2})", key)
+    kind = "dimension" if "/dimensions/" in key else "recordings"
+
+    if partition_date:
+        date_from = date_to = partition_date.group(1)
+    elif kind == "dimension":
+        date_from = date_to = run_str[:10]
+    elif date_range is not None:
+        date_from, date_to = (day.isoformat() for day in date_range)
+    else:
+        date_from = None
+        date_to = (datetime.fromisoformat(run_str[:10]) - timedelta(days=1)).date().isoformat()
+
+    return {
+        "key": key,
+        "run": run_str,
+        "date_from": date_from,
+        "date_to": date_to,
+        "kind": kind
+    }
+
+
+def list_archived_files(s3, bucket, prefix):
+    """Returns the manifest entries of the CSV and Parquet files already under the prefix,
+    listing them a page of up to 1000 keys at a time"""
+    entries = []
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+        for s3_object in page.get("Contents", []):
+            if not s3_object["Key"].endswith((".csv", ".parquet")):
+                continue
+            run = re.search(r"_(\d{4}-\d{2}-\d{2}T\d{6})\.", s3_object["Key"])
+            entries.append(get_manifest_entry(
+                s3_object["Key"],
+                run.group(1) if run else s3_object["LastModified"].strftime("%Y-%m-%dT%H%M%S")))
+    return entries
+
+
+def update_manifest(s3, bucket, prefix, s3_keys, run_str, date_range=None):
+    """Adds the archived files to the manifest, so the archive can be listed by reading one object,
+    with date_range as the first and last dates of the rows archived.
+    If there is no manifest yet, it is started from a listing of the files already archived"""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=get_manifest_key())
+        entries = json.loads(response["Body"].read())["objects"]
+    except s3.exceptions.NoSuchKey:
+        entries = [entry for entry in list_archived_files(s3, bucket, prefix)
+                   if entry["key"] not in s3_keys]
+
+    entries += [get_manifest_entry(key, run_str, date_range) for key in s3_keys]
+    manifest = {"updated": run_str, "objects": entries}
+
+    s3.put_object(Bucket=bucket, Key=get_manifest_key(), ContentType="application/json",
+                  Body=json.dumps(manifest).encode("utf-8"))
+
+
+def resume_deletion(conn, s3, bucket, checkpoint, deadline):
+    """Deletes archived rows from the checkpoint onwards, saving where it got to.
+    Returns True once every archived row is deleted."""
+    batch_size = int(os.getenv("ARCHIVE_DELETE_BATCH_SIZE", "5000"))
+
+    save_checkpoint(s3, bucket, checkpoint)
+    checkpoint = delete_old_data(conn, checkpoint, batch_size, deadline)
+    save_checkpoint(s3, bucket, checkpoint)
+
+    return checkpoint is None
 
 
 def handler(event=None, context=None):
-    """Archives database data older than 24 hours to S3 and removes them from the database."""
-    csv_path = "/tmp/past_data_archive.csv"
-
-    columns = [
-        "plant_id",
-        "botanist_id",
-        "origin_location_id",
-        "last_watered",
-        "image_id",
-        "recording_taken",
-        "soil_moisture",
-        "temperature",
-    ]
-
-    bucket, s3_key = get_s3_details()
+    """Archives database data older than 24 hours to S3 and removes them from the database.
+    A deletion that ran out of time is finished before anything new is archived.
+    If beta.recording is partitioned by day, the partitions ahead are added first, and
+    whole archived days are truncated rather than deleted."""
+    deadline = monotonic() + float(os.getenv("ARCHIVE_TIME_BUDGET_SECONDS", "240"))
+    archive_formats = get_archive_formats()
+    export_columns = get_export_columns()
+    part_size = int(os.getenv("ARCHIVE_PART_SIZE_MB", "8")) * 1024 * 1024
+
+    bucket, prefix, date_str = get_s3_details()
+    s3 = boto3.client("s3")
     conn = get_db_connection()
 
     try:
-        row_count = write_old_data_to_csv(conn, csv_path, columns)
+        partitioned = is_recording_partitioned(conn)
+
+        if partitioned:
+            add_day_partitions(conn)
+
+        checkpoint = get_checkpoint(s3, bucket)
+
+        if checkpoint is not None:
+            logging.info("Resuming unfinished deletion from recording %d", checkpoint["next_id"])
 
-        if row_count == 0:
+            if not resume_deletion(conn, s3, bucket, checkpoint, deadline):
+                return {"Message": "deletion still in progress"}
+
+        cutoff = get_cutoff()
+        min_id, max_id = get_recording_id_range(conn, cutoff)
+
+        if max_id is None:
             logging.info("No more rows")
             return {"archived_rows": 0}
 
-        logging.info("Archived %d rows to CSV", row_count)
+        csv_key = f"{prefix}past_data_{date_str}.csv" if "csv" in archive_formats else None
+        get_parquet_key = (partial(get_parquet_s3_key, prefix, run_str=date_str)
+                           if "parquet" in archive_formats else None)
+
+        with ThreadPoolExecutor(int(os.getenv("ARCHIVE_UPLOAD_THREADS", "4"))) as executor:
+            open_file = partial(S3MultipartWriter, s3, bucket,
+                                executor=executor, part_size=part_size)
+            row_count, s3_keys, date_range = write_old_data(
+                iter_old_data(conn, cutoff, max_id, export_columns), export_columns,
+                open_file, csv_key, get_parquet_key)
+            s3_keys += write_dimension_tables(conn, open_file, archive_formats, prefix, date_str)
+
+        update_manifest(s3, bucket, prefix, s3_keys, date_str, date_range)
+
+        logging.info("Archived %d rows as %s", row_count, ", ".join(sorted(archive_formats)))
+
+        checkpoint = {
+            "cutoff": cutoff.isoformat(),
+            "max_id": max_id,
+            "next_id": min_id
+        }
+
+        if partitioned:
+            checkpoint = truncate_archived_days(conn, checkpoint)
 
-        upload_csv_to_s3(csv_path, bucket, s3_key)
-        delete_old_data(conn)
+        deleted = resume_deletion(conn, s3, bucket, checkpoint, deadline)
 
         return {
             "Message": f"archived {row_count} rows",
-            "s3_key": s3_key
+            "s3_keys": s3_keys,
+            "deletion_finished": deleted
         }
 
     finally:
@@ -0,0 +1,29 @@
+"""Test fixtures for the archive."""
+
+# pylint:skip-file
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "eu-west-2")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="archive-bucket",
+                             CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+        yield client
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(2) as pool:
+        yield pool
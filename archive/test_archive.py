@@ -0,0 +1,350 @@
+"""Testing archive.py"""
+
+# pylint:skip-file
+
+import io
+from datetime import date, datetime, timedelta
+from functools import partial
+
+import pyarrow.parquet as pq
+import pytest
+
+import archive
+from archive import (S3MultipartWriter, write_old_data, get_parquet_s3_key,
+                     get_export_columns, update_manifest, delete_old_data, resume_deletion,
+                     get_checkpoint, save_checkpoint, write_dimension_tables, RECORDING_COLUMNS)
+import json
+
+BUCKET = "archive-bucket"
+PART_SIZE = 5 * 1024 * 1024
+
+
+def read_object(s3, key) -> bytes:
+    return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def make_batches(batch_count, batch_size):
+    start = datetime(2026, 1, 27, 20)
+    return [
+        [(1 + i % 2, 1, 1, start, 1, start + timedelta(minutes=10 * (b * batch_size + i)), 50.0, 10.0)
+         for i in range(batch_size)]
+        for b in range(batch_count)
+    ]
+
+
+def test_multipart_writer_small_object(s3, executor):
+    writer = S3MultipartWriter(s3, BUCKET, "small.csv", executor, PART_SIZE)
+    writer.write(b"a,b\n")
+    writer.write(b"1,2\n")
+    writer.close()
+
+    assert writer.upload_id is None
+    assert read_object(s3, "small.csv") == b"a,b\n1,2\n"
+
+
+def test_multipart_writer_uploads_parts(s3, executor):
+    chunk = bytes(range(256)) * 4096
+    writer = S3MultipartWriter(s3, BUCKET, "large.csv", executor, PART_SIZE)
+
+    for _ in range(11):
+        writer.write(chunk)
+        assert len(writer.buffer) < PART_SIZE
+        assert len(writer.pending_parts) <= writer.max_pending_parts
+    writer.close()
+
+    assert [part["PartNumber"] for part in writer.parts] == [1, 2, 3]
+    assert read_object(s3, "large.csv") == chunk * 11
+
+
+def test_multipart_writer_abort(s3, executor):
+    writer = S3MultipartWriter(s3, BUCKET, "aborted.csv", executor, PART_SIZE)
+    writer.write(b"x" * PART_SIZE)
+    writer.abort()
+
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET)
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", []) == []
+
+
+def test_write_old_data_streams_csv_and_parquet(s3, executor, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_ROW_GROUP_SIZE", "50")
+    open_file = partial(S3MultipartWriter, s3, BUCKET, executor=executor, part_size=PART_SIZE)
+    get_parquet_key = partial(get_parquet_s3_key, "archive/", run_str="run")
+
+    row_count, keys, date_range = write_old_data(
+        iter(make_batches(4, 30)), RECORDING_COLUMNS, open_file, "archive/data.csv", get_parquet_key)
+
+    assert row_count == 120
+    assert date_range == (date(2026, 1, 27), date(2026, 1, 28))
+    assert keys == ["archive/data.csv",
+                    "archive/parquet/date=2026-01-27/past_data_run.parquet",
+                    "archive/parquet/date=2026-01-28/past_data_run.parquet"]
+
+    assert read_object(s3, "archive/data.csv").decode().count("\n") == 121
+
+    tables = [pq.ParquetFile(io.BytesIO(read_object(s3, key))) for key in keys[1:]]
+    assert sum(table.metadata.num_rows for table in tables) == 120
+    assert tables[1].metadata.num_row_groups > 1
+    assert tables[1].metadata.row_group(0).column(5).statistics.has_min_max
+
+
+def test_write_old_data_parquet_keeps_full_precision(s3, executor):
+    open_file = partial(S3MultipartWriter, s3, BUCKET, executor=executor, part_size=PART_SIZE)
+    get_parquet_key = partial(get_parquet_s3_key, "archive/", run_str="run")
+    row = make_batches(1, 1)[0][0][:6] + (94.9, 15.48521577170627)
+
+    _, keys, _ = write_old_data(iter([[row]]), RECORDING_COLUMNS, open_file, "archive/data.csv",
+                             get_parquet_key)
+
+    table = pq.read_table(io.BytesIO(read_object(s3, keys[1])))
+    assert table.column("soil_moisture")[0].as_py() == row[6]
+    assert table.column("temperature")[0].as_py() == row[7]
+    assert read_object(s3, keys[0]).decode().splitlines()[1].endswith("94.9,15.48521577170627")
+
+
+def test_write_old_data_aborts_on_failure(s3, executor):
+    open_file = partial(S3MultipartWriter, s3, BUCKET, executor=executor, part_size=PART_SIZE)
+
+    def failing_batches():
+        yield make_batches(1, 10)[0]
+        raise RuntimeError("connection lost")
+
+    with pytest.raises(RuntimeError):
+        write_old_data(failing_batches(), RECORDING_COLUMNS, open_file, "archive/data.csv")
+
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET)
+
+
+def test_denormalised_export_keeps_recording_columns_first(monkeypatch):
+    monkeypatch.setenv("ARCHIVE_EXPORT_MODE", "denormalised")
+    columns = get_export_columns()
+
+    assert columns[:len(RECORDING_COLUMNS)] == RECORDING_COLUMNS
+    assert "common_name" in [name for name, _, _ in columns]
+
+
+def test_write_old_data_denormalised_csv_header(s3, executor, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_EXPORT_MODE", "denormalised")
+    columns = get_export_columns()
+    open_file = partial(S3MultipartWriter, s3, BUCKET, executor=executor, part_size=PART_SIZE)
+    row = make_batches(1, 1)[0][0] + ("Bird of paradise", None, "Anna Davis", "anna@lnhm.co.uk",
+                                      "0123", "South Tina", "Nauru", -152.7, -60.9,
+                                      451, "Universal", "license.com", "thumbnail.com")
+
+    write_old_data(iter([[row]]), columns, open_file, "archive/data.csv")
+
+    header, line = read_object(s3, "archive/data.csv").decode().splitlines()
+    assert header.split(",") == [name for name, _, _ in columns]
+    assert "Bird of paradise" in line
+
+
+def test_update_manifest_starts_from_listing_then_appends(s3):
+    s3.put_object(Bucket=BUCKET, Key="archive/past_data_2026-01-26T000000.csv", Body=b"")
+    s3.put_object(Bucket=BUCKET, Key="archive/delete_checkpoint.json", Body=b"{}")
+
+    update_manifest(s3, BUCKET, "archive/",
+                    ["archive/parquet/date=2026-01-27/past_data_2026-01-28T000000.parquet",
+                     "archive/dimensions/plant_2026-01-28T000000.csv"],
+                    "2026-01-28T000000", (date(2026, 1, 27), date(2026, 1, 27)))
+    update_manifest(s3, BUCKET, "archive/", ["archive/past_data_2026-01-29T000000.csv"],
+                    "2026-01-29T000000", (date(2026, 1, 20), date(2026, 1, 28)))
+
+    manifest = json.loads(read_object(s3, "archive/manifest.json"))
+
+    assert manifest["updated"] == "2026-01-29T000000"
+    assert [(entry["key"], entry["date_from"], entry["date_to"], entry["kind"])
+            for entry in manifest["objects"]] == [
+        ("archive/past_data_2026-01-26T000000.csv", None, "2026-01-25", "recordings"),
+        ("archive/parquet/date=2026-01-27/past_data_2026-01-28T000000.parquet", "2026-01-27",
+         "2026-01-27", "recordings"),
+        ("archive/dimensions/plant_2026-01-28T000000.csv", "2026-01-28", "2026-01-28",
+         "dimension"),
+        ("archive/past_data_2026-01-29T000000.csv", "2026-01-20", "2026-01-28", "recordings"),
+    ]
+
+
+class FakeDeleteCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, query, params):
+        self.connection.executed.append((" ".join(query.split()), params))
+        if query.lstrip().startswith("DELETE"):
+            self.rowcount = params[1] - params[0]
+
+    def fetchone(self):
+        query = self.connection.executed[-1][0]
+        for query_start, result in self.connection.results.items():
+            if query.startswith(query_start):
+                return result
+        return (None, None)
+
+    def close(self):
+        pass
+
+
+class FakeDeleteConnection:
+    def __init__(self, results=None):
+        self.executed = []
+        self.commits = 0
+        self.results = results or {}
+
+    def cursor(self):
+        return FakeDeleteCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        pass
+
+    def deleted_ranges(self):
+        return [params[:2] for query, params in self.executed if query.startswith("DELETE")]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A monotonic clock that moves on a second every time it is read."""
+    now = [0.0]
+
+    def fake_monotonic():
+        now[0] += 1
+        return now[0]
+
+    monkeypatch.setattr(archive, "monotonic", fake_monotonic)
+    return now
+
+
+def make_checkpoint(next_id, max_id):
+    return {"cutoff": "2026-01-27T12:00:00", "max_id": max_id, "next_id": next_id}
+
+
+def test_delete_old_data_batch_boundaries(clock):
+    conn = FakeDeleteConnection()
+
+    assert delete_old_data(conn, make_checkpoint(1, 10), 4, deadline=1000) is None
+    assert conn.deleted_ranges() == [(1, 5), (5, 9), (9, 11)]
+    assert conn.commits == 3
+    assert all(params[2] == datetime(2026, 1, 27, 12) for _, params in conn.executed)
+
+
+def test_delete_old_data_stops_at_deadline(clock):
+    conn = FakeDeleteConnection()
+
+    checkpoint = delete_old_data(conn, make_checkpoint(1, 10), 4, deadline=2.5)
+
+    assert checkpoint == make_checkpoint(9, 10)
+    assert conn.deleted_ranges() == [(1, 5), (5, 9)]
+
+
+def test_resume_deletion_saves_checkpoint_at_deadline(s3, clock, monkeypatch):
+    conn = FakeDeleteConnection()
+    monkeypatch.setenv("ARCHIVE_DELETE_BATCH_SIZE", "4")
+
+    assert not resume_deletion(conn, s3, BUCKET, make_checkpoint(1, 10), deadline=2.5)
+    assert get_checkpoint(s3, BUCKET) == make_checkpoint(9, 10)
+
+
+def test_resume_deletion_clears_checkpoint_when_done(s3, clock):
+    conn = FakeDeleteConnection()
+    save_checkpoint(s3, BUCKET, make_checkpoint(9, 10))
+
+    assert resume_deletion(conn, s3, BUCKET, make_checkpoint(9, 10), deadline=1000)
+    assert get_checkpoint(s3, BUCKET) is None
+
+
+def test_handler_resumes_saved_checkpoint(s3, clock, monkeypatch):
+    conn = FakeDeleteConnection()
+    monkeypatch.setenv("S3_BUCKET", BUCKET)
+    monkeypatch.setenv("ARCHIVE_DELETE_BATCH_SIZE", "4")
+    monkeypatch.setattr(archive, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(archive.boto3, "client", lambda service: s3)
+    save_checkpoint(s3, BUCKET, make_checkpoint(5, 10))
+
+    assert archive.handler() == {"archived_rows": 0}
+    assert conn.deleted_ranges() == [(5, 9), (9, 11)]
+    assert get_checkpoint(s3, BUCKET) is None
+
+
+def test_handler_stops_while_deletion_unfinished(s3, clock, monkeypatch):
+    conn = FakeDeleteConnection()
+    monkeypatch.setenv("S3_BUCKET", BUCKET)
+    monkeypatch.setenv("ARCHIVE_TIME_BUDGET_SECONDS", "0")
+    monkeypatch.setattr(archive, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(archive.boto3, "client", lambda service: s3)
+    save_checkpoint(s3, BUCKET, make_checkpoint(5, 10))
+
+    assert archive.handler() == {"Message": "deletion still in progress"}
+    assert conn.deleted_ranges() == []
+    assert get_checkpoint(s3, BUCKET) == make_checkpoint(5, 10)
+
+
+def test_truncate_archived_days_moves_checkpoint_past_truncated_rows():
+    conn = FakeDeleteConnection({"SELECT COUNT(*)": (0,), "SELECT MIN(recording_id)": (7,)})
+
+    checkpoint = archive.truncate_archived_days(conn, make_checkpoint(1, 10))
+
+    assert checkpoint == make_checkpoint(7, 10)
+    assert conn.executed[0][1] == (datetime(2026, 1, 27), 10)
+    assert conn.executed[1] == ("EXEC beta.truncate_recording_days_before @cutoff = ?;",
+                                (datetime(2026, 1, 27, 12),))
+
+
+def test_truncate_archived_days_deletes_when_unarchived_rows_in_old_days():
+    conn = FakeDeleteConnection({"SELECT COUNT(*)": (1,)})
+
+    assert archive.truncate_archived_days(conn, make_checkpoint(1, 10)) == make_checkpoint(1, 10)
+    assert not any("truncate" in query for query, _ in conn.executed)
+
+
+def test_handler_adds_partitions_and_truncates_when_partitioned(s3, clock, monkeypatch):
+    conn = FakeDeleteConnection({
+        "SELECT COUNT(*) FROM sys.indexes": (1,),
+        "SELECT COUNT(*) FROM beta.recording": (0,),
+        "SELECT MIN(recording_id), MAX(recording_id)": (1, 10),
+        "SELECT MIN(recording_id)": (None,),
+    })
+    monkeypatch.setenv("S3_BUCKET", BUCKET)
+    monkeypatch.setenv("ARCHIVE_FORMATS", "csv")
+    monkeypatch.setattr(archive, "get_db_connection", lambda: conn)
+    monkeypatch.setattr(archive.boto3, "client", lambda service: s3)
+    monkeypatch.setattr(archive, "iter_old_data", lambda *args: iter(make_batches(1, 10)))
+    monkeypatch.setattr(archive, "write_dimension_tables", lambda *args: [])
+
+    result = archive.handler()
+
+    assert result["deletion_finished"]
+    assert conn.executed[1][0] == "EXEC beta.add_recording_day_partitions @until = ?;"
+    assert any(query.startswith("EXEC beta.truncate") for query, _ in conn.executed)
+    assert conn.deleted_ranges() == []
+
+
+class FakeDimensionCursor:
+    description = [("plant_id",), ("common_name",)]
+
+    def execute(self, query):
+        pass
+
+    def fetchall(self):
+        return [(1, "Cactus")]
+
+    def close(self):
+        pass
+
+
+class FakeDimensionConnection:
+    def cursor(self):
+        return FakeDimensionCursor()
+
+
+def test_write_dimension_tables_compression(s3, executor, monkeypatch):
+    monkeypatch.setenv("ARCHIVE_PARQUET_COMPRESSION", "snappy")
+    open_file = partial(S3MultipartWriter, s3, BUCKET, executor=executor, part_size=PART_SIZE)
+
+    keys = write_dimension_tables(FakeDimensionConnection(), open_file, {"parquet"}, "archive/",
+                                  "2026-01-28T000000")
+
+    parquet_file = pq.ParquetFile(io.BytesIO(read_object(s3, keys[0])))
+
+    assert keys[0] == "archive/dimensions/plant_2026-01-28T000000.parquet"
+    assert parquet_file.metadata.row_group(0).column(0).compression == "SNAPPY"
@@ -0,0 +1,85 @@
+"""This script reduces a plant's recordings to what a chart needs: rollups over fixed intervals,
+or a downsample of the raw readings that keeps their shape."""
+
+import numpy as np
+import pandas as pd
+
+ROLLUP_FREQUENCIES = {
+    "1 minute": "1min",
+    "5 minutes": "5min",
+    "1 hour": "1h"
+}
+
+
+def rollup(recordings: pd.DataFrame, frequency: str, columns: list[str]) -> pd.DataFrame:
+    """Returns the min, mean and max of each column per plant per interval of the frequency,
+    with one row per plant and interval and columns such as temperature_mean."""
+
+    intervals = recordings["recording_taken"].dt.floor(frequency).rename("recording_taken")
+
+    summary = recordings.groupby(["plant_id", intervals])[columns].agg(["min", "mean", "max"])
+    summary.columns = [f"{column}_{statistic}" for column, statistic in summary.columns]
+
+    return summary.reset_index()
+
+
+def add_rollup_statistics(rollups: pd.DataFrame, columns: list[str]) -> pd.DataFrame:
+    """Returns the rollups loaded from the database with the mean and standard deviation of each
+    column, worked out from its count, sum and sum of squares."""
+
+    statistics = {}
+
+    for column in columns:
+        count = rollups[f"{column}_count"].where(rollups[f"{column}_count"] > 0)
+        mean = rollups[f"{column}_sum"] / count
+        variance = (rollups[f"{column}_sum_sq"] - count * mean ** 2) / (count - 1).where(count > 1)
+
+        statistics[f"{column}_mean"] = mean
+        statistics[f"{column}_std"] = np.sqrt(variance.clip(lower=0))
+
+    return rollups.assign(**statistics).rename(columns={"period_start": "recording_taken"})
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Returns the indices of the points to keep to draw the series in threshold points,
+    using Largest-Triangle-Three-Buckets. The first and last points are always kept, and from
+    each bucket between them the point making the largest triangle with its neighbours."""
+
+    point_count = len(x)
+
+    if threshold >= point_count or threshold < 3:
+        return np.arange(point_count)
+
+    bucket_size = (point_count - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = point_count - 1
+    previous = 0
+
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        next_end = min(int((bucket + 2) * bucket_size) + 1, point_count)
+
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        areas = np.abs((x[previous] - next_x) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (next_y - y[previous]))
+
+        previous = start + int(areas.argmax())
+        indices[bucket + 1] = previous
+
+    return indices
+
+
+def downsample(plant_recordings: pd.DataFrame, column: str, max_points: int) -> pd.DataFrame:
+    """Returns at most max_points of the plant's recordings of the column, in time order,
+    chosen so the chart keeps the peaks and troughs of the full series."""
+
+    series = plant_recordings.dropna(subset=[column]).sort_values("recording_taken")
+
+    x = series["recording_taken"].to_numpy().astype("datetime64[ns]").astype(np.float64)
+    y = series[column].to_numpy(dtype=np.float64)
+
+    return series.iloc[lttb_indices(x, y, max_points)]
@@ -0,0 +1,143 @@
+"""This script keeps each plant's current readings ranked, and raises alerts for plants out of range."""
+
+import heapq
+from operator import itemgetter
+from typing import NamedTuple
+
+import pandas as pd
+
+DEFAULT_THRESHOLDS = {
+    "temperature": ("10", "30", "1"),
+    "soil_moisture": ("20", "", "2")
+}
+
+
+class Threshold:
+    """Range a plant's reading should stay within.
+
+    A plant is alerted once its reading goes past low or high, and stays alerted until the reading
+    is back inside the range by more than the hysteresis, so a reading hovering at the limit does
+    not raise and clear the alert on every refresh. Either limit may be None."""
+
+    __slots__ = ("low", "high", "hysteresis")
+
+    def __init__(self, low: float | None = None, high: float | None = None,
+                 hysteresis: float = 0):
+        """Initialises the threshold."""
+        self.low = low
+        self.high = high
+        self.hysteresis = hysteresis
+
+    def check(self, value: float, current_alert: str | None) -> str | None:
+        """Returns "high" or "low" if a plant with the reading and current alert
+        should be alerted, or None if not."""
+
+        if self.high is not None:
+            if value > self.high:
+                return "high"
+            if current_alert == "high" and value > self.high - self.hysteresis:
+                return "high"
+
+        if self.low is not None:
+            if value < self.low:
+                return "low"
+            if current_alert == "low" and value < self.low + self.hysteresis:
+                return "low"
+
+        return None
+
+
+def get_alert_thresholds(config) -> dict[str, Threshold]:
+    """Returns the threshold of each reading from ALERT_<COLUMN>_LOW, _HIGH and _HYSTERESIS,
+    where an empty limit is not checked."""
+
+    thresholds = {}
+
+    for column, (low, high, hysteresis) in DEFAULT_THRESHOLDS.items():
+        prefix = f"ALERT_{column.upper()}"
+        low = config.get(f"{prefix}_LOW", low)
+        high = config.get(f"{prefix}_HIGH", high)
+
+        thresholds[column] = Threshold(
+            low=float(low) if low else None,
+            high=float(high) if high else None,
+            hysteresis=float(config.get(f"{prefix}_HYSTERESIS", hysteresis))
+        )
+
+    return thresholds
+
+
+class AlertSnapshot(NamedTuple):
+    """The extremes and alerts at one refresh, which sessions must not modify."""
+
+    extremes: dict[tuple[str, bool], pd.DataFrame]
+    active: pd.DataFrame
+
+
+class AlertEngine:
+    """Current reading and alert state of each plant, per column.
+
+    It is updated from each plant's newest reading only, so a refresh costs as much as the plants
+    that sent readings, and the extremes are picked from one reading per plant with a heap of
+    size k, rather than from every recording in the window."""
+
+    def __init__(self, thresholds: dict[str, Threshold]):
+        """Initialises the engine with no readings."""
+
+        self.thresholds = thresholds
+        self.readings = {column: {} for column in thresholds}
+        self.alerts = {column: {} for column in thresholds}
+
+    def update(self, latest_rows: list[dict]) -> None:
+        """Replaces the readings of the plants in the rows and re-checks their alerts."""
+
+        for row in latest_rows:
+            for column, threshold in self.thresholds.items():
+                value = row.get(column)
+
+                if value is None or pd.isna(value):
+                    continue
+
+                self.readings[column][row["common_name"]] = float(value)
+                alert = threshold.check(value, self.alerts[column].get(row["common_name"]))
+
+                if alert is None:
+                    self.alerts[column].pop(row["common_name"], None)
+                else:
+                    self.alerts[column][row["common_name"]] = alert
+
+    def remove(self, common_names: list[str]) -> None:
+        """Drops the readings and alerts of the plants, such as those that stopped reporting."""
+
+        for column in self.thresholds:
+            for common_name in common_names:
+                self.readings[column].pop(common_name, None)
+                self.alerts[column].pop(common_name, None)
+
+    def extremes(self, column: str, k: int, largest: bool = True) -> pd.DataFrame:
+        """Returns the k plants with the highest, or lowest, current reading of the column."""
+
+        select = heapq.nlargest if largest else heapq.nsmallest
+        plants = select(k, self.readings[column].items(), key=itemgetter(1))
+
+        return pd.DataFrame(plants, columns=["common_name", column])
+
+    def active_alerts(self) -> pd.DataFrame:
+        """Returns a row per plant and column in alert, with its reading and whether it is
+        too high or too low."""
+
+        return pd.DataFrame(
+            [(common_name, column, alert, self.readings[column][common_name])
+             for column, alerts in self.alerts.items()
+             for common_name, alert in sorted(alerts.items())],
+            columns=["common_name", "reading", "alert", "value"]
+        )
+
+    def snapshot(self, k: int) -> AlertSnapshot:
+        """Returns the k highest and lowest plants of each column, and the plants in alert."""
+
+        return AlertSnapshot(
+            extremes={(column, largest): self.extremes(column, k, largest)
+                      for column in self.thresholds for largest in (True, False)},
+            active=self.active_alerts()
+        )
@@ -0,0 +1,93 @@
+"""Benchmark for finding the latest reading of every plant on the dashboard.
+
+Compares the previous per-plant scan, which filters and sorts the whole window once per plant,
+against a groupby over the window and against the incrementally updated LatestReadings index,
+on synthetic recordings with one reading per plant per minute.
+
+    python bench_latest.py --plants 1000 --minutes 1440
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from store import LatestReadings
+
+
+def generate_recordings(plant_count: int, minutes: int, first_id: int = 1,
+                        start: datetime = datetime(2026, 1, 27)) -> pd.DataFrame:
+    """Returns one synthetic reading per plant per minute, in time order."""
+
+    row_count = plant_count * minutes
+    rng = np.random.default_rng(0)
+
+    return pd.DataFrame({
+        "recording_id": np.arange(first_id, first_id + row_count),
+        "plant_id": np.tile(np.arange(1, plant_count + 1), minutes),
+        "common_name": np.tile([f"Plant {i}" for i in range(1, plant_count + 1)], minutes),
+        "recording_taken": np.repeat(
+            pd.date_range(start, periods=minutes, freq="min").to_numpy(), plant_count),
+        "temperature": rng.uniform(10, 25, row_count).astype("float32"),
+        "soil_moisture": rng.uniform(20, 100, row_count).astype("float32")
+    })
+
+
+def latest_by_scan(recordings: pd.DataFrame) -> dict:
+    """The previous approach: filters and sorts the window once per plant."""
+
+    latest = {}
+
+    for plant_name in recordings["common_name"].dropna().unique():
+        plant_df = recordings[recordings["common_name"] == plant_name]
+        plant_df = plant_df.sort_values(by=["recording_taken"], ascending=False)
+        latest[plant_name] = plant_df.head(1).iloc[0].to_dict()
+
+    return latest
+
+
+def latest_by_groupby(recordings: pd.DataFrame) -> pd.DataFrame:
+    """One pass over the window: the row of the latest reading of each plant."""
+
+    return recordings.loc[recordings.groupby("common_name")["recording_taken"].idxmax()]
+
+
+def time_function(function, *args) -> float:
+    """Returns the time taken in seconds to call the function."""
+
+    start_time = perf_counter()
+    function(*args)
+
+    return perf_counter() - start_time
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("--plants", type=int, default=1000)
+    parser.add_argument("--minutes", type=int, default=1440)
+    parser.add_argument("--skip-scan", action="store_true",
+                        help="Skip the per-plant scan, the slowest approach by far.")
+    args = parser.parse_args()
+
+    window = generate_recordings(args.plants, args.minutes)
+    new_minute = generate_recordings(
+        args.plants, 1, first_id=len(window) + 1,
+        start=window["recording_taken"].max() + timedelta(minutes=1))
+
+    index = LatestReadings()
+    build_time = time_function(index.update, window)
+
+    print(f"{args.plants} plants x {args.minutes} minutes = {len(window)} rows")
+    print(f"{'approach':<40} {'time (s)':>10}")
+
+    if not args.skip_scan:
+        print(f"{'per-plant scan of the window':<40} {time_function(latest_by_scan, window):>10.3f}")
+
+    print(f"{'groupby idxmax over the window':<40} {time_function(latest_by_groupby, window):>10.3f}")
+    print(f"{'index: build from the window':<40} {build_time:>10.3f}")
+    print(f"{'index: update with one new minute':<40} {time_function(index.update, new_minute):>10.4f}")
+    print(f"{'index: look up every plant':<40} "
+          f"{time_function(lambda: [index.get(name) for name in index.readings]):>10.4f}")
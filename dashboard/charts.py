@@ -2,6 +2,9 @@
 
 import altair as alt
 
+# Above this many points, lines are drawn without a marker on every point
+POINT_MARKER_LIMIT = 200
+
 
 def bar_chart(data, x_col, y_col, title):
     return (
@@ -20,7 +23,7 @@ def bar_chart(data, x_col, y_col, title):
 
 def plot_temp_over_time(df):
     """Plots temperature over time for each plant."""
-    chart = alt.Chart(df).mark_line(point=True).encode(
+    chart = alt.Chart(df).mark_line(point=len(df) <= POINT_MARKER_LIMIT).encode(
         x=alt.X("recording_taken:T", title="Time (hours)"),
         y=alt.Y("temperature:Q", title="Temperature (ºC)"),
         color=alt.value('orchid')
@@ -32,7 +35,7 @@ def plot_temp_over_time(df):
 
 def plot_moisture_over_time(df):
     """Plots soil moisture over time for each plant."""
-    chart = alt.Chart(df).mark_line(point=True).encode(
+    chart = alt.Chart(df).mark_line(point=len(df) <= POINT_MARKER_LIMIT).encode(
         x=alt.X("recording_taken:T", title="Time (hours)"),
         y=alt.Y("soil_moisture:Q", title="Soil Moisture (ml)"),
         color=alt.value('orchid')
@@ -40,3 +43,22 @@ def plot_moisture_over_time(df):
         title="Soil Moisture over Time"
     )
     return chart
+
+
+def plot_rollup_over_time(df, column, title, axis_title):
+    """Plots the mean of a rolled up column over time, with a band from its min to its max."""
+    base = alt.Chart(df).encode(
+        x=alt.X("recording_taken:T", title="Time (hours)")
+    )
+
+    band = base.mark_area(opacity=0.3, color="orchid").encode(
+        y=alt.Y(f"{column}_min:Q", title=axis_title),
+        y2=f"{column}_max:Q"
+    )
+
+    line = base.mark_line(point=len(df) <= POINT_MARKER_LIMIT, color="orchid").encode(
+        y=f"{column}_mean:Q",
+        tooltip=["recording_taken:T", f"{column}_min:Q", f"{column}_mean:Q", f"{column}_max:Q"]
+    )
+
+    return (band + line).properties(title=title)
@@ -1,40 +1,77 @@
 """Script which creates classes for plant information."""
 
+from __future__ import annotations
+
 from datetime import datetime
 
 
 class Plants:
-    """Class for a collection of plants."""
+    """Class for a collection of plants, indexed by common name and by plant id."""
+
+    __slots__ = ("plants_by_name", "plants_by_id")
 
-    def __init__(self, plants: list[Plant] = []):
+    def __init__(self, plants: list[Plant] | None = None):
         """Initialises the collection of plants."""
-        self.plants = plants
+        self.plants_by_name = {}
+        self.plants_by_id = {}
+
+        for plant in plants or []:
+            self.add_plant(plant)
+
+    @property
+    def plants(self) -> list[Plant]:
+        """Returns every plant in the collection."""
+
+        return list(self.plants_by_name.values())
+
+    def __len__(self) -> int:
+        return len(self.plants_by_name)
+
+    def __iter__(self):
+        return iter(self.plants_by_name.values())
 
     def get_plant(self, common_name: str) -> Plant:
         """Returns a plant based on its common name. Returns None if not found."""
 
-        for plant in self.plants:
-            if plant.common_name == common_name:
-                return plant
+        return self.plants_by_name.get(common_name)
+
+    def get_plant_by_id(self, plant_id: int) -> Plant:
+        """Returns a plant based on its plant id. Returns None if not found."""
 
-        return None
+        return self.plants_by_id.get(plant_id)
 
     def add_plant(self, plant: Plant) -> None:
-        """Adds a plant to the collection of plants."""
+        """Adds a plant to the collection of plants,
+        replacing any plant with the same common name or plant id."""
 
-        self.plants.append(plant)
+        for existing in (self.get_plant(plant.common_name), self.get_plant_by_id(plant.plant_id)):
+            if existing is not None:
+                self.remove_plant(existing)
+
+        self.plants_by_name[plant.common_name] = plant
+
+        if plant.plant_id is not None:
+            self.plants_by_id[plant.plant_id] = plant
 
     def remove_plant(self, plant: Plant) -> None:
         """Removes a plant from the collection of plants."""
 
-        self.plants = [p for p in self.plants if p == plant]
+        if self.plants_by_name.get(plant.common_name) is plant:
+            del self.plants_by_name[plant.common_name]
+
+        if self.plants_by_id.get(plant.plant_id) is plant:
+            del self.plants_by_id[plant.plant_id]
 
 
 class Plant:
     """Class for a single plant."""
 
+    __slots__ = ("common_name", "plant_id", "botanist", "origin", "image", "scientific_name",
+                 "soil_moisture", "temperature", "last_watered", "recording_taken")
+
     def __init__(self,
                  common_name: str,
+                 plant_id: int = None,
                  botanist: Botanist = None,
                  origin: Origin = None,
                  image: Image = None,
@@ -46,6 +83,7 @@ class Plant:
         """Initialises plant information."""
 
         self.common_name = common_name
+        self.plant_id = plant_id
         self.botanist = botanist
         self.origin = origin
 
@@ -60,6 +98,8 @@ class Plant:
 class Botanist:
     """Class for a single botanist."""
 
+    __slots__ = ("name", "email", "phone")
+
     def __init__(self, name: str, email: str, phone: str):
         """Initialises the botanist's info."""
         self.name = name
@@ -70,6 +110,8 @@ class Botanist:
 class Origin:
     """Class for an origin, where a plant comes from."""
 
+    __slots__ = ("city", "country", "longitude", "latitude")
+
     def __init__(self, city: str, country: str, longitude: float, latitude: float):
         """Initialises the information on the origin location."""
         self.city = city
@@ -81,6 +123,8 @@ class Origin:
 class Image:
     """Class for info of an image of a plant."""
 
+    __slots__ = ("licence", "licence_name", "licence_url", "thumbnail")
+
     def __init__(self, licence: int, licence_name: str, licence_url: str, thumbnail: str):
         """Initialises the image info."""
         self.licence = licence
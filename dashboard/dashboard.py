@@ -1,75 +1,48 @@
 """Script for hosting the dashboard for the past 24 hours of data."""
 
-from datetime import datetime, timedelta
+from os import environ as ENV
 
 import pandas as pd
 import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 from dotenv import load_dotenv
 
-from load_data import load_data
-from charts import bar_chart, plot_temp_over_time, plot_moisture_over_time
+from alerts import AlertSnapshot
+from load_data import query_timings
+from shared_data import get_shared_recordings
+from aggregation import ROLLUP_FREQUENCIES, rollup, downsample
+from charts import bar_chart, plot_temp_over_time, plot_moisture_over_time, plot_rollup_over_time
 from classes import Plants, Plant
 
 
-def get_latest_recording_for_plant(plant_recordings: pd.DataFrame, plant_name: str) -> dict:
-    """Returns a dict for the latest recording for the plant."""
-
-    plant_df = plant_recordings[plant_recordings["common_name"] == plant_name]
-    plant_df = plant_df.sort_values(
-        by=["recording_taken"], ascending=False)
-
-    latest_row = plant_df.head(1)
-
-    return {
-        "common_name": latest_row.iloc[0]["common_name"],
-        "soil_moisture": latest_row.iloc[0]["soil_moisture"],
-        "temperature": latest_row.iloc[0]["temperature"],
-        "recording_taken": latest_row.iloc[0]["recording_taken"]
-    }
-
-
-def get_plant_collection(plant_recordings: pd.DataFrame) -> Plants:
+def get_plant_collection(plant_summary: pd.DataFrame) -> Plants:
     """Returns a Plants object which is a collection of plants
-    based on the plants information extracted from the data."""
+    based on the latest reading of each plant in the summary."""
 
     plant_collection = Plants()
 
-    for plant_name in plant_recordings["common_name"].dropna().unique():
-        latest_recording = get_latest_recording_for_plant(
-            plant_recordings, plant_name)
-
+    for latest_recording in plant_summary.itertuples():
         plant_collection.add_plant(
             Plant(
-                common_name=latest_recording["common_name"],
-                soil_moisture=latest_recording["soil_moisture"],
-                temperature=latest_recording["temperature"],
-                recording_taken=latest_recording["recording_taken"]
+                common_name=latest_recording.Index,
+                plant_id=latest_recording.plant_id,
+                soil_moisture=latest_recording.soil_moisture,
+                temperature=latest_recording.temperature,
+                recording_taken=latest_recording.recording_taken
             )
         )
 
     return plant_collection
 
 
-def update_plant_collection(plant_collection: Plants, plant_recordings: pd.DataFrame) -> None:
-    """Updates fields in the plant collection based on new data."""
-
-    for plant in plant_collection.plants:
-        latest_recording = get_latest_recording_for_plant(
-            plant_recordings, plant.common_name)
-
-        plant.soil_moisture = latest_recording["soil_moisture"]
-        plant.temperature = latest_recording["temperature"]
-        plant.recording_taken = latest_recording["recording_taken"]
-
-
-def display_dashboard(plant_recordings: pd.DataFrame, plant_collection: Plants):
+def display_dashboard(plant_recordings: pd.DataFrame, plant_collection: Plants,
+                      plant_summary: pd.DataFrame, plant_alerts: AlertSnapshot):
     """Outputs the main visualisations of the dashboard."""
 
-    top_5_temp = plant_recordings.nlargest(5, "temperature")
-    bottom_5_temp = plant_recordings.nsmallest(5, "temperature")
-    top_5_moist = plant_recordings.nlargest(5, "soil_moisture")
-    bottom_5_moist = plant_recordings.nsmallest(5, "soil_moisture")
+    top_5_temp = plant_alerts.extremes[("temperature", True)]
+    bottom_5_temp = plant_alerts.extremes[("temperature", False)]
+    top_5_moist = plant_alerts.extremes[("soil_moisture", True)]
+    bottom_5_moist = plant_alerts.extremes[("soil_moisture", False)]
 
     st.set_page_config(
         page_title="LMNH Plant Monitor",
@@ -80,6 +53,10 @@ def display_dashboard(plant_recordings: pd.DataFrame, plant_collection: Plants):
     st.divider()
     st.subheader(" Alerts 🥀")
 
+    for alert in plant_alerts.active.itertuples():
+        st.warning(f"{alert.common_name}: {alert.reading.replace('_', ' ')} too {alert.alert} "
+                   f"({alert.value:.2f})")
+
     col1, col2 = st.columns(2)
 
     with col1:
@@ -110,8 +87,17 @@ def display_dashboard(plant_recordings: pd.DataFrame, plant_collection: Plants):
     st.sidebar.header("🌿 Plant Selection")
     plant = st.sidebar.selectbox(
         "Select a plant",
-        sorted(plant_recordings["common_name"].dropna().unique())
+        sorted(plant_summary.index)
+    )
+    resolution = st.sidebar.radio(
+        "Chart resolution",
+        ["Raw", *ROLLUP_FREQUENCIES]
     )
+
+    with st.sidebar.expander("Query timings"):
+        for name, (seconds, row_count) in query_timings.items():
+            st.caption(f"{name}: {row_count} rows in {seconds:.3f}s")
+
     plant_df = plant_recordings[plant_recordings["common_name"] == plant].sort_values(
         "recording_taken")
 
@@ -119,45 +105,46 @@ def display_dashboard(plant_recordings: pd.DataFrame, plant_collection: Plants):
 
     st.divider()
     col1, col2 = st.columns(2)
+
+    if resolution == "Raw":
+        max_points = int(ENV.get("DASHBOARD_CHART_POINTS", "500"))
+        temperature_chart = plot_temp_over_time(
+            downsample(plant_df, "temperature", max_points))
+        moisture_chart = plot_moisture_over_time(
+            downsample(plant_df, "soil_moisture", max_points))
+    else:
+        plant_rollup = rollup(plant_df, ROLLUP_FREQUENCIES[resolution],
+                              ["temperature", "soil_moisture"])
+        temperature_chart = plot_rollup_over_time(
+            plant_rollup, "temperature", "Temperature over Time", "Temperature (ºC)")
+        moisture_chart = plot_rollup_over_time(
+            plant_rollup, "soil_moisture", "Soil Moisture over Time", "Soil Moisture (ml)")
+
     with col1:
-        st.altair_chart(
-            plot_temp_over_time(plant_df)
-        )
+        st.altair_chart(temperature_chart)
 
         plant_obj = plant_collection.get_plant(plant)
 
         st.info(f"Current temperature: {plant_obj.temperature:.2f} ºC")
+        st.caption(f"24 hour range: {plant_summary.loc[plant, 'temperature_min']:.2f} – "
+                   f"{plant_summary.loc[plant, 'temperature_max']:.2f} ºC")
         st.info(f"Recording taken: {plant_obj.recording_taken}")
 
     with col2:
-        st.altair_chart(
-            plot_moisture_over_time(plant_df)
-        )
+        st.altair_chart(moisture_chart)
 
         st.info(f"Current soil moisture: {plant_obj.soil_moisture:.2f} ml")
+        st.caption(f"24 hour range: {plant_summary.loc[plant, 'soil_moisture_min']:.2f} – "
+                   f"{plant_summary.loc[plant, 'soil_moisture_max']:.2f} ml")
 
 
 if __name__ == '__main__':
 
-    if "initialised" not in st.session_state:
-        st.session_state.initialised = True
-        load_dotenv()
-
-        st.session_state.df = load_data(1440)
-        st.session_state.plant_collection = get_plant_collection(
-            st.session_state.df)
+    load_dotenv()
 
     st_autorefresh(interval=30000, key='refresh')
 
-    display_dashboard(st.session_state.df, st.session_state.plant_collection)
-
-    st.session_state.df = pd.concat(
-        [st.session_state.df, load_data(1)])
-
-    st.session_state.df = st.session_state.df[st.session_state.df["recording_taken"] > datetime.now(
-    ) - timedelta(days=1)]
-
-    st.session_state.df = st.session_state.df.drop_duplicates(keep=False)
+    recordings, plant_summary, plant_alerts = get_shared_recordings().get_snapshot()
 
-    update_plant_collection(
-        st.session_state.plant_collection, st.session_state.df)
+    display_dashboard(recordings, get_plant_collection(plant_summary), plant_summary,
+                      plant_alerts)
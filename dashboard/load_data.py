@@ -2,30 +2,173 @@
 on the dashboard."""
 
 from os import environ as ENV
+from functools import cache
+from math import ceil
+from threading import Lock
+from time import perf_counter
 
 import logging
 
 import connectorx as cx
 import pandas as pd
+import pyodbc
 from dotenv import load_dotenv
 
 logging.basicConfig(level=logging.INFO)
 
 load_dotenv()
 
+RECORDING_COLUMNS = "r.recording_id, r.plant_id, p.common_name, recording_taken, temperature, soil_moisture"
+
+ROLLUP_TABLES = {
+    "hourly": "beta.recording_hourly",
+    "daily": "beta.recording_daily"
+}
+
+# Seconds taken and rows returned by the last run of each query, by name
+query_timings = {}
+
+_connection = None
+_connection_lock = Lock()
+
+
+@cache
+def get_conn_url() -> str:
+    """Returns the connection URL for the database."""
+    return f"mssql://{ENV["DB_USERNAME"]}:{ENV["DB_PASSWORD"]}@{ENV["DB_HOST"]}:{ENV["DB_PORT"]}/{ENV["DB_NAME"]}"
+
+
+def get_db_connection() -> pyodbc.Connection:
+    """Returns the dashboard's connection to the database, opening it on first use.
+    It is kept open across refreshes, so each query does not pay for a new login."""
+    global _connection  # pylint: disable=global-statement
+
+    if _connection is None:
+        _connection = pyodbc.connect(
+            f"DRIVER={{{ENV['DB_DRIVER']}}};"
+            f"SERVER={ENV['DB_HOST']},{ENV['DB_PORT']};"
+            f"DATABASE={ENV['DB_NAME']};"
+            f"UID={ENV['DB_USERNAME']};"
+            f"PWD={ENV['DB_PASSWORD']};"
+            f"Encrypt=no;",
+            autocommit=True
+        )
+
+    return _connection
+
+
+def close_db_connection() -> None:
+    """Closes the dashboard's connection, so the next query opens a new one."""
+    global _connection  # pylint: disable=global-statement
+
+    if _connection is not None:
+        try:
+            _connection.close()
+        except pyodbc.Error:
+            pass
+
+        _connection = None
+
+
+def record_timing(name: str, start_time: float, row_count: int) -> None:
+    """Records and logs how long the query took since start_time."""
+    seconds = perf_counter() - start_time
+    query_timings[name] = (seconds, row_count)
+    logging.info("Query %s returned %s rows in %.3fs.", name, row_count, seconds)
+
+
+def read_query(name: str, query: str, params: tuple = ()) -> pd.DataFrame:
+    """Runs a parameterised query on the shared connection and returns its rows.
+    If the connection has dropped since the last refresh, it is reopened and the query run again."""
+    start_time = perf_counter()
+
+    with _connection_lock:
+        for attempt in range(2):
+            try:
+                with get_db_connection().cursor() as cur:
+                    cur.execute(query, params)
+                    columns = [column[0] for column in cur.description]
+                    rows = [tuple(row) for row in cur.fetchall()]
+                break
+            except pyodbc.Error:
+                close_db_connection()
+
+                if attempt:
+                    raise
+
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    record_timing(name, start_time, len(df))
+
+    return df
+
+
+def get_partition_num(expected_rows: int) -> int:
+    """Returns how many plant_id partitions connectorx should split a read of this many rows over,
+    one per DASHBOARD_ROWS_PER_PARTITION rows, up to DASHBOARD_MAX_PARTITIONS."""
+    rows_per_partition = int(ENV.get("DASHBOARD_ROWS_PER_PARTITION", "100000"))
+    max_partitions = int(ENV.get("DASHBOARD_MAX_PARTITIONS", "10"))
+
+    return max(1, min(max_partitions, ceil(expected_rows / rows_per_partition)))
+
 
 def load_data(past_mins: int) -> pd.DataFrame:
-    """This loads the cleaned plant recording data."""
+    """This loads the cleaned plant recording data.
+    The rows are counted first: a small window is read over the shared connection, and a large one
+    by connectorx over as many parallel partitions as the row count needs."""
+    past_mins = int(past_mins)
+
+    expected_rows = int(read_query("count_data", """
+        SELECT COUNT(*) FROM beta.recording
+        WHERE recording_taken >= DATEADD(minute, ?, GETDATE());
+        """, (-past_mins,)).iloc[0, 0])
+
+    partition_num = get_partition_num(expected_rows)
+
+    if partition_num == 1:
+        return read_query("load_data", f"""
+            SELECT {RECORDING_COLUMNS}
+            FROM beta.recording r JOIN beta.plant p
+            ON (r.plant_id=p.plant_id)
+            WHERE recording_taken >= DATEADD(minute, ?, GETDATE())
+            ORDER BY recording_taken;
+            """, (-past_mins,))
+
+    # connectorx cannot bind parameters, so the window is formatted in from the int above
     query = f"""
-        SELECT r.plant_id, p.common_name, recording_taken, temperature, soil_moisture 
+        SELECT {RECORDING_COLUMNS}
         FROM beta.recording r JOIN beta.plant p
         ON (r.plant_id=p.plant_id)
-        WHERE recording_taken >= DATEADD(minute, {-1 * past_mins}, GETDATE())
+        WHERE recording_taken >= DATEADD(minute, {-past_mins}, GETDATE())
         ORDER BY recording_taken;
         """
 
-    conn_url = f"mssql://{ENV["DB_USERNAME"]}:{ENV["DB_PASSWORD"]}@{ENV["DB_HOST"]}:{ENV["DB_PORT"]}/{ENV["DB_NAME"]}"
+    start_time = perf_counter()
     df = cx.read_sql(
-        conn_url, query, partition_on="plant_id", partition_num=10)
+        get_conn_url(), query, partition_on="plant_id", partition_num=partition_num)
+    record_timing("load_data", start_time, len(df))
 
     return df
+
+
+def load_new_data(last_recording_id: int) -> pd.DataFrame:
+    """This loads the recordings added since the given recording id.
+    The recording id is the primary key, so this seeks straight to the new rows."""
+    return read_query("load_new_data", f"""
+        SELECT {RECORDING_COLUMNS}
+        FROM beta.recording r JOIN beta.plant p
+        ON (r.plant_id=p.plant_id)
+        WHERE r.recording_id > ?
+        ORDER BY r.recording_id;
+        """, (int(last_recording_id),))
+
+
+def load_rollups(period: str, past_days: int) -> pd.DataFrame:
+    """This loads the hourly or daily rollups of every plant over the given number of days.
+    The rollups are kept by the pipeline, so this reads one row per plant per period."""
+    return read_query(f"load_rollups ({period})", f"""
+        SELECT r.*, p.common_name
+        FROM {ROLLUP_TABLES[period]} r JOIN beta.plant p
+        ON (r.plant_id=p.plant_id)
+        WHERE period_start >= DATEADD(day, ?, GETDATE())
+        ORDER BY period_start;
+        """, (-int(past_days),))
@@ -1,10 +1,15 @@
 """This script provides downloadable links to objects in the S3 buckets."""
 
+import json
+from datetime import date, datetime, timedelta
 from os import environ as ENV, _Environ
+from threading import Lock
+from time import monotonic
 
 from dotenv import load_dotenv
-from re import match
+from re import match, search
 from boto3 import client
+from botocore.exceptions import ClientError
 from mypy_boto3_s3.client import S3Client
 
 
@@ -14,17 +19,60 @@ def get_s3_client(config: _Environ) -> client:
     return client(
         "s3",
         aws_access_key_id=config["AWS_ACCESS_KEY"],
-        aws_secret_access_key=config["AWS_SECRET_KEY"]
+        aws_secret_access_key=config["AWS_SECRET_KEY"],
+        region_name=config.get("AWS_REGION")
     )
 
 
-def get_object_list(s3_client: S3Client, bucket_name: str, regex: str=r".*\.csv$") -> list[str]:
-    """Returns a list of objects inside the S3 bucket.
+def get_object_list(s3_client: S3Client, bucket_name: str,
+                    regex: str=r".*\.(csv|parquet)$", prefix: str="") -> list[str]:
+    """Returns a list of objects inside the S3 bucket, under the prefix.
     Optional regex parameter to specify object names wanted."""
 
-    objects = s3_client.list_objects(Bucket=bucket_name)["Contents"]
+    pages = s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket_name, Prefix=prefix)
 
-    return [object["Key"] for object in objects if match(regex, object["Key"])]
+    return [object["Key"] for page in pages for object in page.get("Contents", [])
+            if match(regex, object["Key"])]
+
+
+def get_key_kind(key: str) -> str:
+    """Returns whether an archived file holds recordings or a snapshot of a dimension table."""
+
+    return "dimension" if "/dimensions/" in key else "recordings"
+
+
+def get_key_date_range(key: str) -> tuple[date | None, date | None]:
+    """Returns the first and last dates of the recordings in an archived file, as far as its
+    key tells: its date partition if it has one, or the date of the run that wrote a dimension
+    snapshot. Other files only hold recordings from at least a day before their run.
+    Unknown dates are None."""
+
+    partition_date = search(r"date=(\d{4}-\d{2}-\d{2})", key)
+
+    if partition_date:
+        key_date = date.fromisoformat(partition_date.group(1))
+        return key_date, key_date
+
+    run_date = search(r"_(\d{4}-\d{2}-\d{2})T", key)
+
+    if run_date is None:
+        return None, None
+
+    if get_key_kind(key) == "dimension":
+        return date.fromisoformat(run_date.group(1)), date.fromisoformat(run_date.group(1))
+
+    return None, date.fromisoformat(run_date.group(1)) - timedelta(days=1)
+
+
+def get_manifest_date_range(entry: dict) -> tuple[date | None, date | None]:
+    """Returns the first and last dates of the recordings in a manifest entry. Entries
+    written before the archiver recorded them are dated from their key."""
+
+    if "date_to" not in entry:
+        return get_key_date_range(entry["key"])
+
+    return tuple(date.fromisoformat(entry[field]) if entry[field] else None
+                 for field in ("date_from", "date_to"))
 
 
 def generate_object_url(bucket_name: str, object_name: str) -> str:
@@ -33,6 +81,104 @@ def generate_object_url(bucket_name: str, object_name: str) -> str:
     return f"https://{bucket_name}.s3.{ENV["AWS_REGION"]}.amazonaws.com/{object_name}"
 
 
+class ArchiveCatalogue:
+    """Cached listing of the archived files, with presigned download links.
+
+    The listing is read from the manifest the archiver writes, so it costs one request however
+    many files there are, and is only downloaded again when its ETag has changed. Without a
+    manifest, the prefix is listed a page at a time instead. Links are presigned together and
+    reused until they are close to expiring."""
+
+    def __init__(self, s3_client: S3Client, bucket_name: str, prefix: str,
+                 ttl_seconds: float, url_expiry_seconds: int):
+        """Initialises the catalogue, which is listed on first use."""
+
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.url_expiry_seconds = url_expiry_seconds
+        self.entries = []
+        self.etag = None
+        self.urls = {}
+        self.lock = Lock()
+        self.refreshed_at = None
+
+    def is_stale(self) -> bool:
+        """Returns True if the listing has not been checked in the last TTL seconds."""
+
+        return self.refreshed_at is None or monotonic() - self.refreshed_at >= self.ttl_seconds
+
+    def refresh(self) -> None:
+        """Reloads the manifest if it has changed, or lists the prefix if there is none."""
+
+        request = {"Bucket": self.bucket_name, "Key": f"{self.prefix}manifest.json"}
+
+        if self.etag is not None:
+            request["IfNoneMatch"] = self.etag
+
+        try:
+            response = self.s3_client.get_object(**request)
+            self.entries = [{"key": entry["key"], "dates": get_manifest_date_range(entry),
+                             "kind": entry.get("kind", get_key_kind(entry["key"]))}
+                            for entry in json.loads(response["Body"].read())["objects"]]
+            self.etag = response["ETag"]
+        except ClientError as error:
+            if error.response["Error"]["Code"] in ("304", "NotModified"):
+                pass
+            elif error.response["Error"]["Code"] == "NoSuchKey":
+                self.entries = [{"key": key, "dates": get_key_date_range(key),
+                                 "kind": get_key_kind(key)}
+                                for key in get_object_list(self.s3_client, self.bucket_name,
+                                                           prefix=self.prefix)]
+                self.etag = None
+            else:
+                raise
+
+        listed_keys = {entry["key"] for entry in self.entries}
+        self.urls = {key: url for key, url in self.urls.items() if key in listed_keys}
+        self.refreshed_at = monotonic()
+
+    def get_keys(self, start: date | None = None, end: date | None = None,
+                 regex: str=r".*\.(csv|parquet)$", kind: str="recordings") -> list[str]:
+        """Returns the keys of the archived files of the kind, recordings or dimension, with
+        any recordings from start to end, inclusive, refreshing the listing if stale.
+        A file whose first or last date is unknown is kept unless its known date rules it out."""
+
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self.refresh()
+
+        return [entry["key"] for entry in self.entries
+                if entry["kind"] == kind and match(regex, entry["key"])
+                and (start is None or entry["dates"][1] is None or entry["dates"][1] >= start)
+                and (end is None or entry["dates"][0] is None or entry["dates"][0] <= end)]
+
+    def get_urls(self, keys: list[str]) -> dict[str, str]:
+        """Returns a presigned download link for each key, presigning those without a link
+        that is valid for at least half its expiry. Expired links are dropped, and links of keys
+        no longer listed are dropped on refresh, so the cache only holds the current listing.
+        Presigning is done locally, so it is done under the lock."""
+
+        now = datetime.now()
+        renew_before = now + timedelta(seconds=self.url_expiry_seconds / 2)
+
+        with self.lock:
+            self.urls = {key: url for key, url in self.urls.items() if url[1] > now}
+
+            for key in keys:
+                if key not in self.urls or self.urls[key][1] < renew_before:
+                    self.urls[key] = (
+                        self.s3_client.generate_presigned_url(
+                            "get_object", Params={"Bucket": self.bucket_name, "Key": key},
+                            ExpiresIn=self.url_expiry_seconds),
+                        now + timedelta(seconds=self.url_expiry_seconds)
+                    )
+
+            return {key: self.urls[key][0] for key in keys}
+
+
 def get_all_object_urls(s3_client: S3Client, bucket_name: str) -> dict:
     """Returns a dict of all object names and download links in the bucket."""
 
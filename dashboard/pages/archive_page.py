@@ -1,6 +1,7 @@
-"""This script will contain downloadable links to CSV files of past plant data."""
+"""This script will contain downloadable links to CSV and Parquet files of past plant data."""
 
 import sys
+from datetime import date, timedelta
 from pathlib import Path
 from os import environ as ENV
 
@@ -9,7 +10,18 @@ from dotenv import load_dotenv
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from load_s3_data import get_s3_client, get_object_list, generate_object_url
+from load_s3_data import get_s3_client, ArchiveCatalogue
+
+
+@st.cache_resource
+def get_archive_catalogue() -> ArchiveCatalogue:
+    """Returns the archive catalogue for this dashboard process, creating it on first use."""
+
+    return ArchiveCatalogue(
+        get_s3_client(ENV), ENV["S3_BUCKET"], ENV.get("S3_PREFIX", "archive/"),
+        ttl_seconds=float(ENV.get("ARCHIVE_CACHE_TTL_SECONDS", "300")),
+        url_expiry_seconds=int(ENV.get("ARCHIVE_URL_EXPIRY_SECONDS", "3600"))
+    )
 
 
 def display_archive_page() -> None:
@@ -17,18 +29,44 @@ def display_archive_page() -> None:
     st.set_page_config(page_title="Archived Data")
 
     st.title("Archived Data")
-    
-    s3 = get_s3_client(ENV)
-    bucket = ENV["S3_BUCKET"]
 
-    csv_files = get_object_list(s3, bucket, regex=r".*\.csv$")
+    catalogue = get_archive_catalogue()
+
+    today = date.today()
+    date_range = st.date_input("Recordings from", (today - timedelta(days=30), today))
+    start, end = date_range if len(date_range) == 2 else (date_range[0], date_range[0])
+
+    csv_files = catalogue.get_keys(start, end, regex=r".*\.csv$")
+    parquet_files = catalogue.get_keys(start, end, regex=r".*\.parquet$")
+    dimension_files = catalogue.get_keys(start, end, kind="dimension")
+    urls = catalogue.get_urls(csv_files + parquet_files + dimension_files)
+
+    st.header("CSV")
 
     if not csv_files:
         st.info("No CSV files found.")
     else:
         for csv in csv_files:
-            url = generate_object_url(bucket, csv)
-            st.markdown(f"📄 **{csv}** [⬇️ Download]({url})")
+            st.markdown(f"📄 **{csv}** [⬇️ Download]({urls[csv]})")
+
+    st.header("Parquet")
+    st.caption("Compressed and partitioned by date, for analysis over long periods.")
+
+    if not parquet_files:
+        st.info("No Parquet files found.")
+    else:
+        for parquet in parquet_files:
+            st.markdown(f"🗂️ **{parquet}** [⬇️ Download]({urls[parquet]})")
+
+    st.header("Dimension Tables")
+    st.caption("Snapshots of the plant, botanist, origin and image tables taken with each archive, "
+               "to look up the ids in the files above.")
+
+    if not dimension_files:
+        st.info("No dimension tables found.")
+    else:
+        for dimension in dimension_files:
+            st.markdown(f"📇 **{dimension}** [⬇️ Download]({urls[dimension]})")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,57 @@
+"""This script shows the longer history of each plant, from the hourly and daily rollups."""
+
+import sys
+from pathlib import Path
+
+import streamlit as st
+from dotenv import load_dotenv
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from load_data import load_rollups
+from aggregation import add_rollup_statistics
+from charts import plot_rollup_over_time
+
+HISTORY_RANGES = {
+    "Last week": ("hourly", 7),
+    "Last month": ("daily", 31),
+    "Last year": ("daily", 366)
+}
+
+
+@st.cache_data(ttl=300)
+def get_history(period: str, past_days: int):
+    """Returns the rollups with their statistics, cached for five minutes."""
+    return add_rollup_statistics(load_rollups(period, past_days), ["temperature", "soil_moisture"])
+
+
+def display_history_page() -> None:
+    """Displays the history page."""
+    st.set_page_config(page_title="Plant History", layout="wide")
+
+    st.title("Plant History")
+
+    history_range = st.sidebar.radio("Range", list(HISTORY_RANGES))
+    history = get_history(*HISTORY_RANGES[history_range])
+
+    if history.empty:
+        st.info("No history found.")
+        return
+
+    plant = st.sidebar.selectbox("Select a plant", sorted(history["common_name"].unique()))
+    plant_history = history[history["common_name"] == plant]
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.altair_chart(plot_rollup_over_time(plant_history, "temperature",
+                                              "Temperature over Time", "Temperature (ºC)"))
+
+    with col2:
+        st.altair_chart(plot_rollup_over_time(plant_history, "soil_moisture",
+                                              "Soil Moisture over Time", "Soil Moisture (ml)"))
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    display_history_page()
@@ -0,0 +1,118 @@
+"""This script keeps one copy of the last 24 hours of recordings for every dashboard session to share."""
+
+from datetime import datetime
+from os import environ as ENV
+from threading import Lock
+from time import monotonic
+
+import pandas as pd
+import streamlit as st
+
+from alerts import AlertEngine, AlertSnapshot, Threshold, get_alert_thresholds
+from load_data import load_data, load_new_data
+from store import RecordingStore, LatestReadings
+
+SENSOR_COLUMNS = ["temperature", "soil_moisture"]
+ALERT_CHART_SIZE = 5
+
+
+def compact_recordings(recordings: pd.DataFrame) -> pd.DataFrame:
+    """Returns the recordings with the sensor readings as 32-bit floats, halving their memory."""
+
+    return recordings.astype({column: "float32" for column in SENSOR_COLUMNS
+                              if column in recordings.columns})
+
+
+def summarise_plants(recordings: pd.DataFrame, latest: LatestReadings) -> pd.DataFrame:
+    """Returns one row per plant with its latest reading, from the index,
+    and the min, mean and max of its readings in the window."""
+
+    if recordings.empty:
+        return pd.DataFrame()
+
+    reading_ranges = recordings.groupby("common_name").agg(
+        temperature_min=("temperature", "min"),
+        temperature_mean=("temperature", "mean"),
+        temperature_max=("temperature", "max"),
+        soil_moisture_min=("soil_moisture", "min"),
+        soil_moisture_mean=("soil_moisture", "mean"),
+        soil_moisture_max=("soil_moisture", "max"),
+        reading_count=("recording_id", "count")
+    )
+
+    latest_readings = latest.frame()[["plant_id", "recording_taken", *SENSOR_COLUMNS]]
+
+    return latest_readings.join(reading_ranges, how="inner")
+
+
+class SharedRecordings:
+    """The rolling window of recordings, per-plant summary and alerts, shared by every session.
+
+    Whichever session first finds the data older than the TTL refreshes it with only the new
+    recordings, under a lock so the refresh happens once. Sessions read a snapshot, which is
+    replaced rather than changed, so they must not modify it."""
+
+    def __init__(self, ttl_seconds: float, max_rows: int,
+                 thresholds: dict[str, Threshold] | None = None, overlap_ids: int = 1000):
+        """Initialises the shared data, which is loaded on first use."""
+
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.store = RecordingStore(overlap_ids=overlap_ids)
+        self.latest = LatestReadings()
+        self.alerts = AlertEngine(thresholds or get_alert_thresholds({}))
+        self.lock = Lock()
+        self.refreshed_at = None
+        self.snapshot = None
+
+    def is_stale(self) -> bool:
+        """Returns True if the data has not been loaded in the last TTL seconds."""
+
+        return self.refreshed_at is None or monotonic() - self.refreshed_at >= self.ttl_seconds
+
+    def refresh(self) -> None:
+        """Loads the recordings added since the last refresh, or the whole window at first,
+        evicts the old ones and the plants that have stopped reporting, and rebuilds the snapshot.
+        Recordings read again from the overlap are dropped by the store, so only those it adds
+        update the latest readings."""
+
+        if self.refreshed_at is None:
+            new_recordings = load_data(1440)
+        else:
+            new_recordings = load_new_data(self.store.reload_from_id)
+
+        new_recordings = self.store.append(compact_recordings(new_recordings))
+
+        self.alerts.update(self.latest.update(new_recordings))
+
+        now = datetime.now()
+        self.store.evict(now)
+        self.alerts.remove(self.latest.evict(now - self.store.window))
+        self.store.trim(self.max_rows)
+
+        recordings = self.store.frame()
+        self.snapshot = (recordings, summarise_plants(recordings, self.latest),
+                         self.alerts.snapshot(ALERT_CHART_SIZE))
+        self.refreshed_at = monotonic()
+
+    def get_snapshot(self) -> tuple[pd.DataFrame, pd.DataFrame, AlertSnapshot]:
+        """Returns the shared recordings, per-plant summary and alerts, refreshing them if stale."""
+
+        if self.is_stale():
+            with self.lock:
+                if self.is_stale():
+                    self.refresh()
+
+        return self.snapshot
+
+
+@st.cache_resource
+def get_shared_recordings() -> SharedRecordings:
+    """Returns the shared recordings for this dashboard process, creating them on first use."""
+
+    return SharedRecordings(
+        ttl_seconds=float(ENV.get("DASHBOARD_CACHE_TTL_SECONDS", "30")),
+        max_rows=int(ENV.get("DASHBOARD_MAX_ROWS", "2000000")),
+        thresholds=get_alert_thresholds(ENV),
+        overlap_ids=int(ENV.get("DASHBOARD_REFRESH_OVERLAP_IDS", "1000"))
+    )
@@ -0,0 +1,193 @@
+"""This script holds the rolling window of recordings shown on the dashboard, refreshed incrementally."""
+
+from collections import deque
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+class RecordingStore:
+    """Time-ordered store of the recordings within a rolling window.
+
+    New recordings are appended as chunks and old ones evicted from the front, so a refresh
+    only costs as much as the rows added and evicted. Recordings arrive in time order, as the
+    pipeline loads them every minute, so each chunk is sorted and the chunks follow each other;
+    the odd late recording is merged into its place instead.
+
+    Recording ids are given out as rows are inserted, but overlapping pipeline runs can commit
+    them out of order, so a refresh reads again from overlap_ids below the newest id it holds.
+    The ids in that overlap are remembered so each recording is only stored once."""
+
+    def __init__(self, window: timedelta = timedelta(days=1), overlap_ids: int = 1000):
+        """Initialises an empty store keeping recordings newer than the window."""
+
+        self.window = window
+        self.overlap_ids = overlap_ids
+        self.chunks = deque()
+        self.columns = []
+        self.row_count = 0
+        self.last_recording_id = 0
+        self.recent_ids = set()
+        self._frame = None
+
+    @property
+    def reload_from_id(self) -> int:
+        """Returns the recording id after which the next refresh should read."""
+
+        return max(self.last_recording_id - self.overlap_ids, 0)
+
+    def append(self, new_recordings: pd.DataFrame) -> pd.DataFrame:
+        """Adds the recordings that are not already stored, moves the watermark to the newest,
+        and returns the recordings added."""
+
+        self.columns = list(new_recordings.columns)
+        new_recordings = new_recordings[
+            (new_recordings["recording_id"] > self.reload_from_id)
+            & ~new_recordings["recording_id"].isin(self.recent_ids)
+        ].drop_duplicates("recording_id")
+
+        if new_recordings.empty:
+            return new_recordings
+
+        self.add_chunk(new_recordings.sort_values("recording_taken", ignore_index=True))
+        self.row_count += len(new_recordings)
+        self.last_recording_id = max(self.last_recording_id,
+                                     int(new_recordings["recording_id"].max()))
+        self.recent_ids.update(new_recordings["recording_id"].tolist())
+        self.recent_ids = {recording_id for recording_id in self.recent_ids
+                           if recording_id > self.reload_from_id}
+        self._frame = None
+
+        return new_recordings
+
+    def add_chunk(self, chunk: pd.DataFrame) -> None:
+        """Appends a sorted chunk, keeping every stored recording in time order.
+        Late-committed recordings older than the newest stored one are rare, so the store is
+        only merged and re-sorted when they arrive, and the rest of the chunk is appended."""
+
+        newest = self.chunks[-1]["recording_taken"].iloc[-1] if self.chunks else None
+
+        if newest is not None and chunk["recording_taken"].iloc[0] < newest:
+            late_count = chunk["recording_taken"].searchsorted(newest, side="right")
+            merged = pd.concat([*self.chunks, chunk.iloc[:late_count]], ignore_index=True)
+            self.chunks = deque([merged.sort_values("recording_taken", kind="stable",
+                                                    ignore_index=True)])
+            chunk = chunk.iloc[late_count:]
+
+        if not chunk.empty:
+            self.chunks.append(chunk)
+
+    def evict(self, now: datetime) -> int:
+        """Removes recordings older than the window, and returns how many were removed.
+        Only the evicted chunks and the first kept chunk are touched."""
+
+        cutoff = now - self.window
+        evicted = 0
+
+        while self.chunks and self.chunks[0]["recording_taken"].iloc[-1] < cutoff:
+            evicted += len(self.chunks.popleft())
+
+        if self.chunks:
+            first_kept = self.chunks[0]["recording_taken"].searchsorted(cutoff)
+
+            if first_kept:
+                self.chunks[0] = self.chunks[0].iloc[first_kept:]
+                evicted += first_kept
+
+        self.row_count -= evicted
+
+        if evicted:
+            self._frame = None
+
+        return evicted
+
+    def trim(self, max_rows: int) -> int:
+        """Removes the oldest recordings beyond max_rows, and returns how many were removed."""
+
+        evicted = 0
+
+        while self.chunks and self.row_count - evicted - len(self.chunks[0]) >= max_rows:
+            evicted += len(self.chunks.popleft())
+
+        excess = self.row_count - evicted - max_rows
+
+        if self.chunks and excess > 0:
+            self.chunks[0] = self.chunks[0].iloc[excess:]
+            evicted += excess
+
+        self.row_count -= evicted
+
+        if evicted:
+            self._frame = None
+
+        return evicted
+
+    def frame(self) -> pd.DataFrame:
+        """Returns every stored recording as one dataframe in time order.
+        The chunks are merged into it, so the next refresh only adds its own chunk."""
+
+        if self._frame is None:
+            if not self.chunks:
+                return pd.DataFrame(columns=self.columns)
+
+            self._frame = pd.concat(self.chunks, ignore_index=True)
+            self.chunks = deque([self._frame])
+
+        return self._frame
+
+
+class LatestReadings:
+    """Index of each plant's latest reading, keyed by common name.
+
+    It is updated from new recordings only, so keeping it current costs as much as the new data,
+    and looking up a plant is a dict lookup rather than a scan of the window."""
+
+    def __init__(self):
+        """Initialises an empty index."""
+
+        self.readings = {}
+
+    def update(self, new_recordings: pd.DataFrame) -> list[dict]:
+        """Replaces the readings of the plants with newer recordings,
+        and returns the readings that were replaced."""
+
+        if new_recordings.empty:
+            return []
+
+        latest_rows = new_recordings.sort_values("recording_taken").drop_duplicates(
+            "common_name", keep="last")
+        updated = []
+
+        for row in latest_rows.to_dict("records"):
+            current = self.readings.get(row["common_name"])
+
+            if current is None or row["recording_taken"] >= current["recording_taken"]:
+                self.readings[row["common_name"]] = row
+                updated.append(row)
+
+        return updated
+
+    def evict(self, cutoff: datetime) -> list[str]:
+        """Removes the plants whose latest reading is older than the cutoff,
+        and returns their common names."""
+
+        evicted = [common_name for common_name, row in self.readings.items()
+                   if row["recording_taken"] < cutoff]
+
+        for common_name in evicted:
+            del self.readings[common_name]
+
+        return evicted
+
+    def get(self, common_name: str) -> dict | None:
+        """Returns the latest reading of the plant, or None if it has no readings."""
+
+        return self.readings.get(common_name)
+
+    def frame(self) -> pd.DataFrame:
+        """Returns the latest readings as a dataframe indexed by common name."""
+
+        if not self.readings:
+            return pd.DataFrame()
+
+        return pd.DataFrame.from_dict(self.readings, orient="index").rename_axis("common_name")
@@ -0,0 +1,80 @@
+"""Testing aggregation.py"""
+
+# pylint:skip-file
+
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from aggregation import rollup, add_rollup_statistics, lttb_indices, downsample
+
+START = datetime(2026, 1, 27, 12)
+
+
+def make_recordings(count: int) -> pd.DataFrame:
+    return pd.DataFrame({
+        "plant_id": [1] * count,
+        "recording_taken": [START + timedelta(minutes=i) for i in range(count)],
+        "temperature": [float(i % 10) for i in range(count)],
+        "soil_moisture": [90.0] * count
+    })
+
+
+def test_rollup_min_mean_max():
+    summary = rollup(make_recordings(20), "5min", ["temperature"])
+
+    assert len(summary) == 4
+    assert summary.loc[0, "temperature_min"] == 0.0
+    assert summary.loc[0, "temperature_max"] == 4.0
+    assert summary.loc[1, "temperature_mean"] == 7.0
+    assert summary.loc[1, "recording_taken"] == START + timedelta(minutes=5)
+
+
+def test_lttb_keeps_ends_and_count():
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+
+    indices = lttb_indices(x, y, 100)
+
+    assert len(indices) == 100
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(1000, dtype=float)
+    y = np.zeros(1000)
+    y[503] = 100.0
+
+    assert 503 in lttb_indices(x, y, 50)
+
+
+def test_lttb_short_series_unchanged():
+    assert list(lttb_indices(np.arange(5.0), np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+
+
+def test_downsample_limits_points():
+    recordings = make_recordings(1440)
+
+    downsampled = downsample(recordings, "temperature", 200)
+
+    assert len(downsampled) == 200
+    assert downsampled["recording_taken"].is_monotonic_increasing
+
+
+def test_add_rollup_statistics():
+    values = np.array([10.0, 12.0, 14.0])
+    rollups = pd.DataFrame({
+        "period_start": [START, START + timedelta(hours=1)],
+        "temperature_count": [3, 0],
+        "temperature_sum": [values.sum(), 0.0],
+        "temperature_sum_sq": [(values ** 2).sum(), 0.0]
+    })
+
+    statistics = add_rollup_statistics(rollups, ["temperature"])
+
+    assert statistics.loc[0, "temperature_mean"] == 12.0
+    assert np.isclose(statistics.loc[0, "temperature_std"], values.std(ddof=1))
+    assert np.isnan(statistics.loc[1, "temperature_mean"])
+    assert "recording_taken" in statistics.columns
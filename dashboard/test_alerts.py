@@ -0,0 +1,73 @@
+"""Testing alerts.py"""
+
+# pylint:skip-file
+
+from alerts import Threshold, AlertEngine, get_alert_thresholds
+
+
+def reading(common_name: str, temperature: float, soil_moisture: float = 50.0) -> dict:
+    return {"common_name": common_name, "temperature": temperature,
+            "soil_moisture": soil_moisture}
+
+
+def make_engine() -> AlertEngine:
+    return AlertEngine({"temperature": Threshold(low=10, high=30, hysteresis=2)})
+
+
+def test_extremes_one_row_per_plant():
+    engine = make_engine()
+    engine.update([reading("Cactus", 20), reading("Fern", 25), reading("Rose", 15)])
+    engine.update([reading("Cactus", 28)])
+
+    highest = engine.extremes("temperature", 2)
+    lowest = engine.extremes("temperature", 2, largest=False)
+
+    assert list(highest["common_name"]) == ["Cactus", "Fern"]
+    assert list(highest["temperature"]) == [28, 25]
+    assert list(lowest["common_name"]) == ["Rose", "Fern"]
+
+
+def test_alert_held_until_past_hysteresis():
+    engine = make_engine()
+
+    engine.update([reading("Cactus", 31)])
+    assert engine.alerts["temperature"] == {"Cactus": "high"}
+
+    engine.update([reading("Cactus", 29)])
+    assert engine.alerts["temperature"] == {"Cactus": "high"}
+
+    engine.update([reading("Cactus", 27.5)])
+    assert engine.alerts["temperature"] == {}
+
+    engine.update([reading("Cactus", 29)])
+    assert engine.alerts["temperature"] == {}
+
+
+def test_low_alert_reported():
+    engine = make_engine()
+    engine.update([reading("Rose", 8), reading("Fern", 20)])
+
+    active = engine.active_alerts()
+
+    assert active.to_dict("records") == [
+        {"common_name": "Rose", "reading": "temperature", "alert": "low", "value": 8.0}]
+
+
+def test_get_alert_thresholds_from_config():
+    thresholds = get_alert_thresholds({"ALERT_TEMPERATURE_HIGH": "",
+                                       "ALERT_SOIL_MOISTURE_LOW": "35"})
+
+    assert thresholds["temperature"].high is None
+    assert thresholds["temperature"].low == 10
+    assert thresholds["soil_moisture"].low == 35
+    assert thresholds["soil_moisture"].hysteresis == 2
+
+
+def test_removed_plant_leaves_extremes_and_alerts():
+    engine = make_engine()
+    engine.update([reading("Cactus", 35), reading("Fern", 25)])
+
+    engine.remove(["Cactus"])
+
+    assert list(engine.extremes("temperature", 5)["common_name"]) == ["Fern"]
+    assert engine.active_alerts().empty
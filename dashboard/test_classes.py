@@ -0,0 +1,46 @@
+"""Testing classes.py"""
+
+# pylint:skip-file
+
+import pytest
+
+from classes import Plants, Plant, Botanist
+
+
+def test_plants_default_not_shared():
+    Plants().add_plant(Plant("Bird of paradise", plant_id=1))
+
+    assert len(Plants()) == 0
+
+
+def test_get_plant_by_name_and_id():
+    plant = Plant("Bird of paradise", plant_id=1)
+    plants = Plants([plant, Plant("Cactus", plant_id=2)])
+
+    assert plants.get_plant("Bird of paradise") is plant
+    assert plants.get_plant_by_id(1) is plant
+    assert plants.get_plant("Fern") is None
+
+
+def test_remove_plant():
+    plant = Plant("Bird of paradise", plant_id=1)
+    other = Plant("Cactus", plant_id=2)
+    plants = Plants([plant, other])
+
+    plants.remove_plant(plant)
+
+    assert plants.plants == [other]
+    assert plants.get_plant_by_id(1) is None
+
+
+def test_add_plant_replaces_same_name():
+    plants = Plants([Plant("Bird of paradise", plant_id=1, temperature=10.0)])
+    plants.add_plant(Plant("Bird of paradise", plant_id=1, temperature=12.0))
+
+    assert len(plants) == 1
+    assert plants.get_plant_by_id(1).temperature == 12.0
+
+
+def test_slots_reject_unknown_attributes():
+    with pytest.raises(AttributeError):
+        Botanist("Anna Davis", "anna@lnhm.co.uk", "0123").age = 30
@@ -0,0 +1,95 @@
+"""Testing load_data.py"""
+
+# pylint:skip-file
+
+import pytest
+
+pytest.importorskip("connectorx")
+pytest.importorskip("pyodbc")
+
+import pyodbc
+
+import load_data
+from load_data import get_partition_num, read_query, load_new_data
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = [("recording_id",), ("temperature",)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params):
+        if self.connection.broken:
+            raise pyodbc.Error("Communication link failure")
+        self.connection.executed.append((query, params))
+
+    def fetchall(self):
+        return [(11, 15.5), (12, 16.0)]
+
+
+class FakeConnection:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.executed = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    opened = []
+
+    def fake_connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(load_data.pyodbc, "connect", fake_connect)
+    monkeypatch.setattr(load_data, "_connection", None)
+    monkeypatch.setattr(load_data, "query_timings", {})
+    for name in ["DB_DRIVER", "DB_HOST", "DB_PORT", "DB_NAME", "DB_USERNAME", "DB_PASSWORD"]:
+        monkeypatch.setenv(name, "x")
+    return opened
+
+
+@pytest.mark.parametrize("expected_rows, partition_num", [
+    (0, 1), (50, 1), (100000, 1), (100001, 2), (72000, 1), (10_000_000, 10)])
+def test_get_partition_num(expected_rows, partition_num):
+    assert get_partition_num(expected_rows) == partition_num
+
+
+def test_connection_reused_across_queries(connections):
+    load_new_data(10)
+    load_new_data(12)
+
+    assert len(connections) == 1
+    assert [params for _, params in connections[0].executed] == [(10,), (12,)]
+
+
+def test_read_query_returns_rows_and_timing(connections):
+    df = read_query("new rows", "SELECT ...", (10,))
+
+    assert list(df.columns) == ["recording_id", "temperature"]
+    assert df["temperature"].tolist() == [15.5, 16.0]
+    assert load_data.query_timings["new rows"][1] == 2
+
+
+def test_dropped_connection_reopened(connections, monkeypatch):
+    broken = FakeConnection(broken=True)
+    monkeypatch.setattr(load_data, "_connection", broken)
+
+    df = read_query("new rows", "SELECT ...", (10,))
+
+    assert broken.closed
+    assert len(connections) == 1
+    assert len(df) == 2
@@ -0,0 +1,150 @@
+"""Testing load_s3_data.py"""
+
+# pylint:skip-file
+
+import json
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("mypy_boto3_s3")
+moto = pytest.importorskip("moto")
+
+import boto3
+
+from load_s3_data import get_object_list, get_key_date_range, ArchiveCatalogue
+
+BUCKET = "archive-bucket"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        s3_client = boto3.client("s3", region_name="eu-west-2")
+        s3_client.create_bucket(Bucket=BUCKET,
+                                CreateBucketConfiguration={"LocationConstraint": "eu-west-2"})
+        yield s3_client
+
+
+def make_catalogue(s3, ttl_seconds=300) -> ArchiveCatalogue:
+    return ArchiveCatalogue(s3, BUCKET, "archive/", ttl_seconds=ttl_seconds,
+                            url_expiry_seconds=3600)
+
+
+def put_manifest(s3, keys, date_from="2026-01-20", date_to="2026-01-27"):
+    s3.put_object(Bucket=BUCKET, Key="archive/manifest.json", Body=json.dumps({
+        "objects": [{"key": key, "date_from": date_from, "date_to": date_to} for key in keys]}))
+
+
+def test_get_object_list_empty_bucket(s3):
+    assert get_object_list(s3, BUCKET) == []
+
+
+def test_get_object_list_paginates(s3):
+    for i in range(1005):
+        s3.put_object(Bucket=BUCKET, Key=f"archive/past_data_{i:04}.csv", Body=b"")
+    s3.put_object(Bucket=BUCKET, Key="other/past_data.csv", Body=b"")
+
+    assert len(get_object_list(s3, BUCKET, prefix="archive/")) == 1005
+
+
+@pytest.mark.parametrize("key, date_range", [
+    ("archive/parquet/date=2026-01-27/past_data_2026-01-28T000000.parquet",
+     (date(2026, 1, 27), date(2026, 1, 27))),
+    ("archive/past_data_2026-01-28T000000.csv", (None, date(2026, 1, 27))),
+    ("archive/dimensions/plant_2026-01-28T000000.csv", (date(2026, 1, 28), date(2026, 1, 28))),
+    ("archive/past_data.csv", (None, None))])
+def test_get_key_date_range(key, date_range):
+    assert get_key_date_range(key) == date_range
+
+
+def test_catalogue_lists_without_manifest(s3):
+    s3.put_object(Bucket=BUCKET, Key="archive/past_data_2026-01-28T000000.csv", Body=b"")
+    s3.put_object(Bucket=BUCKET, Key="archive/past_data_2026-02-28T000000.csv", Body=b"")
+
+    catalogue = make_catalogue(s3)
+
+    assert catalogue.get_keys(date(2026, 1, 1), date(2026, 1, 27)) == [
+        "archive/past_data_2026-01-28T000000.csv", "archive/past_data_2026-02-28T000000.csv"]
+    assert catalogue.get_keys(date(2026, 2, 1), date(2026, 2, 27)) == [
+        "archive/past_data_2026-02-28T000000.csv"]
+    assert catalogue.get_keys(date(2026, 2, 28), date(2026, 2, 28)) == []
+
+
+def test_catalogue_filters_on_recorded_dates(s3):
+    put_manifest(s3, ["archive/past_data_2026-02-01T000000.csv"])
+    catalogue = make_catalogue(s3)
+
+    assert catalogue.get_keys(date(2026, 1, 25), date(2026, 1, 26)) == [
+        "archive/past_data_2026-02-01T000000.csv"]
+    assert catalogue.get_keys(date(2026, 2, 1), date(2026, 2, 1)) == []
+    assert catalogue.get_keys(date(2026, 1, 1), date(2026, 1, 19)) == []
+
+
+def test_catalogue_dates_old_manifest_entries_from_key(s3):
+    s3.put_object(Bucket=BUCKET, Key="archive/manifest.json", Body=json.dumps({"objects": [
+        {"key": "archive/past_data_2026-02-01T000000.csv", "date": "2026-02-01"}]}))
+
+    assert make_catalogue(s3).get_keys(date(2026, 2, 1), date(2026, 2, 1)) == []
+
+
+def test_catalogue_reads_manifest_once_within_ttl(s3):
+    put_manifest(s3, ["archive/past_data_2026-01-28T000000.csv"])
+    catalogue = make_catalogue(s3)
+
+    assert catalogue.get_keys() == ["archive/past_data_2026-01-28T000000.csv"]
+
+    put_manifest(s3, ["archive/past_data_2026-01-29T000000.csv"])
+
+    assert catalogue.get_keys() == ["archive/past_data_2026-01-28T000000.csv"]
+
+
+def test_catalogue_reloads_changed_manifest(s3):
+    put_manifest(s3, ["archive/past_data_2026-01-28T000000.csv"])
+    catalogue = make_catalogue(s3, ttl_seconds=0)
+    catalogue.get_keys()
+
+    etag = catalogue.etag
+    catalogue.get_keys()
+    assert catalogue.etag == etag
+
+    put_manifest(s3, ["archive/past_data_2026-01-29T000000.csv"])
+
+    assert catalogue.get_keys() == ["archive/past_data_2026-01-29T000000.csv"]
+
+
+def test_catalogue_urls_reused(s3):
+    catalogue = make_catalogue(s3)
+    keys = ["archive/past_data_2026-01-28T000000.csv", "archive/past_data_2026-01-29T000000.csv"]
+
+    urls = catalogue.get_urls(keys)
+
+    assert set(urls) == set(keys)
+    assert "X-Amz-Signature" in urls[keys[0]] or "Signature" in urls[keys[0]]
+    assert catalogue.get_urls(keys) == urls
+
+
+def test_catalogue_lists_dimensions_separately(s3):
+    put_manifest(s3, ["archive/past_data_2026-01-28T000000.csv",
+                      "archive/dimensions/plant_2026-01-28T000000.csv"])
+    catalogue = make_catalogue(s3)
+
+    assert catalogue.get_keys() == ["archive/past_data_2026-01-28T000000.csv"]
+    assert catalogue.get_keys(kind="dimension") == ["archive/dimensions/plant_2026-01-28T000000.csv"]
+
+
+def test_catalogue_urls_pruned(s3):
+    put_manifest(s3, ["archive/past_data_2026-01-28T000000.csv"])
+    catalogue = make_catalogue(s3, ttl_seconds=0)
+    catalogue.get_urls(catalogue.get_keys())
+    catalogue.urls["archive/expired.csv"] = ("https://expired", datetime(2026, 1, 1))
+
+    catalogue.get_urls([])
+    assert list(catalogue.urls) == ["archive/past_data_2026-01-28T000000.csv"]
+
+    put_manifest(s3, ["archive/past_data_2026-01-29T000000.csv"])
+    catalogue.get_keys()
+
+    assert catalogue.urls == {}
@@ -0,0 +1,97 @@
+"""Testing shared_data.py"""
+
+# pylint:skip-file
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("connectorx")
+pytest.importorskip("pyodbc")
+
+import shared_data
+from shared_data import SharedRecordings, summarise_plants
+from store import LatestReadings
+
+
+def make_recordings(first_id: int, count: int) -> pd.DataFrame:
+    now = datetime.now()
+    return pd.DataFrame({
+        "recording_id": range(first_id, first_id + count),
+        "plant_id": [1 + i % 2 for i in range(count)],
+        "common_name": [["Bird of paradise", "Cactus"][i % 2] for i in range(count)],
+        "recording_taken": [now - timedelta(minutes=count - i) for i in range(count)],
+        "temperature": [float(i) for i in range(count)],
+        "soil_moisture": [90.0] * count
+    })
+
+
+@pytest.fixture
+def fake_loaders(monkeypatch):
+    calls = []
+
+    def fake_load_data(past_mins):
+        calls.append(("load_data", past_mins))
+        return make_recordings(1, 10)
+
+    def fake_load_new_data(last_recording_id):
+        calls.append(("load_new_data", last_recording_id))
+        table = make_recordings(1, 12)
+        return table[table["recording_id"] > last_recording_id]
+
+    monkeypatch.setattr(shared_data, "load_data", fake_load_data)
+    monkeypatch.setattr(shared_data, "load_new_data", fake_load_new_data)
+    return calls
+
+
+def test_snapshot_shared_within_ttl(fake_loaders):
+    shared = SharedRecordings(ttl_seconds=60, max_rows=1000)
+
+    first = shared.get_snapshot()
+    second = shared.get_snapshot()
+
+    assert first is second
+    assert fake_loaders == [("load_data", 1440)]
+
+
+def test_stale_snapshot_loads_only_new_rows(fake_loaders):
+    shared = SharedRecordings(ttl_seconds=0, max_rows=1000)
+
+    shared.get_snapshot()
+    recordings, summary, alerts = shared.get_snapshot()
+
+    assert fake_loaders == [("load_data", 1440), ("load_new_data", 0)]
+    assert len(recordings) == 12
+    assert recordings["temperature"].dtype == "float32"
+    assert summary.loc["Bird of paradise", "reading_count"] == 6
+    highest_temperatures = alerts.extremes[("temperature", True)]
+    assert list(highest_temperatures["common_name"]) == ["Cactus", "Bird of paradise"]
+
+
+def test_plant_that_stops_reporting_ages_out(monkeypatch):
+    recordings = make_recordings(1, 10)
+    recordings.loc[recordings["common_name"] == "Cactus", "recording_taken"] -= timedelta(days=2)
+    recordings.loc[recordings["common_name"] == "Cactus", "temperature"] = 40.0
+    monkeypatch.setattr(shared_data, "load_data", lambda past_mins: recordings)
+
+    shared = SharedRecordings(ttl_seconds=60, max_rows=1000)
+    _, summary, alerts = shared.get_snapshot()
+
+    assert list(summary.index) == ["Bird of paradise"]
+    assert shared.latest.get("Cactus") is None
+    assert list(alerts.extremes[("temperature", True)]["common_name"]) == ["Bird of paradise"]
+    assert "Cactus" not in set(alerts.active["common_name"])
+
+
+def test_summarise_plants_latest_reading():
+    recordings = make_recordings(1, 10)
+    latest = LatestReadings()
+    latest.update(recordings)
+
+    summary = summarise_plants(recordings, latest)
+
+    assert summary.loc["Cactus", "temperature"] == 9.0
+    assert summary.loc["Cactus", "temperature_min"] == 1.0
+    assert summary.loc["Bird of paradise", "temperature_max"] == 8.0
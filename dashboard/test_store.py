@@ -0,0 +1,142 @@
+"""Testing store.py"""
+
+# pylint:skip-file
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from store import RecordingStore, LatestReadings
+
+START = datetime(2026, 1, 27, 12)
+
+
+def make_recordings(first_id: int, count: int, start: datetime) -> pd.DataFrame:
+    return pd.DataFrame({
+        "recording_id": range(first_id, first_id + count),
+        "plant_id": [1] * count,
+        "common_name": ["Bird of paradise"] * count,
+        "recording_taken": [start + timedelta(minutes=i) for i in range(count)],
+        "temperature": [15.0] * count,
+        "soil_moisture": [90.0] * count
+    })
+
+
+def test_append_moves_watermark():
+    store = RecordingStore()
+    store.append(make_recordings(1, 10, START))
+
+    assert store.last_recording_id == 10
+    assert len(store.frame()) == 10
+
+
+def test_append_keeps_one_copy_of_overlapping_rows():
+    store = RecordingStore()
+    store.append(make_recordings(1, 10, START))
+    store.append(make_recordings(6, 10, START + timedelta(minutes=5)))
+
+    frame = store.frame()
+    assert len(frame) == 15
+    assert frame["recording_id"].is_unique
+    assert store.last_recording_id == 15
+
+
+def test_append_adds_late_committed_lower_ids():
+    store = RecordingStore(overlap_ids=5)
+    store.append(make_recordings(1, 10, START))
+    store.append(make_recordings(12, 1, START + timedelta(minutes=11)))
+
+    assert store.reload_from_id == 7
+
+    added = store.append(make_recordings(8, 6, START + timedelta(minutes=7)))
+
+    assert added["recording_id"].tolist() == [11, 13]
+    assert sorted(store.frame()["recording_id"]) == list(range(1, 14))
+    assert store.last_recording_id == 13
+
+
+def test_append_ignores_ids_below_overlap():
+    store = RecordingStore(overlap_ids=5)
+    store.append(make_recordings(1, 20, START))
+
+    assert store.append(make_recordings(1, 15, START)).empty
+    assert store.row_count == 20
+
+
+def test_evict_removes_only_old_rows():
+    store = RecordingStore(window=timedelta(minutes=30))
+    store.append(make_recordings(1, 20, START))
+    store.append(make_recordings(21, 20, START + timedelta(minutes=20)))
+
+    evicted = store.evict(START + timedelta(minutes=55))
+
+    frame = store.frame()
+    assert evicted == 25
+    assert frame["recording_taken"].min() == START + timedelta(minutes=25)
+    assert frame["recording_id"].tolist() == list(range(26, 41))
+
+
+def test_frame_empty_store():
+    store = RecordingStore()
+    store.append(make_recordings(1, 0, START))
+
+    assert store.frame().empty
+    assert "common_name" in store.frame().columns
+    assert store.evict(START) == 0
+
+
+def test_trim_keeps_newest_rows():
+    store = RecordingStore()
+    store.append(make_recordings(1, 20, START))
+    store.append(make_recordings(21, 20, START + timedelta(minutes=20)))
+
+    assert store.trim(15) == 25
+    assert store.row_count == 15
+    assert store.frame()["recording_id"].tolist() == list(range(26, 41))
+
+
+def test_latest_readings_updated_from_new_rows():
+    latest = LatestReadings()
+    latest.update(make_recordings(1, 10, START))
+    latest.update(make_recordings(11, 5, START + timedelta(minutes=10)))
+
+    assert latest.get("Bird of paradise")["recording_id"] == 15
+    assert latest.get("Cactus") is None
+
+
+def test_latest_readings_ignores_older_rows():
+    latest = LatestReadings()
+    latest.update(make_recordings(11, 5, START + timedelta(minutes=10)))
+
+    assert latest.update(make_recordings(1, 5, START)) == []
+    assert latest.get("Bird of paradise")["recording_taken"] == START + timedelta(minutes=14)
+    assert list(latest.frame().index) == ["Bird of paradise"]
+
+
+def test_latest_readings_evicts_plants_older_than_cutoff():
+    latest = LatestReadings()
+    latest.update(make_recordings(1, 5, START))
+    latest.update(make_recordings(6, 5, START + timedelta(hours=2)).assign(common_name="Cactus"))
+
+    assert latest.evict(START + timedelta(hours=1)) == ["Bird of paradise"]
+    assert latest.get("Bird of paradise") is None
+    assert list(latest.frame().index) == ["Cactus"]
+    assert latest.evict(START + timedelta(hours=1)) == []
+
+
+def test_late_older_row_kept_in_time_order_and_evicted():
+    store = RecordingStore()
+    store.append(make_recordings(1, 10, START))
+    store.append(make_recordings(11, 5, START + timedelta(minutes=10)))
+    store.append(make_recordings(16, 2, START + timedelta(minutes=2, seconds=30)).iloc[[0]]
+                 .assign(recording_id=[17]))
+    store.append(make_recordings(20, 1, START + timedelta(minutes=15)))
+
+    assert store.frame()["recording_taken"].is_monotonic_increasing
+    assert list(store.frame()["recording_id"][:4]) == [1, 2, 3, 17]
+
+    store.evict(START + timedelta(days=1, minutes=3))
+
+    assert store.frame()["recording_taken"].min() == START + timedelta(minutes=3)
+    assert 17 not in set(store.frame()["recording_id"])
+    assert store.row_count == len(store.frame()) == 13
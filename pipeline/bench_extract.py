@@ -0,0 +1,103 @@
+"""Benchmark for the extract stage, replaying it against a local stub of the plant API.
+
+Reports the connections opened and the wall time of each run, both with the shared
+session reused between runs (as on warm Lambda invocations) and with a fresh session per run.
+
+    python bench_extract.py --plants 50 --runs 5 --latency 20
+"""
+
+import asyncio
+from argparse import ArgumentParser
+from threading import Thread, Event
+from time import perf_counter
+
+from aiohttp import web
+
+import extract
+
+
+def build_stub_app(plant_count: int, latency: float, connections: set) -> web.Application:
+    """Returns a web app that serves fake plants with ids 1 to plant count.
+    Every connection a request arrives on is added to the connections set."""
+
+    async def get_plant(request: web.Request) -> web.Response:
+        connections.add(request.transport)
+        await asyncio.sleep(latency)
+
+        id = int(request.match_info["id"])
+
+        if id > plant_count:
+            return web.json_response({"error": "plant not found", "plant_id": id}, status=404)
+
+        return web.json_response({
+            "plant_id": id,
+            "name": f"Plant {id}",
+            "temperature": 15.0,
+            "soil_moisture": 90.0
+        })
+
+    app = web.Application()
+    app.router.add_get("/api/plants/{id}", get_plant)
+
+    return app
+
+
+def start_stub_server(app: web.Application, port: int) -> None:
+    """Runs the stub app on a background thread until the process exits."""
+
+    started = Event()
+
+    def serve():
+        loop = asyncio.new_event_loop()
+        runner = web.AppRunner(app)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", port).start())
+        started.set()
+        loop.run_forever()
+
+    Thread(target=serve, daemon=True).start()
+    started.wait()
+
+
+def run_benchmark(runs: int, connections: set, reuse_session: bool) -> None:
+    """Runs the extract stage several times, printing connections opened and wall time per run."""
+
+    extract.KNOWN_ID_RANGE["max_id"] = 0
+    loop = extract.get_event_loop()
+
+    print(f"\n{'Shared' if reuse_session else 'Fresh'} session:")
+
+    for run in range(1, runs + 1):
+        if not reuse_session:
+            loop.run_until_complete(extract.close_session())
+
+        connections_before = len(connections)
+        start_time = perf_counter()
+        plants = extract.extract()
+
+        print(f"  run {run}: {len(plants)} plants, "
+              f"{len(connections) - connections_before} connections opened, "
+              f"{perf_counter() - start_time:.3f}s")
+
+    loop.run_until_complete(extract.close_session())
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("--plants", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=20,
+                        help="Stub response latency in milliseconds.")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    opened_connections = set()
+
+    start_stub_server(build_stub_app(
+        args.plants, args.latency / 1000, opened_connections), args.port)
+
+    extract.PLANT_ENDPOINT = f"http://127.0.0.1:{args.port}/api/plants/"
+
+    run_benchmark(args.runs, opened_connections, reuse_session=False)
+    run_benchmark(args.runs, opened_connections, reuse_session=True)
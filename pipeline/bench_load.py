@@ -0,0 +1,128 @@
+"""Benchmark for the beta.recording bulk writers.
+
+Times each writer in load.RECORDING_WRITERS on synthetic recordings. Needs a database with
+schema.sql applied, configured through the usual .env variables. A local SQL Server container
+works as a stand-in for the RDS:
+
+    docker run -e ACCEPT_EULA=Y -e MSSQL_SA_PASSWORD=<password> -p 1433:1433 \
+        mcr.microsoft.com/mssql/server:2022-latest
+
+    python bench_load.py --sizes 1000 10000 100000
+
+Every recording inserted by the benchmark is deleted again afterwards.
+"""
+
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import environ as ENV
+from random import random
+from time import perf_counter
+
+import pandas as pd
+import pyodbc
+from dotenv import load_dotenv
+
+from load import get_db_connection, create_inserted_recordings_table, RECORDING_WRITERS
+
+
+def get_dimension_ids(conn: pyodbc.Connection) -> dict:
+    """Returns an existing id from each dimension table, creating rows where a table is empty."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            IF NOT EXISTS (SELECT 1 FROM beta.country)
+                INSERT INTO beta.country (country_name) VALUES ('Benchmark');
+            IF NOT EXISTS (SELECT 1 FROM beta.botanist)
+                INSERT INTO beta.botanist (botanist_name) VALUES ('Benchmark');
+            IF NOT EXISTS (SELECT 1 FROM beta.plant)
+                INSERT INTO beta.plant (common_name) VALUES ('Benchmark');
+            IF NOT EXISTS (SELECT 1 FROM beta.plant_image)
+                INSERT INTO beta.plant_image (licence) VALUES (0);
+            IF NOT EXISTS (SELECT 1 FROM beta.origin_location)
+                INSERT INTO beta.origin_location (origin_city_name, country_id)
+                SELECT 'Benchmark', MIN(country_id) FROM beta.country;
+            """)
+        cur.execute("""
+            SELECT
+                (SELECT MIN(plant_id) FROM beta.plant),
+                (SELECT MIN(botanist_id) FROM beta.botanist),
+                (SELECT MIN(origin_location_id) FROM beta.origin_location),
+                (SELECT MIN(image_id) FROM beta.plant_image);
+            """)
+        plant_id, botanist_id, origin_location_id, image_id = cur.fetchone()
+
+    conn.commit()
+
+    return {
+        "plant_id": plant_id,
+        "botanist_id": botanist_id,
+        "origin_location_id": origin_location_id,
+        "image_id": image_id
+    }
+
+
+def generate_recordings(count: int, dimension_ids: dict) -> pd.DataFrame:
+    """Returns a dataframe of synthetic recordings, as passed to the writers."""
+
+    start = datetime(2000, 1, 1)
+
+    return pd.DataFrame({
+        **{column: [id] * count for column, id in dimension_ids.items()},
+        "last_watered": [start] * count,
+        "recording_taken": [start + timedelta(seconds=i) for i in range(count)],
+        "soil_moisture": pd.Series([random() * 100 for _ in range(count)], dtype="float64"),
+        "temperature": pd.Series([random() * 30 for _ in range(count)], dtype="float64")
+    })
+
+
+def get_max_recording_id(conn: pyodbc.Connection) -> int:
+    """Returns the highest recording id, or 0 if there are no recordings."""
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(MAX(recording_id), 0) FROM beta.recording;")
+        return cur.fetchone()[0]
+
+
+def time_writer(conn: pyodbc.Connection, writer_name: str, recordings: pd.DataFrame) -> float:
+    """Returns the time taken in seconds for a writer to insert and commit the recordings.
+    Deletes the inserted recordings afterwards."""
+
+    max_id = get_max_recording_id(conn)
+    create_inserted_recordings_table(conn)
+
+    start_time = perf_counter()
+    RECORDING_WRITERS[writer_name](conn, recordings)
+    conn.commit()
+    time_taken = perf_counter() - start_time
+
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM beta.recording WHERE recording_id > ?;", (max_id,))
+    conn.commit()
+
+    return time_taken
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    connection = get_db_connection(ENV)
+
+    try:
+        ids = get_dimension_ids(connection)
+
+        print(f"{'rows':>8} " + " ".join(f"{name + ' (s)':>16}" for name in RECORDING_WRITERS))
+
+        for size in args.sizes:
+            synthetic_recordings = generate_recordings(size, ids)
+            times = [time_writer(connection, name, synthetic_recordings)
+                     for name in RECORDING_WRITERS]
+
+            print(f"{size:>8} " + " ".join(f"{time_taken:>16.3f}" for time_taken in times))
+    finally:
+        connection.close()
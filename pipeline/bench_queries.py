@@ -0,0 +1,162 @@
+"""Benchmark for the queries that read and delete beta.recording by time.
+
+Seeds synthetic readings for a set of benchmark plants (one per plant per minute, going back
+from now), then times the dashboard and archive queries. Run it before and after
+`python migrate.py` to compare plans. Needs a database configured through the usual .env
+variables, ideally a local SQL Server container rather than the live RDS.
+
+    python bench_queries.py --seed --plants 50 --days 42    # about 3 million rows
+    python bench_queries.py
+    python bench_queries.py --cleanup
+"""
+
+from argparse import ArgumentParser
+from os import environ as ENV
+from time import perf_counter
+
+import pyodbc
+from dotenv import load_dotenv
+
+from load import get_db_connection
+
+BENCHMARK_PLANT_PREFIX = "Benchmark plant"
+
+QUERIES = {
+    "dashboard refresh (1 min)": """
+        SELECT r.plant_id, p.common_name, recording_taken, temperature, soil_moisture
+        FROM beta.recording r JOIN beta.plant p
+        ON (r.plant_id=p.plant_id)
+        WHERE recording_taken >= DATEADD(minute, -1, GETDATE())
+        ORDER BY recording_taken;
+        """,
+    "dashboard load (24 hours)": """
+        SELECT r.plant_id, p.common_name, recording_taken, temperature, soil_moisture
+        FROM beta.recording r JOIN beta.plant p
+        ON (r.plant_id=p.plant_id)
+        WHERE recording_taken >= DATEADD(minute, -1440, GETDATE())
+        ORDER BY recording_taken;
+        """,
+    "one plant (24 hours)": """
+        SELECT recording_taken, temperature, soil_moisture
+        FROM beta.recording
+        WHERE plant_id = (SELECT MIN(plant_id) FROM beta.plant WHERE common_name LIKE 'Benchmark plant%')
+        AND recording_taken >= DATEADD(minute, -1440, GETDATE());
+        """,
+    "latest per plant": """
+        SELECT plant_id, MAX(recording_taken)
+        FROM beta.recording
+        GROUP BY plant_id;
+        """,
+    "archive export (older than 24 hours)": """
+        SELECT
+            plant_id, botanist_id, origin_location_id, last_watered,
+            image_id, recording_taken, soil_moisture, temperature
+        FROM beta.recording
+        WHERE recording_taken < DATEADD(hour, -24, GETUTCDATE());
+        """,
+    "archive delete range (count only)": """
+        SELECT COUNT(*)
+        FROM beta.recording
+        WHERE recording_taken < DATEADD(hour, -24, GETUTCDATE());
+        """
+}
+
+
+def seed_recordings(conn: pyodbc.Connection, plant_count: int, days: int) -> None:
+    """Inserts one synthetic reading per benchmark plant per minute over the given number of days.
+    The rows are generated server-side, one plant at a time."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT MIN(botanist_id), MIN(origin_location_id), MIN(image_id)
+            FROM beta.botanist, beta.origin_location, beta.plant_image;
+            """)
+        botanist_id, origin_location_id, image_id = cur.fetchone()
+
+        for plant_number in range(1, plant_count + 1):
+            cur.execute(
+                "INSERT INTO beta.plant (common_name) OUTPUT inserted.plant_id VALUES (?);",
+                (f"{BENCHMARK_PLANT_PREFIX} {plant_number}",))
+            plant_id = cur.fetchone()[0]
+
+            cur.execute("""
+                WITH digit AS (
+                    SELECT n FROM (VALUES (0), (1), (2), (3), (4), (5), (6), (7), (8), (9)) AS d(n)
+                ),
+                minute_number AS (
+                    SELECT TOP (?) a.n + 10 * b.n + 100 * c.n + 1000 * d.n + 10000 * e.n + 100000 * f.n AS n
+                    FROM digit a, digit b, digit c, digit d, digit e, digit f
+                )
+                INSERT INTO beta.recording (
+                    plant_id, botanist_id, origin_location_id, last_watered,
+                    image_id, recording_taken, soil_moisture, temperature
+                )
+                SELECT
+                    ?, ?, ?, DATEADD(minute, -n - 30, GETUTCDATE()),
+                    ?, DATEADD(minute, -n, GETUTCDATE()), 50 + n % 40, 10 + n % 15
+                FROM minute_number;
+                """, (days * 24 * 60, plant_id, botanist_id, origin_location_id, image_id))
+
+            conn.commit()
+            print(f"Seeded plant {plant_number} of {plant_count}.")
+
+
+def cleanup_recordings(conn: pyodbc.Connection) -> None:
+    """Deletes the benchmark plants and their readings, in batches."""
+
+    with conn.cursor() as cur:
+        deleted = 1
+        while deleted:
+            cur.execute("""
+                DELETE TOP (50000) FROM beta.recording
+                WHERE plant_id IN (SELECT plant_id FROM beta.plant WHERE common_name LIKE ?);
+                """, (f"{BENCHMARK_PLANT_PREFIX}%",))
+            deleted = cur.rowcount
+            conn.commit()
+
+        cur.execute("DELETE FROM beta.plant WHERE common_name LIKE ?;",
+                    (f"{BENCHMARK_PLANT_PREFIX}%",))
+        conn.commit()
+
+
+def time_queries(conn: pyodbc.Connection, repeats: int) -> None:
+    """Prints the best time and row count of each query over several runs."""
+
+    print(f"{'query':<40} {'rows':>10} {'best (s)':>10}")
+
+    with conn.cursor() as cur:
+        for name, query in QUERIES.items():
+            times = []
+
+            for _ in range(repeats):
+                start_time = perf_counter()
+                cur.execute(query)
+                row_count = len(cur.fetchall())
+                times.append(perf_counter() - start_time)
+
+            print(f"{name:<40} {row_count:>10} {min(times):>10.3f}")
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("--seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+    parser.add_argument("--plants", type=int, default=50)
+    parser.add_argument("--days", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    load_dotenv()
+
+    connection = get_db_connection(ENV)
+
+    try:
+        if args.cleanup:
+            cleanup_recordings(connection)
+        elif args.seed:
+            seed_recordings(connection, args.plants, args.days)
+        else:
+            time_queries(connection, args.repeats)
+    finally:
+        connection.close()
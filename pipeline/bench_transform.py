@@ -0,0 +1,120 @@
+"""Benchmark for building the dataframe from API records.
+
+Compares the columnar build_dataframe against the previous row-by-row version
+on synthetic records.
+
+    python bench_transform.py --sizes 1000 100000 1000000
+"""
+
+from argparse import ArgumentParser
+from random import random, choice
+from time import perf_counter
+
+import pandas as pd
+
+from transform import build_dataframe
+
+
+def build_dataframe_rowwise(records: list[dict]) -> pd.DataFrame:
+    """The previous build_dataframe, which builds a dict per record."""
+    rows = []
+
+    for r in records:
+        images = r.get("images") or {}
+
+        rows.append({
+            "plant_id": r["plant_id"],
+            "plant_name": r["name"],
+            "scientific_name": "; ".join(r["scientific_name"])
+            if "scientific_name" in r and r["scientific_name"]
+            else None,
+
+            "botanist_name": r["botanist"]["name"],
+            "email": r["botanist"]["email"],
+            "phone": r["botanist"]["phone"],
+
+            "origin_city": r["origin_location"]["city"],
+            "origin_country": r["origin_location"]["country"],
+            "latitude": r["origin_location"]["latitude"],
+            "longitude": r["origin_location"]["longitude"],
+
+            "license": images.get("license"),
+            "license_name": images.get("license_name"),
+            "license_url": images.get("license_url"),
+            "thumbnail": images.get("thumbnail"),
+
+            "last_watered": r["last_watered"],
+            "recording_taken": r["recording_taken"],
+            "soil_moisture": r["soil_moisture"],
+            "temperature": r["temperature"],
+        })
+
+    return pd.DataFrame(rows)
+
+
+def generate_records(count: int) -> list[dict]:
+    """Returns synthetic API records. Some have no images or scientific name."""
+
+    records = []
+
+    for id in range(1, count + 1):
+        record = {
+            "plant_id": id,
+            "name": f"Plant {id % 50}",
+            "scientific_name": [f"Plantus {id % 50}"] if id % 7 else [],
+            "botanist": {
+                "name": choice(["Anna Davis", "Virginia Phillips"]),
+                "email": "botanist@lnhm.co.uk",
+                "phone": "8273002266"
+            },
+            "origin_location": {
+                "city": "South Tina",
+                "country": "Nauru",
+                "latitude": "-60.9363685",
+                "longitude": "-152.763324"
+            },
+            "last_watered": "2026-01-27T14:47:07",
+            "recording_taken": "2026-01-27T16:04:39.600475",
+            "soil_moisture": random() * 100,
+            "temperature": random() * 30
+        }
+
+        if id % 3:
+            record["images"] = {
+                "license": 451,
+                "license_name": "Universal",
+                "license_url": "license.com",
+                "thumbnail": "thumbnail.com"
+            }
+
+        records.append(record)
+
+    return records
+
+
+def time_function(function, records: list[dict]) -> float:
+    """Returns the time taken in seconds to call the function on the records."""
+
+    start_time = perf_counter()
+    function(records)
+
+    return perf_counter() - start_time
+
+
+if __name__ == "__main__":
+
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'row-wise (s)':>14} {'columnar (s)':>14} {'speed-up':>10}")
+
+    for size in args.sizes:
+        synthetic_records = generate_records(size)
+
+        rowwise_time = time_function(build_dataframe_rowwise, synthetic_records)
+        columnar_time = time_function(build_dataframe, synthetic_records)
+
+        print(f"{size:>10} {rowwise_time:>14.3f} {columnar_time:>14.3f} "
+              f"{rowwise_time / columnar_time:>9.1f}x")
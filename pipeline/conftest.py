@@ -2,8 +2,78 @@
 
 # pylint:skip-file
 
+import sqlite3
+from datetime import datetime
+
 import pytest
 
+FAKE_DB_SCHEMA = """
+CREATE TABLE beta.country (country_id INTEGER PRIMARY KEY AUTOINCREMENT, country_name TEXT NOT NULL);
+CREATE TABLE beta.botanist (botanist_id INTEGER PRIMARY KEY AUTOINCREMENT, botanist_name TEXT, email TEXT, phone TEXT);
+CREATE TABLE beta.plant (plant_id INTEGER PRIMARY KEY AUTOINCREMENT, common_name TEXT NOT NULL, scientific_name TEXT);
+CREATE TABLE beta.plant_image (image_id INTEGER PRIMARY KEY AUTOINCREMENT, licence INTEGER, licence_name TEXT, licence_url TEXT, thumbnail TEXT);
+CREATE TABLE beta.origin_location (origin_location_id INTEGER PRIMARY KEY AUTOINCREMENT, origin_city_name TEXT NOT NULL, country_id INTEGER NOT NULL, longitude REAL, latitude REAL);
+CREATE TABLE beta.recording (recording_id INTEGER PRIMARY KEY AUTOINCREMENT, plant_id INTEGER, botanist_id INTEGER, origin_location_id INTEGER, last_watered TIMESTAMP, image_id INTEGER, recording_taken TIMESTAMP, soil_moisture REAL, temperature REAL);
+"""
+
+
+class FakeCursor:
+    """A SQLite cursor that can be used like a pyodbc one, logging every statement it runs."""
+
+    def __init__(self, db, statements):
+        self.cursor = db.cursor()
+        self.statements = statements
+        self.fast_executemany = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cursor.close()
+
+    def execute(self, query, params=()):
+        self.statements.append(query)
+        self.cursor.execute(query, [to_sqlite(value) for value in params])
+        return self
+
+    def executemany(self, query, rows):
+        self.statements.append(query)
+        self.cursor.executemany(query, [[to_sqlite(value) for value in row] for row in rows])
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+
+class FakeConnection:
+    """An in-memory SQLite database with the beta schema, standing in for SQL Server."""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:", detect_types=sqlite3.PARSE_DECLTYPES)
+        self.db.execute("ATTACH ':memory:' AS beta")
+        self.db.executescript(FAKE_DB_SCHEMA)
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self.db, self.statements)
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        pass
+
+
+def to_sqlite(value):
+    return value.isoformat(" ") if isinstance(value, datetime) else value
+
+
+@pytest.fixture
+def fake_db() -> FakeConnection:
+    return FakeConnection()
+
 
 @pytest.fixture
 def test_plant_data() -> list[dict]:
@@ -1,7 +1,12 @@
 """Script for extracting data from the API."""
 
-from time import perf_counter
+import json
+from time import perf_counter, monotonic
 from logging import getLogger, basicConfig, INFO
+from os import environ as ENV
+from collections.abc import AsyncIterator
+from random import uniform
+from urllib.parse import urlparse
 
 import aiohttp
 import asyncio
@@ -9,48 +14,336 @@ import asyncio
 logger = getLogger(__name__)
 
 PLANT_ENDPOINT = "https://tools.sigmalabs.co.uk/api/plants/"
-BATCH_SIZE = 60
+PROBE_SIZE = int(ENV.get("EXTRACT_PROBE_SIZE", 60))
+CONCURRENCY_LIMIT = int(ENV.get("EXTRACT_CONCURRENCY_LIMIT", 60))
 
+CONNECT_TIMEOUT = float(ENV.get("EXTRACT_CONNECT_TIMEOUT", 3))
+READ_TIMEOUT = float(ENV.get("EXTRACT_READ_TIMEOUT", 5))
+# Total time allowed for extraction, so a minutely run finishes before the next one starts.
+EXTRACT_DEADLINE = float(ENV.get("EXTRACT_DEADLINE_SECONDS", 45))
+MAX_RETRIES = int(ENV.get("EXTRACT_MAX_RETRIES", 3))
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 4
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 
-async def get_plant_data(session: aiohttp.ClientSession, id: int) -> dict:
-    """Returns a single plant's data using its id. Requires a session object."""
+MAX_RESPONSE_BYTES = int(ENV.get("EXTRACT_MAX_RESPONSE_BYTES", 1_000_000))
+DNS_CACHE_TTL = 300
+KEEPALIVE_TIMEOUT = 60
 
-    async with session.get(PLANT_ENDPOINT + str(id)) as response:
-        data = await response.json()
-        return data
+CIRCUIT_FAILURE_THRESHOLD = 20
+CIRCUIT_COOLDOWN = 15
 
+# Per-host consecutive failure counts and the time each circuit was opened.
+CIRCUIT_BREAKERS = {}
 
-async def get_all_plants_data(batch_processing_size: int) -> list[dict]:
-    """Returns the data on all plants via the API.
-    Only stops when meeting consecutive errors dictated by batch processing size argument."""
+RUN_STATS = {
+    "latencies": [],
+    "retries": 0,
+    "giveups": 0,
+    "circuit_rejections": 0
+}
 
-    plants_data = []
-    plants_left = True
-    id_counter = 1
+# Event loop and client session reused across warm Lambda invocations.
+# A session can only be used on the event loop it was created on.
+SESSION_STATE = {
+    "loop": None,
+    "session": None,
+    "session_loop": None
+}
 
-    logger.info("Retrieving all plants data.")
+# Highest plant id seen by the last run. Kept between warm Lambda invocations.
+KNOWN_ID_RANGE = {
+    "max_id": 0
+}
+
+
+class ResponseTooLargeError(Exception):
+    """Raised when an API response body is larger than the allowed size."""
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Returns the event loop used for extraction, creating it on first use."""
+
+    if SESSION_STATE["loop"] is None or SESSION_STATE["loop"].is_closed():
+        SESSION_STATE["loop"] = asyncio.new_event_loop()
+
+    return SESSION_STATE["loop"]
+
+
+def get_session() -> aiohttp.ClientSession:
+    """Returns the shared client session for the running event loop, creating it if needed.
+    The connection pool keeps connections alive and caches DNS lookups between runs."""
+
+    session = SESSION_STATE["session"]
+    loop = asyncio.get_running_loop()
+
+    if session is None or session.closed or SESSION_STATE["session_loop"] is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=CONCURRENCY_LIMIT,
+            ttl_dns_cache=DNS_CACHE_TTL,
+            keepalive_timeout=KEEPALIVE_TIMEOUT
+        )
+        session = aiohttp.ClientSession(connector=connector)
+
+        SESSION_STATE["session"] = session
+        SESSION_STATE["session_loop"] = loop
+
+        logger.info("Created a new client session.")
+
+    return session
+
+
+async def close_session() -> None:
+    """Closes the shared client session if there is one."""
+
+    session = SESSION_STATE["session"]
+
+    if session is not None and not session.closed:
+        await session.close()
+
+    SESSION_STATE["session"] = None
+    SESSION_STATE["session_loop"] = None
+
+
+async def read_json(response: aiohttp.ClientResponse) -> dict:
+    """Returns the JSON body of a response.
+    Raises ResponseTooLargeError if the body is larger than the allowed size."""
+
+    if response.content_length is not None and response.content_length > MAX_RESPONSE_BYTES:
+        raise ResponseTooLargeError(
+            f"Response of {response.content_length} bytes is too large.")
+
+    body = bytearray()
+
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        body.extend(chunk)
+
+        if len(body) > MAX_RESPONSE_BYTES:
+            raise ResponseTooLargeError(
+                f"Response is larger than {MAX_RESPONSE_BYTES} bytes.")
+
+    return json.loads(body)
+
+
+def reset_run_stats() -> None:
+    """Clears the request stats ready for a new run."""
+
+    RUN_STATS["latencies"] = []
+    RUN_STATS["retries"] = 0
+    RUN_STATS["giveups"] = 0
+    RUN_STATS["circuit_rejections"] = 0
+
+
+def get_run_stats() -> dict:
+    """Returns a summary of the request stats of the current run."""
+
+    latencies = sorted(RUN_STATS["latencies"])
+
+    def percentile(fraction: float) -> float | None:
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+    return {
+        "requests": len(latencies),
+        "latency_p50": percentile(0.5),
+        "latency_p90": percentile(0.9),
+        "latency_p99": percentile(0.99),
+        "retries": RUN_STATS["retries"],
+        "giveups": RUN_STATS["giveups"],
+        "circuit_rejections": RUN_STATS["circuit_rejections"]
+    }
+
+
+def is_circuit_open(host: str) -> bool:
+    """Returns True if requests to the host should be rejected without being sent.
+    Once the cooldown has passed, the circuit lets requests through again
+    but reopens on the next failure."""
+
+    breaker = CIRCUIT_BREAKERS.get(host)
+
+    if breaker is None or breaker["opened_at"] is None:
+        return False
+
+    if monotonic() - breaker["opened_at"] < CIRCUIT_COOLDOWN:
+        return True
+
+    breaker["opened_at"] = None
+    breaker["failures"] = CIRCUIT_FAILURE_THRESHOLD - 1
+
+    return False
+
+
+def record_request_success(host: str) -> None:
+    """Closes the circuit for the host after a successful request."""
+
+    CIRCUIT_BREAKERS[host] = {"failures": 0, "opened_at": None}
+
+
+def record_request_failure(host: str) -> None:
+    """Counts a failed request to the host, opening its circuit after too many in a row."""
+
+    breaker = CIRCUIT_BREAKERS.setdefault(
+        host, {"failures": 0, "opened_at": None})
+    breaker["failures"] += 1
 
-    async with aiohttp.ClientSession() as session:
-        while plants_left:
-            tasks = [get_plant_data(session, id)
-                     for id in range(id_counter, id_counter + batch_processing_size)]
+    if breaker["failures"] >= CIRCUIT_FAILURE_THRESHOLD and breaker["opened_at"] is None:
+        breaker["opened_at"] = monotonic()
+        logger.warning(
+            f"Circuit opened for {host} after {breaker['failures']} consecutive failures.")
 
-            results = await asyncio.gather(*tasks)
 
-            errorless_results = [
-                result for result in results if "error" not in result.keys()]
+def get_backoff_delay(attempt: int) -> float:
+    """Returns a jittered exponential delay in seconds before the given retry attempt."""
 
-            if len(errorless_results) == 0:
-                plants_left = False
-            else:
-                plants_data.extend(errorless_results)
-                id_counter += batch_processing_size
+    return uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
 
-    logger.info("Retrieved all plants data.")
+
+async def get_plant_data(session: aiohttp.ClientSession, id: int, deadline: float) -> dict:
+    """Returns a single plant's data using its id. Requires a session object.
+    Timeouts, connection errors, retryable statuses and invalid JSON are retried with backoff
+    until the deadline (a monotonic time). If the request gives up, an error dict is returned."""
+
+    url = PLANT_ENDPOINT + str(id)
+    host = urlparse(url).netloc
+    attempt = 0
+
+    while True:
+        if is_circuit_open(host):
+            RUN_STATS["circuit_rejections"] += 1
+            return {"error": "Circuit open.", "plant_id": id}
+
+        remaining = deadline - monotonic()
+
+        if remaining <= 0:
+            RUN_STATS["giveups"] += 1
+            return {"error": "Extraction deadline passed.", "plant_id": id}
+
+        timeout = aiohttp.ClientTimeout(
+            total=remaining, connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        start_time = perf_counter()
+
+        try:
+            async with session.get(url, timeout=timeout) as response:
+                if response.status in RETRYABLE_STATUSES:
+                    response.raise_for_status()
+
+                data = await read_json(response)
+
+            RUN_STATS["latencies"].append(perf_counter() - start_time)
+            record_request_success(host)
+
+            return data
+
+        except ResponseTooLargeError as e:
+            RUN_STATS["giveups"] += 1
+            logger.warning(f"Gave up on plant {id}: {e}")
+            return {"error": str(e), "plant_id": id}
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            RUN_STATS["latencies"].append(perf_counter() - start_time)
+            record_request_failure(host)
+
+            delay = get_backoff_delay(attempt)
+
+            if attempt >= MAX_RETRIES or monotonic() + delay >= deadline:
+                RUN_STATS["giveups"] += 1
+                logger.warning(
+                    f"Gave up on plant {id} after {attempt + 1} attempts: {e!r}")
+                return {"error": repr(e), "plant_id": id}
+
+            RUN_STATS["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+
+async def get_bounded_plant_data(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                                 id: int, deadline: float) -> dict:
+    """Returns a single plant's data once the semaphore allows another request."""
+
+    async with semaphore:
+        return await get_plant_data(session, id, deadline)
+
+
+async def iter_plants_data(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                           ids: range, deadline: float) -> AsyncIterator[dict]:
+    """Yields the data of every plant found among the given ids as each response arrives."""
+
+    tasks = [get_bounded_plant_data(session, semaphore, id, deadline)
+             for id in ids]
+
+    for task in asyncio.as_completed(tasks):
+        result = await task
+
+        if "error" not in result.keys():
+            yield result
+
+
+async def stream_all_plants_data(session: aiohttp.ClientSession, concurrency_limit: int,
+                                 probe_size: int) -> AsyncIterator[dict]:
+    """Yields the data on all plants via the API as each response arrives.
+    Every id in the last known range is requested at once, then ids past the highest plant found
+    are probed until there are probe size consecutive ids with no plant."""
+
+    semaphore = asyncio.Semaphore(concurrency_limit)
+    deadline = monotonic() + EXTRACT_DEADLINE
+    top_id = 0
+    ids = range(1, KNOWN_ID_RANGE["max_id"] + probe_size + 1)
+
+    while ids:
+        async for plant in iter_plants_data(session, semaphore, ids, deadline):
+            top_id = max(top_id, plant["plant_id"])
+            yield plant
+
+        ids = range(ids[-1] + 1, top_id + probe_size + 1)
+
+    if top_id:
+        KNOWN_ID_RANGE["max_id"] = top_id
+
+
+async def get_all_plants_data(concurrency_limit: int, probe_size: int) -> list[dict]:
+    """Returns the data on all plants via the API.
+    At most concurrency limit requests are in flight at once."""
+
+    logger.info("Retrieving all plants data.")
+
+    reset_run_stats()
+
+    plants_data = [plant async for plant in stream_all_plants_data(
+        get_session(), concurrency_limit, probe_size)]
+
+    logger.info(
+        f"Retrieved all plants data. Known plant ids now run up to {KNOWN_ID_RANGE['max_id']}.")
+    logger.info(f"Request stats: {get_run_stats()}")
 
     return plants_data
 
 
+async def extract_in_batches(batch_size: int) -> AsyncIterator[list[dict]]:
+    """Yields the data on all plants via the API in batches of up to batch size plants,
+    as soon as each batch has arrived."""
+
+    logger.info("Retrieving all plants data in batches.")
+
+    reset_run_stats()
+
+    batch = []
+
+    async for plant in stream_all_plants_data(get_session(), CONCURRENCY_LIMIT, PROBE_SIZE):
+        batch.append(plant)
+
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+    logger.info(
+        f"Retrieved all plants data. Known plant ids now run up to {KNOWN_ID_RANGE['max_id']}.")
+    logger.info(f"Request stats: {get_run_stats()}")
+
+
 def extract() -> list[dict]:
     """Extracts all data from the API and returns it. Takes care of async requests."""
 
@@ -60,7 +353,8 @@ def extract() -> list[dict]:
 
     start_time = perf_counter()
 
-    data = asyncio.run(get_all_plants_data(batch_processing_size=BATCH_SIZE))
+    data = get_event_loop().run_until_complete(get_all_plants_data(
+        concurrency_limit=CONCURRENCY_LIMIT, probe_size=PROBE_SIZE))
 
     logger.info(
         f"Extraction finished with time taken: {perf_counter() - start_time} seconds.")
@@ -1,15 +1,16 @@
 """Script for uploading the cleaned data to the RDS (SQL Server)."""
 
+import json
 from time import perf_counter
 from logging import getLogger, basicConfig, INFO
 from os import environ as ENV, _Environ
 
 import pyodbc
 from dotenv import load_dotenv
-from pandas import DataFrame
+from pandas import DataFrame, Timedelta, Timestamp, to_datetime
 
 from extract import extract
-from transform import transform_data
+from transform import transform_data, get_stats_from_sums
 
 
 logger = getLogger(__name__)
@@ -18,9 +19,107 @@ ID_CACHE = {
     "country_ids": {},
     "botanist_ids": {},
     "plant_ids": {},
+    "origin_location_ids": {},
     "image_ids": {}
 }
 
+CACHE_STATS = {
+    "hits": 0,
+    "misses": 0
+}
+
+# Row count and largest id of each dimension table when ID_CACHE was last checked against it.
+ID_CACHE_FINGERPRINTS = {}
+
+# Latest recording_taken loaded for each plant_id in beta.recording.
+# Kept between warm Lambda invocations.
+LAST_RECORDING_TAKEN = {}
+
+# beta.recording stores DATETIME, which rounds to the nearest 3.33ms, so a reading
+# must be later than the last one loaded by more than this to count as new.
+RECORDING_TIME_TOLERANCE = Timedelta(milliseconds=5)
+
+MAX_QUERY_PARAMETERS = 2000
+# Most values bound in one batched insert, which caps the driver's parameter buffer.
+MAX_BATCH_VALUES = 200_000
+
+# Dimension tables in the order they are resolved, mapping dataframe columns to table columns.
+# Origin locations depend on the country id so must come after countries.
+DIMENSIONS = {
+    "country_ids": {
+        "table": "beta.country",
+        "id_column": "country_id",
+        "key_columns": {"origin_country": "country_name"},
+        "value_columns": {}
+    },
+    "botanist_ids": {
+        "table": "beta.botanist",
+        "id_column": "botanist_id",
+        "key_columns": {"email": "email"},
+        "value_columns": {"botanist_name": "botanist_name", "phone": "phone"}
+    },
+    "plant_ids": {
+        "table": "beta.plant",
+        "id_column": "plant_id",
+        "key_columns": {"plant_name": "common_name"},
+        "value_columns": {"scientific_name": "scientific_name"}
+    },
+    "origin_location_ids": {
+        "table": "beta.origin_location",
+        "id_column": "origin_location_id",
+        "key_columns": {"origin_city": "origin_city_name", "country_id": "country_id"},
+        "value_columns": {"longitude": "longitude", "latitude": "latitude"}
+    },
+    "image_ids": {
+        "table": "beta.plant_image",
+        "id_column": "image_id",
+        "key_columns": {"license": "licence"},
+        "value_columns": {
+            "license_name": "licence_name",
+            "license_url": "licence_url",
+            "thumbnail": "thumbnail"
+        }
+    }
+}
+
+RECORDING_COLUMNS = [
+    "plant_id",
+    "botanist_id",
+    "origin_location_id",
+    "last_watered",
+    "image_id",
+    "recording_taken",
+    "soil_moisture",
+    "temperature"
+]
+
+# Rollup tables and the period each covers, kept up to date as recordings are loaded
+ROLLUP_TABLES = {
+    "beta.recording_hourly": "h",
+    "beta.recording_daily": "D"
+}
+
+ROLLUP_SENSOR_COLUMNS = ["temperature", "soil_moisture"]
+
+ROLLUP_COLUMN_TYPES = {
+    "plant_id": "SMALLINT",
+    "period_start": "DATETIME",
+    "reading_count": "INT",
+    **{
+        f"{column}_{statistic}": "INT" if statistic == "count" else "FLOAT"
+        for column in ROLLUP_SENSOR_COLUMNS
+        for statistic in ["count", "min", "max", "sum", "sum_sq"]
+    }
+}
+
+ROLLUP_COLUMNS = list(ROLLUP_COLUMN_TYPES)
+
+# Temp table the recording writers output the rows they actually insert into, so the rollups
+# skip rows the unique index ignored as already loaded
+INSERTED_RECORDINGS_TABLE = "#inserted_recording"
+
+INSERTED_RECORDING_COLUMNS = ["plant_id", "recording_taken", *ROLLUP_SENSOR_COLUMNS]
+
 
 def get_db_connection(config: _Environ):
     """Create and return a SQL Server connection."""
@@ -40,219 +139,449 @@ def get_db_connection(config: _Environ):
     return conn
 
 
-def get_id_from_cache(id_collection_name: str, id_info: str) -> int:
-    """Returns an ID if it exists in the ID cache.
-    If not found, adds to ID cache and returns None."""
+def get_id_from_cache(id_collection_name: str, id_info: tuple) -> int | None:
+    """Returns an ID if it exists in the ID cache, otherwise returns None.
+    Every lookup is counted as a cache hit or miss."""
 
-    id_collection = ID_CACHE.get(id_collection_name)
+    id = ID_CACHE.get(id_collection_name, {}).get(id_info)
 
-    if not id_collection:
-        return None
+    CACHE_STATS["hits" if id is not None else "misses"] += 1
 
-    return id_collection.get(id_info)
+    return id
 
 
-def add_id_to_cache(id_collection_name: str, id_info: str, id: int) -> None:
+def add_id_to_cache(id_collection_name: str, id_info: tuple, id: int) -> None:
     """Adds an ID to the ID cache. If the collection name is not found, does not add."""
 
-    id_collection = ID_CACHE.get(id_collection_name)
-
-    if id_collection:
+    if id_collection_name in ID_CACHE:
         ID_CACHE[id_collection_name][id_info] = id
 
 
-def generate_country_id(conn: pyodbc.Connection, country_name: str) -> int:
-    """Creates a new country row with given country name.
-    Returns the id of the new country."""
+def get_dimension_fingerprints(conn: pyodbc.Connection) -> dict[str, list[int]]:
+    """Returns the row count and largest id of every dimension table.
+    Rows being deleted or re-created changes them, so cached ids can be checked against them."""
+
+    fingerprints = {}
 
     with conn.cursor() as cur:
-        cur.execute(
-            "INSERT INTO beta.country (country_name) OUTPUT country_id VALUES (?);",
-            (country_name,),
-        )
+        for dimension_name, dimension in DIMENSIONS.items():
+            cur.execute(
+                f"SELECT COUNT(*), MAX({dimension['id_column']}) FROM {dimension['table']};")
+            row_count, max_id = cur.fetchone()
+            fingerprints[dimension_name] = [int(row_count), int(max_id or 0)]
 
-        return int(cur.fetchone()[0])
+    return fingerprints
 
 
-def get_country_id(conn: pyodbc.Connection, country_name: str) -> int:
-    """Returns the country id given a country name.
-    Will make a new country in the database if invalid."""
+def preload_id_cache(conn: pyodbc.Connection, dimension_names: list[str] | None = None) -> None:
+    """Fills the ID cache with every row of the given dimension tables, or of all of them,
+    using one query per table."""
 
-    cached_id = get_id_from_cache("country_ids", country_name)
+    for dimension_name in dimension_names or DIMENSIONS:
+        dimension = DIMENSIONS[dimension_name]
+        key_columns = list(dimension["key_columns"].values())
 
-    if cached_id:
-        return cached_id
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {dimension['id_column']}, {', '.join(key_columns)} FROM {dimension['table']};")
+            ID_CACHE[dimension_name] = {
+                tuple(row[1:]): int(row[0]) for row in cur.fetchall()}
 
-    with conn.cursor() as cur:
-        cur.execute(
-            "SELECT country_id FROM beta.country WHERE country_name = ?;",
-            (country_name,),
-        )
-        row = cur.fetchone()
+    logger.info(
+        f"ID cache preloaded with {sum(len(ID_CACHE[name]) for name in dimension_names or DIMENSIONS)} ids.")
 
-    if row:
-        id = int(row[0])
-    else:
-        id = generate_country_id(conn, country_name)
-        add_id_to_cache("country_ids", country_name, id)
 
-    return id
+def save_id_cache(path: str) -> None:
+    """Writes a snapshot of the ID cache to a local file,
+    with the fingerprint of each dimension table it was checked against."""
 
+    snapshot = {
+        "fingerprints": ID_CACHE_FINGERPRINTS,
+        "ids": {
+            id_collection_name: [[*id_info, id] for id_info, id in id_collection.items()]
+            for id_collection_name, id_collection in ID_CACHE.items()
+        }
+    }
 
-def generate_botanist_id(conn: pyodbc.Connection, name: str, email: str, phone: str) -> int:
-    """Creates a new botanist row with given botanist details.
-    Returns the id of the new botanist."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
 
-    with conn.cursor() as cur:
-        cur.execute(
-            "INSERT INTO beta.botanist (botanist_name, email, phone) OUTPUT botanist_id VALUES (?, ?, ?);",
-            (name, email, phone),
-        )
 
-        return int(cur.fetchone()[0])
+def load_id_cache(path: str) -> bool:
+    """Fills the ID cache and its fingerprints from a local snapshot file.
+    Returns False if there is no readable snapshot."""
 
+    try:
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        fingerprints, ids = snapshot["fingerprints"], snapshot["ids"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return False
 
-def get_botanist_id(conn: pyodbc.Connection, name: str, email: str, phone: str):
-    """Returns the botanist id given the botanist details.
-    Will make a new botanist in the database if invalid."""
+    for id_collection_name, rows in ids.items():
+        if id_collection_name in ID_CACHE:
+            ID_CACHE[id_collection_name] = {
+                tuple(row[:-1]): row[-1] for row in rows}
 
-    cached_id = get_id_from_cache("botanist_ids", email)
+    ID_CACHE_FINGERPRINTS.clear()
+    ID_CACHE_FINGERPRINTS.update(fingerprints)
 
-    if cached_id:
-        return cached_id
+    logger.info(f"ID cache loaded from snapshot {path}.")
 
-    with conn.cursor() as cur:
-        cur.execute(
-            "SELECT botanist_id FROM beta.botanist WHERE email = ?;",
-            (email,),
-        )
-        row = cur.fetchone()
+    return True
+
+
+def warm_id_cache(conn: pyodbc.Connection, snapshot_path: str | None = None) -> None:
+    """Makes sure the ID cache is filled and matches the database before an upload.
+    An already filled cache is kept (warm Lambda start), otherwise the local snapshot is used if
+    given. Any dimension table whose row count or largest id has changed since the cache was
+    checked against it is then preloaded again from the database."""
+
+    fingerprints = get_dimension_fingerprints(conn)
+
+    if snapshot_path and not any(ID_CACHE.values()):
+        load_id_cache(snapshot_path)
+
+    stale_dimensions = [dimension_name for dimension_name in DIMENSIONS
+                        if ID_CACHE_FINGERPRINTS.get(dimension_name) != fingerprints[dimension_name]]
 
-    if row:
-        id = int(row[0])
+    if stale_dimensions:
+        preload_id_cache(conn, stale_dimensions)
+
+    ID_CACHE_FINGERPRINTS.clear()
+    ID_CACHE_FINGERPRINTS.update(fingerprints)
+
+
+def chunk_list(items: list, chunk_size: int) -> list[list]:
+    """Splits a list into consecutive chunks of at most the given size."""
+
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def get_rows(data_df: DataFrame, columns: list[str]) -> list[tuple]:
+    """Returns the given columns of a dataframe as a list of tuples of native Python values.
+    Missing values are returned as None so they can be bound as SQL NULLs."""
+
+    column_values = [
+        data_df[column].astype(object).where(
+            data_df[column].notna(), None).tolist()
+        for column in columns
+    ]
+
+    return list(zip(*column_values))
+
+
+def select_dimension_ids(conn: pyodbc.Connection, table: str, id_column: str,
+                         key_columns: list[str], keys: list[tuple]) -> dict[tuple, int]:
+    """Returns a dict of key to id for every given key that already exists in a dimension table.
+    Keys are looked up in batches rather than with one query per key."""
+
+    ids = {}
+
+    if len(key_columns) == 1:
+        key_condition = f"{key_columns[0]} IN ({{}})"
     else:
-        id = generate_botanist_id(conn, name, email, phone)
-        add_id_to_cache("botanist_ids", email, id)
+        key_condition = "(" + " AND ".join(
+            f"{column} = ?" for column in key_columns) + ")"
 
-    return id
+    for key_chunk in chunk_list(keys, MAX_QUERY_PARAMETERS // len(key_columns)):
+        if len(key_columns) == 1:
+            condition = key_condition.format(", ".join("?" * len(key_chunk)))
+        else:
+            condition = " OR ".join([key_condition] * len(key_chunk))
+
+        with conn.cursor() as cur:
+            cur.execute(
+                f"SELECT {id_column}, {', '.join(key_columns)} FROM {table} WHERE {condition};",
+                [value for key in key_chunk for value in key],
+            )
+            for row in cur.fetchall():
+                ids[tuple(row[1:])] = int(row[0])
+
+    return ids
 
 
-def generate_plant_id(conn: pyodbc.Connection, common_name: str, scientific_name: str | None) -> int:
-    """Creates a new plant row with given plant details.
-    Returns the id of the new plant."""
+def insert_dimension_rows(conn: pyodbc.Connection, table: str, columns: list[str], rows: list[tuple]) -> None:
+    """Inserts new rows into a dimension table in a single batched statement."""
+
+    query = f"""
+    INSERT INTO {table} ({', '.join(columns)})
+    VALUES ({', '.join('?' * len(columns))});
+    """
 
     with conn.cursor() as cur:
-        cur.execute(
-            "INSERT INTO beta.plant (common_name, scientific_name) OUTPUT plant_id VALUES (?, ?);",
-            (common_name, scientific_name),
-        )
+        cur.fast_executemany = True
+        cur.executemany(query, rows)
+
+
+def add_dimension_ids(conn: pyodbc.Connection, data_df: DataFrame, dimension_name: str) -> DataFrame:
+    """Returns the dataframe with the id column of the given dimension added.
+    Every distinct dimension in the dataframe is looked up in the ID cache first, then any others
+    are resolved with set-based statements, creating any missing rows in the database."""
+
+    dimension = DIMENSIONS[dimension_name]
+    table = dimension["table"]
+    id_column = dimension["id_column"]
+
+    key_columns = list(dimension["key_columns"])
+    df_columns = key_columns + list(dimension["value_columns"])
+    db_key_columns = list(dimension["key_columns"].values())
+    db_columns = db_key_columns + list(dimension["value_columns"].values())
+
+    distinct_df = data_df[df_columns].drop_duplicates(subset=key_columns)
+    rows = get_rows(distinct_df, df_columns)
+    keys = [row[:len(key_columns)] for row in rows]
+
+    ids = {}
+    uncached_keys = []
+
+    for key in keys:
+        cached_id = get_id_from_cache(dimension_name, key)
+
+        if cached_id is None:
+            uncached_keys.append(key)
+        else:
+            ids[key] = cached_id
+
+    if uncached_keys:
+        ids.update(select_dimension_ids(
+            conn, table, id_column, db_key_columns, uncached_keys))
+
+    missing_rows = [row for row, key in zip(rows, keys) if key not in ids]
+
+    if missing_rows:
+        logger.info(f"Creating {len(missing_rows)} new rows in {table}.")
+        insert_dimension_rows(conn, table, db_columns, missing_rows)
+        ids.update(select_dimension_ids(
+            conn, table, id_column, db_key_columns,
+            [row[:len(key_columns)] for row in missing_rows]))
 
-        return int(cur.fetchone()[0])
+    for key in uncached_keys:
+        add_id_to_cache(dimension_name, key, ids[key])
 
+    distinct_ids_df = distinct_df[key_columns].copy()
+    distinct_ids_df[id_column] = [ids[key] for key in keys]
 
-def get_plant_id(conn: pyodbc.Connection, common_name: str, scientific_name: str | None) -> int:
-    """Returns the plant id given the plant details.
-    Will make a new plant in the database if invalid."""
+    return data_df.merge(distinct_ids_df, on=key_columns, how="left")
 
-    cached_id = get_id_from_cache("plant_ids", common_name)
 
-    if cached_id:
-        return cached_id
+def preload_recording_watermarks(conn: pyodbc.Connection) -> None:
+    """Fills the last recording times with the latest recording of each plant in the database."""
 
     with conn.cursor() as cur:
-        cur.execute(
-            "SELECT plant_id FROM beta.plant WHERE common_name = ?;",
-            (common_name,),
-        )
-        row = cur.fetchone()
+        cur.execute("""
+            SELECT plant_id, MAX(recording_taken)
+            FROM beta.recording
+            GROUP BY plant_id;
+            """)
+        rows = cur.fetchall()
 
-    if row:
-        id = int(row[0])
-    else:
-        id = generate_plant_id(conn, common_name, scientific_name)
-        add_id_to_cache("plant_ids", common_name, id)
+    LAST_RECORDING_TAKEN.update({
+        int(plant_id): Timestamp(recording_taken)
+        for plant_id, recording_taken in rows if recording_taken is not None
+    })
 
-    return id
+    logger.info(f"Loaded last recording times for {len(rows)} plants.")
+
+
+def warm_recording_watermarks(conn: pyodbc.Connection) -> None:
+    """Makes sure the last recording times are filled before an upload."""
+
+    if not LAST_RECORDING_TAKEN:
+        preload_recording_watermarks(conn)
+
+
+def drop_loaded_recordings(data_df: DataFrame) -> DataFrame:
+    """Returns only the recordings that are not already in the database.
+    Drops recordings without a time, repeats of the same plant and time within the batch,
+    and recordings no later than the last one loaded for their plant."""
+
+    data_df = data_df.dropna(subset=["recording_taken"])
+    data_df = data_df.drop_duplicates(subset=["plant_id", "recording_taken"])
+
+    last_recording_taken = to_datetime(
+        data_df["plant_id"].map(LAST_RECORDING_TAKEN))
+    is_new = last_recording_taken.isna() | (
+        data_df["recording_taken"] > last_recording_taken + RECORDING_TIME_TOLERANCE)
+
+    return data_df[is_new]
+
+
+def update_recording_watermarks(data_df: DataFrame) -> None:
+    """Moves the last recording time of each plant in the dataframe forward to its latest recording."""
+
+    for plant_id, recording_taken in data_df.groupby("plant_id")["recording_taken"].max().items():
+        last_recording_taken = LAST_RECORDING_TAKEN.get(plant_id)
+
+        if last_recording_taken is None or recording_taken > last_recording_taken:
+            LAST_RECORDING_TAKEN[plant_id] = recording_taken
 
 
-def generate_image_id(conn: pyodbc.Connection, license: int, license_name: str, license_url: str, thumbnail: str | None) -> int:
-    """Creates a new image row with given image details.
-    Returns the id of the new image."""
+def get_batch_size(row_count: int, column_count: int) -> int:
+    """Returns how many rows to send per statement, so that each batch binds
+    at most MAX_BATCH_VALUES values."""
+
+    return max(1, min(row_count, MAX_BATCH_VALUES // column_count))
+
+
+def create_inserted_recordings_table(conn: pyodbc.Connection) -> None:
+    """Creates an empty temp table for the recording writers to output the rows they insert into,
+    replacing the one left by the previous upload on this connection."""
 
     with conn.cursor() as cur:
-        cur.execute(
-            "INSERT INTO beta.plant_image (licence, licence_name, licence_url, thumbnail) OUTPUT image_id VALUES (?, ?, ?, ?);",
-            (license, license_name, license_url, thumbnail,),
-        )
+        cur.execute(f"""
+            DROP TABLE IF EXISTS {INSERTED_RECORDINGS_TABLE};
+            SELECT TOP 0 {', '.join(INSERTED_RECORDING_COLUMNS)}
+            INTO {INSERTED_RECORDINGS_TABLE}
+            FROM beta.recording;
+            """)
 
-        return int(cur.fetchone()[0])
 
+def write_recordings_executemany(conn: pyodbc.Connection, data_df: DataFrame) -> None:
+    """Inserts recordings with a fast executemany per batch of rows,
+    outputting the rows inserted into the inserted recordings table."""
 
-def get_image_id(conn: pyodbc.Connection, license: int, license_name: str, license_url: str, thumbnail: str | None) -> int:
-    """Returns the image id given the image details.
-    Will make a new image in the database if invalid."""
+    rows = get_rows(data_df, RECORDING_COLUMNS)
 
-    cached_id = get_id_from_cache("image_ids", license)
+    query = f"""
+    INSERT INTO beta.recording ({', '.join(RECORDING_COLUMNS)})
+    OUTPUT {', '.join(f'inserted.{column}' for column in INSERTED_RECORDING_COLUMNS)}
+        INTO {INSERTED_RECORDINGS_TABLE}
+    VALUES ({', '.join('?' * len(RECORDING_COLUMNS))});
+    """
+
+    with conn.cursor() as cur:
+        cur.fast_executemany = True
 
-    if cached_id:
-        return cached_id
+        for batch in chunk_list(rows, get_batch_size(len(rows), len(RECORDING_COLUMNS))):
+            cur.executemany(query, batch)
+
+
+def write_recordings_tvp(conn: pyodbc.Connection, data_df: DataFrame) -> None:
+    """Inserts recordings by passing each batch of rows as one table-valued parameter
+    to the beta.insert_recordings procedure, which outputs the rows inserted
+    into the inserted recordings table."""
+
+    rows = get_rows(data_df, RECORDING_COLUMNS)
 
     with conn.cursor() as cur:
-        cur.execute(
-            "SELECT image_id FROM beta.plant_image WHERE licence = ?;",
-            (license,),
-        )
-        row = cur.fetchone()
+        for batch in chunk_list(rows, get_batch_size(len(rows), len(RECORDING_COLUMNS))):
+            cur.execute("{CALL beta.insert_recordings (?)}",
+                        [["recording_type", "beta", *batch]])
 
-    if row:
-        id = int(row[0])
-    else:
-        id = generate_image_id(
-            conn, license, license_name, license_url, thumbnail)
-        add_id_to_cache("image_ids", license, id)
 
-    return id
+def get_rollup_rows(data_df: DataFrame, period: str) -> list[tuple]:
+    """Returns the count, min, max, sum and sum of squares of each sensor column
+    per plant per period of the recordings, as rows of the rollup columns."""
+
+    sensor_df = data_df[ROLLUP_SENSOR_COLUMNS].astype("float64")
+
+    rollup_df = sensor_df.assign(
+        plant_id=data_df["plant_id"],
+        period_start=data_df["recording_taken"].dt.floor(period),
+        **{f"{column}_sq": sensor_df[column] ** 2 for column in ROLLUP_SENSOR_COLUMNS}
+    )
+
+    aggregations = {"reading_count": ("period_start", "size")}
+
+    for column in ROLLUP_SENSOR_COLUMNS:
+        aggregations |= {
+            f"{column}_count": (column, "count"),
+            f"{column}_min": (column, "min"),
+            f"{column}_max": (column, "max"),
+            f"{column}_sum": (column, "sum"),
+            f"{column}_sum_sq": (f"{column}_sq", "sum")
+        }
+
+    rollup_df = rollup_df.groupby(["plant_id", "period_start"]).agg(**aggregations).reset_index()
+
+    return get_rows(rollup_df, ROLLUP_COLUMNS)
+
+
+def get_rollup_merge_query(table: str) -> str:
+    """Returns a MERGE that adds a row of the rollup columns to its plant and period in the table,
+    inserting the period if it is new. The parameters are cast so their types are known
+    even when they are null."""
+
+    updates = ["reading_count = target.reading_count + source.reading_count"]
+
+    for column in ROLLUP_SENSOR_COLUMNS:
+        updates += [
+            f"{column}_count = target.{column}_count + source.{column}_count",
+            f"""{column}_min = CASE WHEN target.{column}_min IS NULL OR source.{column}_min < target.{column}_min
+                THEN source.{column}_min ELSE target.{column}_min END""",
+            f"""{column}_max = CASE WHEN target.{column}_max IS NULL OR source.{column}_max > target.{column}_max
+                THEN source.{column}_max ELSE target.{column}_max END""",
+            f"{column}_sum = target.{column}_sum + source.{column}_sum",
+            f"{column}_sum_sq = target.{column}_sum_sq + source.{column}_sum_sq"
+        ]
+
+    return f"""
+    MERGE {table} WITH (HOLDLOCK) AS target
+    USING (VALUES ({', '.join(f'CAST(? AS {column_type})' for column_type in ROLLUP_COLUMN_TYPES.values())}))
+        AS source ({', '.join(ROLLUP_COLUMNS)})
+    ON target.plant_id = source.plant_id AND target.period_start = source.period_start
+    WHEN MATCHED THEN UPDATE SET {', '.join(updates)}
+    WHEN NOT MATCHED THEN INSERT ({', '.join(ROLLUP_COLUMNS)})
+        VALUES ({', '.join(f'source.{column}' for column in ROLLUP_COLUMNS)});
+    """
 
 
-def generate_origin_location_id(conn: pyodbc.Connection, city: str, country_id: int, longitude: float, latitude: float) -> int:
-    """Creates a new origin location row with given origin location details.
-    Returns the id of the new origin location."""
+def get_inserted_recordings(conn: pyodbc.Connection) -> DataFrame:
+    """Returns the recordings the writers inserted into beta.recording during this upload."""
 
     with conn.cursor() as cur:
         cur.execute(
-            """
-            INSERT INTO beta.origin_location (origin_city_name, country_id, longitude, latitude)
-            OUTPUT origin_location_id
-            VALUES (?, ?, ?, ?);
-            """,
-            (city, country_id, longitude, latitude),
-        )
+            f"SELECT {', '.join(INSERTED_RECORDING_COLUMNS)} FROM {INSERTED_RECORDINGS_TABLE};")
+        rows = [tuple(row) for row in cur.fetchall()]
 
-        return int(cur.fetchone()[0])
+    inserted_df = DataFrame.from_records(rows, columns=INSERTED_RECORDING_COLUMNS)
+    inserted_df["recording_taken"] = to_datetime(inserted_df["recording_taken"])
 
+    return inserted_df
 
-def get_origin_location_id(conn: pyodbc.Connection, city: str, country_id: int, longitude: float, latitude: float) -> int:
-    """Returns the origin location id given the origin location details.
-    Will make a new origin location in the database if invalid."""
+
+def update_rollups(conn: pyodbc.Connection) -> None:
+    """Adds the recordings inserted during this upload to the hourly and daily rollup tables.
+    Only the periods the recordings fall in are touched, and recordings skipped as
+    already loaded are not counted again."""
+
+    inserted_df = get_inserted_recordings(conn)
+
+    if inserted_df.empty:
+        return
 
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT origin_location_id
-            FROM beta.origin_location
-            WHERE origin_city_name = ? AND country_id = ?;
-            """,
-            (city, country_id),
-        )
-        row = cur.fetchone()
-
-    if row:
-        id = int(row[0])
-    else:
-        id = generate_origin_location_id(
-            conn, city, country_id, longitude, latitude)
+        cur.fast_executemany = True
 
-    return id
+        for table, period in ROLLUP_TABLES.items():
+            cur.executemany(get_rollup_merge_query(table), get_rollup_rows(inserted_df, period))
+
+
+def get_recent_reading_stats(conn: pyodbc.Connection, hours: int) -> dict[str, dict]:
+    """Returns the count, mean and variance of each plant's readings over the last hours,
+    by plant name, from the hourly rollups."""
+
+    sums = ", ".join(f"SUM(h.{column}_{statistic})" for column in ROLLUP_SENSOR_COLUMNS
+                     for statistic in ["count", "sum", "sum_sq"])
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT p.common_name, {sums}
+            FROM beta.recording_hourly h JOIN beta.plant p
+            ON (h.plant_id=p.plant_id)
+            WHERE h.period_start >= DATEADD(hour, ?, GETDATE())
+            GROUP BY p.common_name;
+            """, (-int(hours),))
+        rows = cur.fetchall()
+
+    return {
+        row[0]: {
+            column: get_stats_from_sums(*row[1 + 3 * i:4 + 3 * i])
+            for i, column in enumerate(ROLLUP_SENSOR_COLUMNS)
+        }
+        for row in rows
+    }
 
 
 def upload_data_to_database(conn: pyodbc.Connection, data_df: DataFrame) -> None:
@@ -262,66 +591,39 @@ def upload_data_to_database(conn: pyodbc.Connection, data_df: DataFrame) -> None
 
     logger.info(f"Upload started for {len(data_df)} data points.")
 
-    data_to_insert = []
-
-    for _, row in data_df.iterrows():
-        country_id = get_country_id(conn, row["origin_country"])
-
-        botanist_id = get_botanist_id(
-            conn,
-            row["botanist_name"],
-            row["email"],
-            row["phone"],
-        )
-
-        plant_id = get_plant_id(
-            conn,
-            row["plant_name"],
-            row["scientific_name"],
-        )
-
-        origin_location_id = get_origin_location_id(
-            conn,
-            row["origin_city"],
-            country_id,
-            row["longitude"],
-            row["latitude"],
-        )
-
-        image_id = get_image_id(
-            conn,
-            row["license"],
-            row["license_name"],
-            row["license_url"],
-            row["thumbnail"])
-
-        data_to_insert.append((
-            plant_id,
-            botanist_id,
-            origin_location_id,
-            row["last_watered"],
-            image_id,
-            row["recording_taken"],
-            row["soil_moisture"],
-            row["temperature"]
-        ))
-
-    query = """
-    INSERT INTO beta.recording (
-        plant_id, botanist_id, origin_location_id, last_watered,
-        image_id, recording_taken, soil_moisture, temperature
-    )
-    VALUES (?, ?, ?, ?, ?, ?, ?, ?);
-    """
+    # The API plant id is not stored; plants are identified by their common name.
+    data_df = data_df.drop(columns=["plant_id"])
 
-    with conn.cursor() as cur:
-        cur.fast_executemany = True
-        cur.executemany(query, data_to_insert)
+    for dimension_name in DIMENSIONS:
+        data_df = add_dimension_ids(conn, data_df, dimension_name)
+
+    new_data_df = drop_loaded_recordings(data_df)
+
+    logger.info(
+        f"Dropped {len(data_df) - len(new_data_df)} data points that are already loaded.")
+
+    data_df = new_data_df
+
+    write_recordings = RECORDING_WRITERS[ENV.get(
+        "RECORDING_WRITER", "executemany")]
+    create_inserted_recordings_table(conn)
+    write_recordings(conn, data_df)
+    update_rollups(conn)
 
     conn.commit()
 
+    update_recording_watermarks(data_df)
+
+    logger.info(
+        f"Upload finished of {len(data_df)} data points with time taken: {perf_counter() - start_time} seconds.")
     logger.info(
-        f"Upload finished of {len(data_to_insert)} data points with time taken: {perf_counter() - start_time} seconds.")
+        f"ID cache hits: {CACHE_STATS['hits']}, misses: {CACHE_STATS['misses']}.")
+
+
+RECORDING_WRITERS = {
+    "executemany": write_recordings_executemany,
+    "tvp": write_recordings_tvp
+}
 
 
 if __name__ == "__main__":
@@ -335,6 +637,8 @@ if __name__ == "__main__":
 
     conn = get_db_connection(ENV)
     try:
+        warm_id_cache(conn, ENV.get("ID_CACHE_PATH"))
+        warm_recording_watermarks(conn)
         upload_data_to_database(conn, df_transformed)
     finally:
         conn.close()
@@ -0,0 +1,88 @@
+"""Script for applying schema migrations to the RDS (SQL Server)."""
+
+import re
+import sys
+from logging import getLogger, basicConfig, INFO
+from os import environ as ENV
+from pathlib import Path
+
+import pyodbc
+from dotenv import load_dotenv
+
+from load import get_db_connection
+
+logger = getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+
+def split_batches(sql: str) -> list[str]:
+    """Splits a SQL script into the batches separated by GO lines."""
+
+    batches = re.split(r"^\s*GO\s*$", sql, flags=re.MULTILINE | re.IGNORECASE)
+
+    return [batch.strip() for batch in batches if batch.strip()]
+
+
+def get_applied_migrations(conn: pyodbc.Connection) -> set[str]:
+    """Returns the names of the migrations already applied, creating the tracking table if needed."""
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            IF OBJECT_ID('beta.schema_migration', 'U') IS NULL
+                CREATE TABLE beta.schema_migration (
+                    migration_name VARCHAR(255) PRIMARY KEY,
+                    applied_at DATETIME NOT NULL DEFAULT GETUTCDATE()
+                );
+            """)
+        cur.execute("SELECT migration_name FROM beta.schema_migration;")
+
+        return {row[0] for row in cur.fetchall()}
+
+
+def apply_migration(conn: pyodbc.Connection, path: Path) -> None:
+    """Runs every batch of a migration file and records it as applied, in one transaction."""
+
+    logger.info(f"Applying migration {path.stem}.")
+
+    try:
+        with conn.cursor() as cur:
+            for batch in split_batches(path.read_text(encoding="utf-8")):
+                cur.execute(batch)
+
+            cur.execute(
+                "INSERT INTO beta.schema_migration (migration_name) VALUES (?);", (path.stem,))
+    except pyodbc.Error:
+        conn.rollback()
+        raise
+
+    conn.commit()
+
+
+def migrate(conn: pyodbc.Connection, paths: list[Path]) -> None:
+    """Applies the given migrations in order, skipping any already applied."""
+
+    applied_migrations = get_applied_migrations(conn)
+    conn.commit()
+
+    for path in paths:
+        if path.stem not in applied_migrations:
+            apply_migration(conn, path)
+
+    logger.info("Schema is up to date.")
+
+
+if __name__ == "__main__":
+
+    basicConfig(level=INFO)
+
+    load_dotenv()
+
+    migration_paths = [Path(arg) for arg in sys.argv[1:]] or sorted(
+        MIGRATIONS_DIR.glob("*.sql"))
+
+    connection = get_db_connection(ENV)
+    try:
+        migrate(connection, migration_paths)
+    finally:
+        connection.close()
@@ -0,0 +1,27 @@
+-- Table type and procedure used by the tvp recording writer.
+
+IF TYPE_ID('beta.recording_type') IS NULL
+    CREATE TYPE beta.recording_type AS TABLE (
+        plant_id SMALLINT NOT NULL,
+        botanist_id SMALLINT NOT NULL,
+        origin_location_id BIGINT NOT NULL,
+        last_watered DATETIME,
+        image_id SMALLINT,
+        recording_taken DATETIME,
+        soil_moisture FLOAT,
+        temperature FLOAT
+    );
+GO
+
+CREATE OR ALTER PROCEDURE beta.insert_recordings
+    @recordings beta.recording_type READONLY
+AS
+    INSERT INTO beta.recording (
+        plant_id, botanist_id, origin_location_id, last_watered,
+        image_id, recording_taken, soil_moisture, temperature
+    )
+    SELECT
+        plant_id, botanist_id, origin_location_id, last_watered,
+        image_id, recording_taken, soil_moisture, temperature
+    FROM @recordings;
+GO
@@ -0,0 +1,22 @@
+-- One recording per plant per time. Existing duplicates are removed first, keeping the earliest row.
+
+WITH numbered_recording AS (
+    SELECT ROW_NUMBER() OVER (
+        PARTITION BY plant_id, recording_taken
+        ORDER BY recording_id
+    ) AS duplicate_number
+    FROM beta.recording
+)
+DELETE FROM numbered_recording
+WHERE duplicate_number > 1;
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ux_recording_plant_recording_taken'
+    AND object_id = OBJECT_ID('beta.recording')
+)
+    CREATE UNIQUE INDEX ux_recording_plant_recording_taken
+        ON beta.recording (plant_id, recording_taken)
+        WITH (IGNORE_DUP_KEY = ON);
+GO
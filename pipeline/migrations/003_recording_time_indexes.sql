@@ -0,0 +1,19 @@
+-- Covering indexes for the queries that filter beta.recording by time.
+-- The dashboard reads a plant's readings over the last day by (plant_id, recording_taken),
+-- and the dashboard refresh and the archive range-scan on recording_taken alone.
+
+CREATE UNIQUE INDEX ux_recording_plant_recording_taken
+    ON beta.recording (plant_id, recording_taken)
+    INCLUDE (soil_moisture, temperature)
+    WITH (IGNORE_DUP_KEY = ON, DROP_EXISTING = ON);
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'ix_recording_recording_taken'
+    AND object_id = OBJECT_ID('beta.recording')
+)
+    CREATE INDEX ix_recording_recording_taken
+        ON beta.recording (recording_taken)
+        INCLUDE (plant_id, botanist_id, origin_location_id, last_watered, image_id, soil_moisture, temperature);
+GO
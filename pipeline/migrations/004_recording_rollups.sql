@@ -0,0 +1,71 @@
+-- Hourly and daily rollups of each plant's readings, kept by the pipeline as each batch is loaded
+-- and kept when the archive deletes the raw rows. Counts, sums and sums of squares can be added
+-- together, so a period can be updated from each new batch, and mean and standard deviation
+-- derived from them. Existing readings are rolled up once when the tables are created.
+
+IF OBJECT_ID('beta.recording_hourly', 'U') IS NULL
+BEGIN
+    CREATE TABLE beta.recording_hourly (
+        plant_id SMALLINT NOT NULL,
+        period_start DATETIME NOT NULL,
+        reading_count INT NOT NULL,
+        temperature_count INT NOT NULL,
+        temperature_min FLOAT,
+        temperature_max FLOAT,
+        temperature_sum FLOAT NOT NULL,
+        temperature_sum_sq FLOAT NOT NULL,
+        soil_moisture_count INT NOT NULL,
+        soil_moisture_min FLOAT,
+        soil_moisture_max FLOAT,
+        soil_moisture_sum FLOAT NOT NULL,
+        soil_moisture_sum_sq FLOAT NOT NULL,
+        CONSTRAINT pk_recording_hourly PRIMARY KEY (plant_id, period_start)
+    );
+
+    INSERT INTO beta.recording_hourly
+    SELECT
+        plant_id,
+        DATEADD(hour, DATEDIFF(hour, 0, recording_taken), 0),
+        COUNT(*),
+        COUNT(temperature), MIN(temperature), MAX(temperature),
+        COALESCE(SUM(temperature), 0), COALESCE(SUM(temperature * temperature), 0),
+        COUNT(soil_moisture), MIN(soil_moisture), MAX(soil_moisture),
+        COALESCE(SUM(soil_moisture), 0), COALESCE(SUM(soil_moisture * soil_moisture), 0)
+    FROM beta.recording
+    WHERE recording_taken IS NOT NULL
+    GROUP BY plant_id, DATEADD(hour, DATEDIFF(hour, 0, recording_taken), 0);
+END;
+GO
+
+IF OBJECT_ID('beta.recording_daily', 'U') IS NULL
+BEGIN
+    CREATE TABLE beta.recording_daily (
+        plant_id SMALLINT NOT NULL,
+        period_start DATETIME NOT NULL,
+        reading_count INT NOT NULL,
+        temperature_count INT NOT NULL,
+        temperature_min FLOAT,
+        temperature_max FLOAT,
+        temperature_sum FLOAT NOT NULL,
+        temperature_sum_sq FLOAT NOT NULL,
+        soil_moisture_count INT NOT NULL,
+        soil_moisture_min FLOAT,
+        soil_moisture_max FLOAT,
+        soil_moisture_sum FLOAT NOT NULL,
+        soil_moisture_sum_sq FLOAT NOT NULL,
+        CONSTRAINT pk_recording_daily PRIMARY KEY (plant_id, period_start)
+    );
+
+    INSERT INTO beta.recording_daily
+    SELECT
+        plant_id,
+        DATEADD(day, DATEDIFF(day, 0, period_start), 0),
+        SUM(reading_count),
+        SUM(temperature_count), MIN(temperature_min), MAX(temperature_max),
+        SUM(temperature_sum), SUM(temperature_sum_sq),
+        SUM(soil_moisture_count), MIN(soil_moisture_min), MAX(soil_moisture_max),
+        SUM(soil_moisture_sum), SUM(soil_moisture_sum_sq)
+    FROM beta.recording_hourly
+    GROUP BY plant_id, DATEADD(day, DATEDIFF(day, 0, period_start), 0);
+END;
+GO
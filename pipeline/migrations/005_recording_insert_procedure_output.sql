@@ -0,0 +1,18 @@
+-- The tvp recording writer outputs the rows it actually inserts, leaving out those the unique
+-- index skips as already loaded, so the rollups are only updated from new rows.
+-- The caller creates #inserted_recording before calling the procedure.
+
+CREATE OR ALTER PROCEDURE beta.insert_recordings
+    @recordings beta.recording_type READONLY
+AS
+    INSERT INTO beta.recording (
+        plant_id, botanist_id, origin_location_id, last_watered,
+        image_id, recording_taken, soil_moisture, temperature
+    )
+    OUTPUT inserted.plant_id, inserted.recording_taken, inserted.temperature, inserted.soil_moisture
+        INTO #inserted_recording
+    SELECT
+        plant_id, botanist_id, origin_location_id, last_watered,
+        image_id, recording_taken, soil_moisture, temperature
+    FROM @recordings;
+GO
@@ -0,0 +1,87 @@
+-- Optional: partitions beta.recording by day of recording_taken, so whole days of old readings
+-- can be removed by truncating partitions rather than with a large DELETE.
+-- Not applied by migrate.py on its own: run `python migrate.py migrations/optional/partition_recording_by_day.sql`.
+-- Rebuilds the clustered index of beta.recording, so run it while the pipeline is paused.
+-- Every recording must have a recording_taken.
+
+IF NOT EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = 'pf_recording_day')
+    CREATE PARTITION FUNCTION pf_recording_day (DATETIME) AS RANGE RIGHT FOR VALUES ();
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.partition_schemes WHERE name = 'ps_recording_day')
+    CREATE PARTITION SCHEME ps_recording_day AS PARTITION pf_recording_day ALL TO ([PRIMARY]);
+GO
+
+-- Adds a partition boundary for every day after the last boundary, up to the given time.
+-- Called by every archive run, ahead of time, so new readings never land in one big partition.
+CREATE OR ALTER PROCEDURE beta.add_recording_day_partitions
+    @until DATETIME
+AS
+BEGIN
+    DECLARE @day DATETIME = COALESCE(
+        (
+            SELECT DATEADD(day, 1, MAX(CAST(prv.value AS DATETIME)))
+            FROM sys.partition_range_values prv
+            JOIN sys.partition_functions pf ON pf.function_id = prv.function_id
+            WHERE pf.name = 'pf_recording_day'
+        ),
+        (SELECT CAST(CAST(MIN(recording_taken) AS DATE) AS DATETIME) FROM beta.recording),
+        CAST(CAST(GETUTCDATE() AS DATE) AS DATETIME)
+    );
+
+    WHILE @day <= @until
+    BEGIN
+        ALTER PARTITION SCHEME ps_recording_day NEXT USED [PRIMARY];
+        ALTER PARTITION FUNCTION pf_recording_day() SPLIT RANGE (@day);
+        SET @day = DATEADD(day, 1, @day);
+    END
+END
+GO
+
+-- Removes every whole day of readings before the cutoff by truncating their partitions.
+-- Called by the archive once those days are archived.
+CREATE OR ALTER PROCEDURE beta.truncate_recording_days_before
+    @cutoff DATETIME
+AS
+BEGIN
+    DECLARE @last_partition INT = $PARTITION.pf_recording_day(@cutoff) - 1;
+
+    IF @last_partition >= 1
+        EXEC ('TRUNCATE TABLE beta.recording WITH (PARTITIONS (1 TO ' + CAST(@last_partition AS VARCHAR(10)) + '));');
+END
+GO
+
+DROP INDEX IF EXISTS ux_recording_plant_recording_taken ON beta.recording;
+DROP INDEX IF EXISTS ix_recording_recording_taken ON beta.recording;
+GO
+
+ALTER TABLE beta.recording ALTER COLUMN recording_taken DATETIME NOT NULL;
+GO
+
+DECLARE @primary_key SYSNAME = (
+    SELECT name FROM sys.key_constraints
+    WHERE parent_object_id = OBJECT_ID('beta.recording') AND type = 'PK'
+);
+EXEC ('ALTER TABLE beta.recording DROP CONSTRAINT ' + @primary_key);
+GO
+
+ALTER TABLE beta.recording
+    ADD CONSTRAINT pk_recording PRIMARY KEY CLUSTERED (recording_id, recording_taken)
+    ON ps_recording_day (recording_taken);
+GO
+
+CREATE UNIQUE INDEX ux_recording_plant_recording_taken
+    ON beta.recording (plant_id, recording_taken)
+    INCLUDE (soil_moisture, temperature)
+    WITH (IGNORE_DUP_KEY = ON)
+    ON ps_recording_day (recording_taken);
+
+CREATE INDEX ix_recording_recording_taken
+    ON beta.recording (recording_taken)
+    INCLUDE (plant_id, botanist_id, origin_location_id, last_watered, image_id, soil_moisture, temperature)
+    ON ps_recording_day (recording_taken);
+GO
+
+DECLARE @until DATETIME = DATEADD(day, 7, GETUTCDATE());
+EXEC beta.add_recording_day_partitions @until = @until;
+GO
@@ -2,18 +2,69 @@
 
 from os import environ as ENV
 
+import asyncio
 from logging import getLogger, INFO
 from time import perf_counter
 from dotenv import load_dotenv
+import pyodbc
 
-from extract import extract
-from transform import transform_data
-from load import get_db_connection, upload_data_to_database
+from extract import extract, extract_in_batches, get_event_loop
+from transform import (transform_data, PLANT_STATS, load_plant_stats, save_plant_stats,
+                       seed_plant_stats)
+from load import (get_db_connection, upload_data_to_database, warm_id_cache, save_id_cache,
+                  warm_recording_watermarks, get_recent_reading_stats)
 
 logger = getLogger()
 logger.setLevel(INFO)
 
 
+async def transform_batches(batch_size: int, load_queue: asyncio.Queue) -> None:
+    """Transforms plant data in batches as it is extracted, putting each cleaned batch on the queue.
+    Waits while the queue is full, so extraction never runs far ahead of loading.
+    Puts None on the queue once extraction has finished."""
+
+    async for records in extract_in_batches(batch_size):
+        await load_queue.put(transform_data(records))
+
+    await load_queue.put(None)
+
+
+async def load_batches(conn: pyodbc.Connection, load_queue: asyncio.Queue) -> None:
+    """Uploads each cleaned batch from the queue until it receives None.
+    Uploads run in a worker thread so extraction carries on in the meantime."""
+
+    while (cleaned_data := await load_queue.get()) is not None:
+        await asyncio.to_thread(upload_data_to_database, conn, cleaned_data)
+
+
+async def run_streaming_pipeline(conn: pyodbc.Connection, batch_size: int, queue_size: int) -> None:
+    """Runs extract, transform and load concurrently over batches of plants."""
+
+    load_queue = asyncio.Queue(maxsize=queue_size)
+
+    async with asyncio.TaskGroup() as tasks:
+        tasks.create_task(transform_batches(batch_size, load_queue))
+        tasks.create_task(load_batches(conn, load_queue))
+
+
+def warm_plant_stats(conn: pyodbc.Connection) -> None:
+    """Makes sure the outlier filter has stats to score readings against before a run.
+    Stats kept from a warm invocation are used as they are, otherwise the PLANT_STATS_PATH file
+    if it can be read, falling back to seeding them from the recent hourly rollups."""
+
+    if PLANT_STATS:
+        return
+
+    if ENV.get("PLANT_STATS_PATH") and load_plant_stats(ENV["PLANT_STATS_PATH"]):
+        return
+
+    try:
+        seed_plant_stats(get_recent_reading_stats(
+            conn, int(ENV.get("OUTLIER_SEED_HOURS", 6))))
+    except pyodbc.Error as error:
+        logger.warning(f"Plant stats not seeded from the rollups: {error}")
+
+
 def handler(event=None, context=None):
     """Executes the entire ETL pipeline. Is formatted as a Lambda function."""
 
@@ -21,12 +72,31 @@ def handler(event=None, context=None):
 
     start_time = perf_counter()
 
-    extracted_data = extract()
-    cleaned_data = transform_data(extracted_data)
     conn = get_db_connection(ENV)
-    upload_data_to_database(conn, cleaned_data)
 
-    conn.close()
+    try:
+        warm_plant_stats(conn)
+        warm_id_cache(conn, ENV.get("ID_CACHE_PATH"))
+        warm_recording_watermarks(conn)
+
+        if ENV.get("PIPELINE_STREAMING", "false").lower() == "true":
+            get_event_loop().run_until_complete(run_streaming_pipeline(
+                conn,
+                batch_size=int(ENV.get("PIPELINE_BATCH_SIZE", 50)),
+                queue_size=int(ENV.get("PIPELINE_QUEUE_SIZE", 2))
+            ))
+        else:
+            extracted_data = extract()
+            cleaned_data = transform_data(extracted_data)
+            upload_data_to_database(conn, cleaned_data)
+    finally:
+        conn.close()
+
+    if ENV.get("ID_CACHE_PATH"):
+        save_id_cache(ENV["ID_CACHE_PATH"])
+
+    if ENV.get("PLANT_STATS_PATH"):
+        save_plant_stats(ENV["PLANT_STATS_PATH"])
 
     logger.info(
         f"ETL Pipeline finished in {perf_counter() - start_time} seconds.")
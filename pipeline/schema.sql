@@ -80,4 +80,98 @@ CREATE TABLE beta.recording (
     CONSTRAINT fk_recording_image FOREIGN KEY (image_id) REFERENCES beta.plant_image(image_id)
 );
 
-GO
\ No newline at end of file
+-- One recording per plant per time. Duplicate inserts are skipped rather than raising an error.
+CREATE UNIQUE INDEX ux_recording_plant_recording_taken
+    ON beta.recording (plant_id, recording_taken)
+    INCLUDE (soil_moisture, temperature)
+    WITH (IGNORE_DUP_KEY = ON);
+
+-- Covers the dashboard and archive queries, which filter on recording_taken alone.
+CREATE INDEX ix_recording_recording_taken
+    ON beta.recording (recording_taken)
+    INCLUDE (plant_id, botanist_id, origin_location_id, last_watered, image_id, soil_moisture, temperature);
+
+GO
+
+IF OBJECT_ID('beta.insert_recordings', 'P') IS NOT NULL
+    DROP PROCEDURE beta.insert_recordings;
+GO
+
+IF TYPE_ID('beta.recording_type') IS NOT NULL
+    DROP TYPE beta.recording_type;
+GO
+
+CREATE TYPE beta.recording_type AS TABLE (
+    plant_id SMALLINT NOT NULL,
+    botanist_id SMALLINT NOT NULL,
+    origin_location_id BIGINT NOT NULL,
+    last_watered DATETIME,
+    image_id SMALLINT,
+    recording_taken DATETIME,
+    soil_moisture FLOAT,
+    temperature FLOAT
+);
+GO
+
+CREATE PROCEDURE beta.insert_recordings
+    @recordings beta.recording_type READONLY
+AS
+    INSERT INTO beta.recording (
+        plant_id, botanist_id, origin_location_id, last_watered,
+        image_id, recording_taken, soil_moisture, temperature
+    )
+    -- The caller creates #inserted_recording, so the rollups are only updated from new rows
+    OUTPUT inserted.plant_id, inserted.recording_taken, inserted.temperature, inserted.soil_moisture
+        INTO #inserted_recording
+    SELECT
+        plant_id, botanist_id, origin_location_id, last_watered,
+        image_id, recording_taken, soil_moisture, temperature
+    FROM @recordings;
+GO
+
+
+-- Hourly and daily rollups of each plant's readings, kept by the pipeline as each batch is loaded.
+-- Counts, sums and sums of squares can be added together, so each new batch updates its periods.
+IF OBJECT_ID('beta.recording_hourly', 'U') IS NOT NULL
+    DROP TABLE beta.recording_hourly;
+GO
+
+CREATE TABLE beta.recording_hourly (
+    plant_id SMALLINT NOT NULL,
+    period_start DATETIME NOT NULL,
+    reading_count INT NOT NULL,
+    temperature_count INT NOT NULL,
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum FLOAT NOT NULL,
+    temperature_sum_sq FLOAT NOT NULL,
+    soil_moisture_count INT NOT NULL,
+    soil_moisture_min FLOAT,
+    soil_moisture_max FLOAT,
+    soil_moisture_sum FLOAT NOT NULL,
+    soil_moisture_sum_sq FLOAT NOT NULL,
+    CONSTRAINT pk_recording_hourly PRIMARY KEY (plant_id, period_start)
+);
+GO
+
+IF OBJECT_ID('beta.recording_daily', 'U') IS NOT NULL
+    DROP TABLE beta.recording_daily;
+GO
+
+CREATE TABLE beta.recording_daily (
+    plant_id SMALLINT NOT NULL,
+    period_start DATETIME NOT NULL,
+    reading_count INT NOT NULL,
+    temperature_count INT NOT NULL,
+    temperature_min FLOAT,
+    temperature_max FLOAT,
+    temperature_sum FLOAT NOT NULL,
+    temperature_sum_sq FLOAT NOT NULL,
+    soil_moisture_count INT NOT NULL,
+    soil_moisture_min FLOAT,
+    soil_moisture_max FLOAT,
+    soil_moisture_sum FLOAT NOT NULL,
+    soil_moisture_sum_sq FLOAT NOT NULL,
+    CONSTRAINT pk_recording_daily PRIMARY KEY (plant_id, period_start)
+);
+GO
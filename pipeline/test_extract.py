@@ -0,0 +1,185 @@
+"""Testing extract.py"""
+
+# pylint:skip-file
+
+import asyncio
+import json
+from time import monotonic
+
+import aiohttp
+import pytest
+
+import extract
+from extract import get_all_plants_data, get_plant_data, get_run_stats, reset_run_stats
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Replaces the plant API with a dict of plant id to plant data.
+    Returns a dict recording the requested ids and the peak number of requests in flight."""
+
+    calls = {"plants": {}, "requested": [], "in_flight": 0, "peak_in_flight": 0}
+
+    async def fake_get_plant_data(session, id, deadline):
+        calls["requested"].append(id)
+        calls["in_flight"] += 1
+        calls["peak_in_flight"] = max(calls["peak_in_flight"], calls["in_flight"])
+        await asyncio.sleep(0)
+        calls["in_flight"] -= 1
+
+        if id in calls["plants"]:
+            return calls["plants"][id]
+        return {"error": "plant not found", "plant_id": id}
+
+    monkeypatch.setattr(extract, "get_plant_data", fake_get_plant_data)
+    monkeypatch.setattr(extract, "get_session", lambda: None)
+    monkeypatch.setitem(extract.KNOWN_ID_RANGE, "max_id", 0)
+
+    return calls
+
+
+def test_get_all_plants_data_probes_until_empty_window(fake_api):
+    fake_api["plants"] = {id: {"plant_id": id} for id in range(1, 26)}
+
+    plants = asyncio.run(get_all_plants_data(concurrency_limit=5, probe_size=10))
+
+    assert sorted(plant["plant_id"] for plant in plants) == list(range(1, 26))
+    assert max(fake_api["requested"]) == 35
+    assert extract.KNOWN_ID_RANGE["max_id"] == 25
+
+
+def test_get_all_plants_data_gap_in_known_range(fake_api):
+    extract.KNOWN_ID_RANGE["max_id"] = 100
+    fake_api["plants"] = {id: {"plant_id": id}
+                          for id in [*range(1, 5), *range(90, 101)]}
+
+    plants = asyncio.run(get_all_plants_data(concurrency_limit=5, probe_size=10))
+
+    assert len(plants) == 15
+    assert sorted(set(fake_api["requested"])) == list(range(1, 111))
+
+
+def test_get_all_plants_data_finds_new_plants(fake_api):
+    extract.KNOWN_ID_RANGE["max_id"] = 10
+    fake_api["plants"] = {id: {"plant_id": id} for id in range(1, 19)}
+
+    plants = asyncio.run(get_all_plants_data(concurrency_limit=5, probe_size=5))
+
+    assert len(plants) == 18
+    assert extract.KNOWN_ID_RANGE["max_id"] == 18
+
+
+def test_get_all_plants_data_concurrency_limit(fake_api):
+    fake_api["plants"] = {id: {"plant_id": id} for id in range(1, 50)}
+
+    asyncio.run(get_all_plants_data(concurrency_limit=3, probe_size=20))
+
+    assert fake_api["peak_in_flight"] <= 3
+
+
+def test_get_all_plants_data_keeps_range_on_failure(fake_api):
+    extract.KNOWN_ID_RANGE["max_id"] = 40
+
+    plants = asyncio.run(get_all_plants_data(concurrency_limit=5, probe_size=5))
+
+    assert plants == []
+    assert extract.KNOWN_ID_RANGE["max_id"] == 40
+
+
+class FakeContent:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, size):
+        for i in range(0, len(self.body), size):
+            yield self.body[i:i + size]
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.content_length = None
+        self.content = FakeContent(
+            body if isinstance(body, bytes) else json.dumps(body).encode())
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def raise_for_status(self):
+        raise aiohttp.ClientResponseError(None, (), status=self.status)
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def request_policy(monkeypatch):
+    monkeypatch.setattr(extract, "BACKOFF_BASE", 0)
+    monkeypatch.setattr(extract, "MAX_RETRIES", 2)
+    monkeypatch.setattr(extract, "CIRCUIT_BREAKERS", {})
+    reset_run_stats()
+
+
+def test_get_plant_data_retries_server_errors(request_policy):
+    session = FakeSession([
+        FakeResponse(503, None),
+        FakeResponse(200, b"<html>Bad gateway</html>"),
+        FakeResponse(200, {"plant_id": 1})
+    ])
+
+    data = asyncio.run(get_plant_data(session, 1, monotonic() + 10))
+
+    assert data == {"plant_id": 1}
+    assert get_run_stats()["retries"] == 2
+    assert get_run_stats()["giveups"] == 0
+
+
+def test_get_plant_data_gives_up(request_policy):
+    session = FakeSession([FakeResponse(500, None) for _ in range(5)])
+
+    data = asyncio.run(get_plant_data(session, 1, monotonic() + 10))
+
+    assert "error" in data
+    assert session.calls == 3
+    assert get_run_stats()["giveups"] == 1
+
+
+def test_get_plant_data_not_found_is_not_retried(request_policy):
+    session = FakeSession([FakeResponse(404, {"error": "plant not found"})])
+
+    data = asyncio.run(get_plant_data(session, 1, monotonic() + 10))
+
+    assert data == {"error": "plant not found"}
+    assert session.calls == 1
+
+
+def test_get_plant_data_circuit_opens(request_policy, monkeypatch):
+    monkeypatch.setattr(extract, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    session = FakeSession([FakeResponse(500, None) for _ in range(10)])
+
+    asyncio.run(get_plant_data(session, 1, monotonic() + 10))
+    data = asyncio.run(get_plant_data(session, 2, monotonic() + 10))
+
+    assert data["error"] == "Circuit open."
+    assert session.calls == 3
+    assert get_run_stats()["circuit_rejections"] == 1
+
+
+def test_get_plant_data_response_too_large(request_policy, monkeypatch):
+    monkeypatch.setattr(extract, "MAX_RESPONSE_BYTES", 10)
+    session = FakeSession([FakeResponse(200, {"plant_id": 1, "name": "Cactus"})])
+
+    data = asyncio.run(get_plant_data(session, 1, monotonic() + 10))
+
+    assert "error" in data
+    assert session.calls == 1
@@ -0,0 +1,338 @@
+"""Testing load.py"""
+
+# pylint:skip-file
+
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyodbc", exc_type=ImportError)
+
+import load
+from load import (add_dimension_ids, select_dimension_ids, warm_id_cache, save_id_cache,
+                  load_id_cache, drop_loaded_recordings, warm_recording_watermarks,
+                  update_recording_watermarks, upload_data_to_database, get_rollup_rows,
+                  update_rollups)
+from transform import build_dataframe, convert_datatypes
+
+LAST_LOADED = pd.Timestamp("2026-01-27 16:00:00")
+
+
+@pytest.fixture(autouse=True)
+def empty_caches(monkeypatch):
+    monkeypatch.setattr(load, "ID_CACHE", {name: {} for name in load.ID_CACHE})
+    monkeypatch.setattr(load, "ID_CACHE_FINGERPRINTS", {})
+    monkeypatch.setattr(load, "LAST_RECORDING_TAKEN", {})
+
+
+def make_plants(names: list[str]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "plant_name": names,
+        "scientific_name": [f"{name} scientific" for name in names]
+    })
+
+
+def test_add_dimension_ids_existing_keys(fake_db):
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus'), ('Fern');")
+
+    data_df = add_dimension_ids(fake_db, make_plants(["Fern", "Cactus", "Fern"]), "plant_ids")
+
+    assert list(data_df["plant_id"]) == [2, 1, 2]
+    assert not any("INSERT" in statement for statement in fake_db.statements)
+
+
+def test_add_dimension_ids_new_keys(fake_db):
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus');")
+
+    data_df = add_dimension_ids(fake_db, make_plants(["Cactus", "Rose", "Rose", "Fern"]), "plant_ids")
+
+    rows = fake_db.db.execute(
+        "SELECT plant_id, common_name, scientific_name FROM beta.plant ORDER BY plant_id;").fetchall()
+
+    assert rows == [(1, "Cactus", None), (2, "Rose", "Rose scientific"), (3, "Fern", "Fern scientific")]
+    assert list(data_df["plant_id"]) == [1, 2, 2, 3]
+    assert load.ID_CACHE["plant_ids"] == {("Cactus",): 1, ("Rose",): 2, ("Fern",): 3}
+
+
+def test_add_dimension_ids_cached_keys_not_queried(fake_db):
+    load.ID_CACHE["plant_ids"][("Cactus",)] = 7
+
+    data_df = add_dimension_ids(fake_db, make_plants(["Cactus"]), "plant_ids")
+
+    assert list(data_df["plant_id"]) == [7]
+    assert fake_db.statements == []
+
+
+def test_add_dimension_ids_empty_batch(fake_db):
+    data_df = add_dimension_ids(fake_db, make_plants([]), "plant_ids")
+
+    assert data_df.empty
+    assert "plant_id" in data_df.columns
+    assert fake_db.statements == []
+
+
+def test_add_dimension_ids_composite_key(fake_db):
+    fake_db.db.execute(
+        "INSERT INTO beta.origin_location (origin_city_name, country_id) VALUES ('Town', 1);")
+    locations = pd.DataFrame({
+        "origin_city": ["Town", "Town"],
+        "country_id": [1, 2],
+        "longitude": [1.0, 2.0],
+        "latitude": [3.0, 4.0]
+    })
+
+    data_df = add_dimension_ids(fake_db, locations, "origin_location_ids")
+
+    assert list(data_df["origin_location_id"]) == [1, 2]
+
+
+def test_select_dimension_ids_batches_keys(fake_db, monkeypatch):
+    monkeypatch.setattr(load, "MAX_QUERY_PARAMETERS", 2)
+    fake_db.db.executemany("INSERT INTO beta.plant (common_name) VALUES (?);",
+                           [("A",), ("B",), ("C",)])
+
+    ids = select_dimension_ids(fake_db, "beta.plant", "plant_id", ["common_name"],
+                               [("A",), ("B",), ("C",), ("D",)])
+
+    assert ids == {("A",): 1, ("B",): 2, ("C",): 3}
+    assert len(fake_db.statements) == 2
+
+
+def count_preloads(fake_db) -> int:
+    return sum(1 for statement in fake_db.statements
+               if statement.startswith("SELECT") and "COUNT(*)" not in statement)
+
+
+def test_warm_id_cache_preloads_cold_cache(fake_db):
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus');")
+
+    warm_id_cache(fake_db)
+
+    assert load.ID_CACHE["plant_ids"] == {("Cactus",): 1}
+    assert count_preloads(fake_db) == len(load.DIMENSIONS)
+
+
+def test_warm_id_cache_keeps_unchanged_cache(fake_db):
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus');")
+    warm_id_cache(fake_db)
+    fake_db.statements.clear()
+
+    warm_id_cache(fake_db)
+
+    assert count_preloads(fake_db) == 0
+    assert load.ID_CACHE["plant_ids"] == {("Cactus",): 1}
+
+
+def test_id_cache_save_and_load(fake_db, tmp_path):
+    path = str(tmp_path / "id_cache.json")
+    fake_db.db.execute("INSERT INTO beta.country (country_name) VALUES ('Nauru');")
+    fake_db.db.execute("INSERT INTO beta.origin_location (origin_city_name, country_id) VALUES ('Town', 1);")
+    warm_id_cache(fake_db)
+
+    save_id_cache(path)
+    load.ID_CACHE["country_ids"] = {}
+    load.ID_CACHE["origin_location_ids"] = {}
+
+    assert load_id_cache(path)
+    assert load.ID_CACHE["country_ids"] == {("Nauru",): 1}
+    assert load.ID_CACHE["origin_location_ids"] == {("Town", 1): 1}
+    assert not load_id_cache(str(tmp_path / "missing.json"))
+
+
+def test_warm_id_cache_uses_matching_snapshot(fake_db, tmp_path):
+    path = str(tmp_path / "id_cache.json")
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus');")
+    warm_id_cache(fake_db)
+    save_id_cache(path)
+
+    load.ID_CACHE = {name: {} for name in load.ID_CACHE}
+    load.ID_CACHE_FINGERPRINTS.clear()
+    fake_db.statements.clear()
+
+    warm_id_cache(fake_db, path)
+
+    assert count_preloads(fake_db) == 0
+    assert load.ID_CACHE["plant_ids"] == {("Cactus",): 1}
+
+
+def test_warm_id_cache_reloads_changed_dimension(fake_db, tmp_path):
+    path = str(tmp_path / "id_cache.json")
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus');")
+    fake_db.db.execute("INSERT INTO beta.country (country_name) VALUES ('Nauru');")
+    warm_id_cache(fake_db)
+    save_id_cache(path)
+
+    fake_db.db.execute("DELETE FROM beta.plant;")
+    fake_db.db.execute("INSERT INTO beta.plant (common_name) VALUES ('Cactus');")
+    load.ID_CACHE = {name: {} for name in load.ID_CACHE}
+    fake_db.statements.clear()
+
+    warm_id_cache(fake_db, path)
+
+    assert count_preloads(fake_db) == 1
+    assert load.ID_CACHE["plant_ids"] == {("Cactus",): 2}
+    assert load.ID_CACHE["country_ids"] == {("Nauru",): 1}
+
+
+def make_recordings(plant_ids: list[int], times: list[pd.Timestamp]) -> pd.DataFrame:
+    return pd.DataFrame({"plant_id": plant_ids, "recording_taken": pd.to_datetime(times)})
+
+
+@pytest.mark.parametrize("offset, kept", [
+    (pd.Timedelta(0), False),
+    (pd.Timedelta(milliseconds=3), False),
+    (pd.Timedelta(milliseconds=5), False),
+    (pd.Timedelta(milliseconds=6), True),
+    (pd.Timedelta(seconds=-60), False)])
+def test_drop_loaded_recordings_tolerance(offset, kept):
+    load.LAST_RECORDING_TAKEN[1] = LAST_LOADED
+
+    new_df = drop_loaded_recordings(make_recordings([1], [LAST_LOADED + offset]))
+
+    assert len(new_df) == int(kept)
+
+
+def test_drop_loaded_recordings_plant_without_watermark():
+    load.LAST_RECORDING_TAKEN[1] = LAST_LOADED
+
+    new_df = drop_loaded_recordings(make_recordings([1, 2], [LAST_LOADED, LAST_LOADED]))
+
+    assert list(new_df["plant_id"]) == [2]
+
+
+def test_drop_loaded_recordings_repeats_and_missing_times():
+    new_df = drop_loaded_recordings(make_recordings(
+        [1, 1, 2], [LAST_LOADED, LAST_LOADED, None]))
+
+    assert len(new_df) == 1
+
+
+def test_warm_recording_watermarks(fake_db):
+    fake_db.db.executemany(
+        "INSERT INTO beta.recording (plant_id, recording_taken) VALUES (?, ?);",
+        [(1, "2026-01-27 15:59:00"), (1, "2026-01-27 16:00:00"), (2, "2026-01-27 15:00:00")])
+
+    warm_recording_watermarks(fake_db)
+
+    assert load.LAST_RECORDING_TAKEN == {
+        1: LAST_LOADED, 2: pd.Timestamp("2026-01-27 15:00:00")}
+
+
+def test_update_recording_watermarks_only_moves_forward():
+    load.LAST_RECORDING_TAKEN[1] = LAST_LOADED
+
+    update_recording_watermarks(make_recordings(
+        [1, 2, 2], [LAST_LOADED - pd.Timedelta(minutes=1), LAST_LOADED, LAST_LOADED + pd.Timedelta(minutes=1)]))
+
+    assert load.LAST_RECORDING_TAKEN == {1: LAST_LOADED, 2: LAST_LOADED + pd.Timedelta(minutes=1)}
+
+
+def test_watermarks_unchanged_after_failed_load(fake_db, test_plant_data, monkeypatch):
+    def failing_writer(conn, data_df):
+        raise RuntimeError("insert failed")
+
+    written = []
+
+    monkeypatch.setitem(load.RECORDING_WRITERS, "executemany", failing_writer)
+    monkeypatch.setattr(load, "create_inserted_recordings_table", lambda conn: None)
+    monkeypatch.setattr(load, "update_rollups", lambda conn: None)
+    data_df = convert_datatypes(build_dataframe(test_plant_data))
+
+    with pytest.raises(RuntimeError):
+        upload_data_to_database(fake_db, data_df)
+
+    assert load.LAST_RECORDING_TAKEN == {}
+
+    monkeypatch.setitem(load.RECORDING_WRITERS, "executemany",
+                        lambda conn, data_df: written.append(len(data_df)))
+    upload_data_to_database(fake_db, data_df)
+
+    assert written == [2]
+
+    assert load.LAST_RECORDING_TAKEN == {
+        1: pd.Timestamp("2026-01-27T16:04:39.600475"),
+        2: pd.Timestamp("2026-01-27T16:08:05.093205")}
+
+
+def make_inserted_recordings() -> pd.DataFrame:
+    return pd.DataFrame({
+        "plant_id": [1, 1, 1, 2],
+        "recording_taken": pd.to_datetime([
+            "2026-01-27 10:05", "2026-01-27 10:50", "2026-01-27 11:10", "2026-01-27 10:30"]),
+        "temperature": [10.0, 20.0, 30.0, 15.0],
+        "soil_moisture": [50.0, None, 70.0, 40.0]
+    })
+
+
+def test_get_rollup_rows_hourly():
+    rows = get_rollup_rows(make_inserted_recordings(), "h")
+
+    assert rows == [
+        (1, pd.Timestamp("2026-01-27 10:00"), 2,
+         2, 10.0, 20.0, 30.0, 500.0, 1, 50.0, 50.0, 50.0, 2500.0),
+        (1, pd.Timestamp("2026-01-27 11:00"), 1,
+         1, 30.0, 30.0, 30.0, 900.0, 1, 70.0, 70.0, 70.0, 4900.0),
+        (2, pd.Timestamp("2026-01-27 10:00"), 1,
+         1, 15.0, 15.0, 15.0, 225.0, 1, 40.0, 40.0, 40.0, 1600.0)
+    ]
+
+
+def test_get_rollup_rows_daily():
+    rows = get_rollup_rows(make_inserted_recordings(), "D")
+
+    assert rows[0] == (1, pd.Timestamp("2026-01-27"), 3,
+                       3, 10.0, 30.0, 60.0, 1400.0, 2, 50.0, 70.0, 120.0, 7400.0)
+    assert len(rows) == 2
+
+
+class FakeRollupCursor:
+    def __init__(self, inserted_rows, merges):
+        self.inserted_rows = inserted_rows
+        self.merges = merges
+        self.fast_executemany = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, query, params=()):
+        assert load.INSERTED_RECORDINGS_TABLE in query
+
+    def fetchall(self):
+        return self.inserted_rows
+
+    def executemany(self, query, rows):
+        self.merges.append((query.split()[1], rows))
+
+
+class FakeRollupConnection:
+    def __init__(self, inserted_rows):
+        self.inserted_rows = inserted_rows
+        self.merges = []
+
+    def cursor(self):
+        return FakeRollupCursor(self.inserted_rows, self.merges)
+
+
+def test_update_rollups_from_inserted_rows_only():
+    conn = FakeRollupConnection([(2, datetime(2026, 1, 27, 10, 30), 15.0, 40.0)])
+
+    update_rollups(conn)
+
+    assert conn.merges == [
+        ("beta.recording_hourly", [(2, pd.Timestamp("2026-01-27 10:00"), 1,
+                                    1, 15.0, 15.0, 15.0, 225.0, 1, 40.0, 40.0, 40.0, 1600.0)]),
+        ("beta.recording_daily", [(2, pd.Timestamp("2026-01-27"), 1,
+                                   1, 15.0, 15.0, 15.0, 225.0, 1, 40.0, 40.0, 40.0, 1600.0)])
+    ]
+
+
+def test_update_rollups_skips_when_nothing_inserted():
+    conn = FakeRollupConnection([])
+
+    update_rollups(conn)
+
+    assert conn.merges == []
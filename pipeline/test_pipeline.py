@@ -0,0 +1,105 @@
+"""Testing pipeline.py"""
+
+# pylint:skip-file
+
+import asyncio
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyodbc", exc_type=ImportError)
+
+import pipeline
+import transform
+from pipeline import load_batches, run_streaming_pipeline, warm_plant_stats
+
+PLANT_COUNT = 7
+
+
+@pytest.fixture
+def fake_stages(monkeypatch):
+    uploads = []
+
+    async def fake_extract_in_batches(batch_size):
+        records = [{"plant_id": plant_id} for plant_id in range(PLANT_COUNT)]
+        for start in range(0, len(records), batch_size):
+            await asyncio.sleep(0)
+            yield records[start:start + batch_size]
+
+    def fake_upload_data_to_database(conn, data_df):
+        uploads.append(list(data_df["plant_id"]))
+
+    monkeypatch.setattr(pipeline, "extract_in_batches", fake_extract_in_batches)
+    monkeypatch.setattr(pipeline, "transform_data", pd.DataFrame)
+    monkeypatch.setattr(pipeline, "upload_data_to_database", fake_upload_data_to_database)
+    return uploads
+
+
+def test_streaming_pipeline_loads_every_batch(fake_stages):
+    asyncio.run(run_streaming_pipeline(None, batch_size=3, queue_size=1))
+
+    assert [len(batch) for batch in fake_stages] == [3, 3, 1]
+    assert sum(fake_stages, []) == list(range(PLANT_COUNT))
+
+
+def test_load_batches_stops_at_none(fake_stages):
+    async def run():
+        load_queue = asyncio.Queue()
+        for batch in [pd.DataFrame({"plant_id": [1]}), None, pd.DataFrame({"plant_id": [2]})]:
+            load_queue.put_nowait(batch)
+
+        await load_batches(None, load_queue)
+        return load_queue.qsize()
+
+    assert asyncio.run(run()) == 1
+    assert fake_stages == [[1]]
+
+
+def test_streaming_pipeline_raises_loader_error(fake_stages, monkeypatch):
+    def failing_upload(conn, data_df):
+        raise RuntimeError("upload failed")
+
+    monkeypatch.setattr(pipeline, "upload_data_to_database", failing_upload)
+
+    with pytest.raises(ExceptionGroup) as error:
+        asyncio.run(run_streaming_pipeline(None, batch_size=1, queue_size=1))
+
+    assert error.group_contains(RuntimeError, match="upload failed")
+
+
+@pytest.fixture
+def empty_plant_stats(monkeypatch):
+    monkeypatch.delenv("PLANT_STATS_PATH", raising=False)
+    monkeypatch.setattr(transform, "PLANT_STATS_SEED", {})
+    pipeline.PLANT_STATS.clear()
+    yield
+    pipeline.PLANT_STATS.clear()
+
+
+def test_warm_plant_stats_seeds_cold_start(empty_plant_stats, monkeypatch):
+    seed = {"Cactus": {"temperature": [60, 15.0, 1.0, 0]}}
+    monkeypatch.setattr(pipeline, "get_recent_reading_stats", lambda conn, hours: seed)
+
+    warm_plant_stats(None)
+
+    assert transform.PLANT_STATS_SEED == seed
+
+
+def test_warm_plant_stats_keeps_warm_stats(empty_plant_stats, monkeypatch):
+    pipeline.PLANT_STATS[8] = {"temperature": [60, 15.0, 1.0, 0]}
+    monkeypatch.setattr(pipeline, "get_recent_reading_stats", None)
+
+    warm_plant_stats(None)
+
+    assert transform.PLANT_STATS_SEED == {}
+
+
+def test_warm_plant_stats_without_rollups(empty_plant_stats, monkeypatch):
+    def missing_rollups(conn, hours):
+        raise pipeline.pyodbc.Error("Invalid object name 'beta.recording_hourly'.")
+
+    monkeypatch.setattr(pipeline, "get_recent_reading_stats", missing_rollups)
+
+    warm_plant_stats(None)
+
+    assert transform.PLANT_STATS_SEED == {}
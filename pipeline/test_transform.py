@@ -5,7 +5,8 @@
 import pandas as pd
 from datetime import datetime
 
-from transform import build_dataframe, convert_datatypes, drop_outliers
+from transform import (build_dataframe, convert_datatypes, drop_outliers, save_plant_stats,
+                       load_plant_stats, get_stats_from_sums, OUTLIER_MAX_REJECTED)
 
 
 def test_build_dataframe_valid_columns(test_plant_data):
@@ -64,6 +65,24 @@ def test_build_dataframe_valid_df(test_plant_data):
     assert difference_df.empty
 
 
+def test_build_dataframe_optional_keys(test_plant_data):
+    test_plant_data[1]["scientific_name"] = ["Pereskia grandifolia", "Rose cactus"]
+    test_plant_data[0]["scientific_name"] = []
+
+    test_df = build_dataframe(test_plant_data)
+
+    assert pd.isna(test_df.loc[0, "scientific_name"])
+    assert test_df.loc[1, "scientific_name"] == "Pereskia grandifolia; Rose cactus"
+    assert test_df.loc[1, ["license", "license_name", "license_url", "thumbnail"]].isna().all()
+
+
+def test_build_dataframe_no_records():
+    test_df = build_dataframe([])
+
+    assert test_df.empty
+    assert "recording_taken" in test_df.columns
+
+
 def test_convert_datatypes_valid():
     test_df = pd.DataFrame(data={
         "latitude": ["-60.9363685"],
@@ -91,10 +110,8 @@ def test_convert_datatypes_valid():
         lambda val: isinstance(val, pd.Timestamp)))
     assert all(converted_df["recording_taken"].map(
         lambda val: isinstance(val, pd.Timestamp)))
-    assert all(converted_df["soil_moisture"].map(
-        lambda val: isinstance(val, float)))
-    assert all(converted_df["temperature"].map(
-        lambda val: isinstance(val, float)))
+    assert converted_df["soil_moisture"].dtype == "float64"
+    assert converted_df["temperature"].dtype == "float64"
 
     assert converted_df.loc[0, "scientific_name"] == "None"
     assert converted_df.loc[0, "license"] == 0
@@ -105,15 +122,144 @@ def test_convert_datatypes_valid():
     assert converted_df.loc[0, "phone"] == "None"
 
 
+def test_convert_datatypes_keeps_sensor_precision():
+    test_df = pd.DataFrame(data={"soil_moisture": [94.9], "temperature": ["15.48521577170627"]})
+
+    converted_df = convert_datatypes(test_df)
+
+    assert converted_df.loc[0, "soil_moisture"] == 94.9
+    assert converted_df.loc[0, "temperature"] == 15.48521577170627
+
+
+def test_convert_datatypes_invalid_values():
+    test_df = pd.DataFrame(data={
+        "last_watered": ["2026-01-27T14:47:07", "not a date"],
+        "recording_taken": ["2026-01-27T16:04:39.600475", "2026-01-27T16:05:39"],
+        "soil_moisture": [-5.0, "12.5"],
+        "temperature": ["hot", 16.0],
+        "license_name": ["Universal", None],
+        "origin_country": ["Nauru", "Nauru"],
+    })
+
+    converted_df = convert_datatypes(test_df)
+
+    assert pd.isna(converted_df.loc[1, "last_watered"])
+    assert converted_df.loc[1, "recording_taken"] == pd.Timestamp("2026-01-27T16:05:39")
+    assert pd.isna(converted_df.loc[0, "soil_moisture"])
+    assert converted_df.loc[1, "soil_moisture"] == 12.5
+    assert pd.isna(converted_df.loc[0, "temperature"])
+    assert list(converted_df["license_name"]) == ["Universal", "None"]
+    assert converted_df["license_name"].dtype == "category"
+    assert converted_df["origin_country"].dtype == "category"
+
+
 def test_drop_outliers_valid():
+    plant_stats = {}
+    readings = [1.0, 1.5, 1.0, 1.5, 1.0, 1.5, 1.0, 1.5, 1.0, 1.5, 50.0, 1.0]
+
+    kept = []
+    for reading in readings:
+        test_df = pd.DataFrame(data={
+            "plant_id": [8],
+            "soil_moisture": [reading],
+            "temperature": [reading]
+        })
+        kept.extend(drop_outliers(test_df, plant_stats)["soil_moisture"])
+
+    assert kept == readings[:10] + [1.0]
+    assert plant_stats[8]["temperature"][0] == len(readings) - 1
+
+
+def test_drop_outliers_per_plant():
+    plant_stats = {
+        1: {"soil_moisture": [100, 10.0, 1.0], "temperature": [100, 10.0, 1.0]},
+        2: {"soil_moisture": [100, 80.0, 1.0], "temperature": [100, 30.0, 1.0]}
+    }
     test_df = pd.DataFrame(data={
-        "soil_moisture": [0.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 50.0],
-        "temperature": [0.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 50.0]
+        "plant_id": [1, 2, 1, 2],
+        "soil_moisture": [10.5, 80.5, 80.0, 79.0],
+        "temperature": [10.0, 30.0, 10.0, None]
     })
 
-    no_outlier_df = drop_outliers(test_df)
+    no_outlier_df = drop_outliers(test_df, plant_stats)
 
-    difference_df = pd.concat(
-        [test_df.head(10), no_outlier_df]).drop_duplicates(keep=False)
+    assert list(no_outlier_df.index) == [0, 1]
 
-    assert difference_df.empty
+
+def test_drop_outliers_new_plant_kept():
+    test_df = pd.DataFrame(data={
+        "plant_id": [1, 2],
+        "soil_moisture": [0.0, 1000.0],
+        "temperature": [0.0, 1000.0]
+    })
+
+    assert len(drop_outliers(test_df, {})) == 2
+
+
+def test_drop_outliers_keeps_outliers_out_of_stats():
+    plant_stats = {1: {"soil_moisture": [100, 10.0, 1.0], "temperature": [100, 10.0, 1.0]}}
+    test_df = pd.DataFrame(data={"plant_id": [1], "soil_moisture": [10.0], "temperature": [90.0]})
+
+    assert drop_outliers(test_df, plant_stats).empty
+    assert plant_stats[1]["temperature"] == [100, 10.0, 1.0, 1]
+    assert plant_stats[1]["soil_moisture"][0] == 101
+
+
+def test_drop_outliers_relearns_after_repeated_outliers():
+    plant_stats = {1: {"soil_moisture": [100, 10.0, 1.0], "temperature": [100, 10.0, 1.0]}}
+
+    for _ in range(OUTLIER_MAX_REJECTED):
+        test_df = pd.DataFrame(data={"plant_id": [1], "soil_moisture": [10.0], "temperature": [40.0]})
+        drop_outliers(test_df, plant_stats)
+
+    test_df = pd.DataFrame(data={"plant_id": [1], "soil_moisture": [10.0], "temperature": [40.0]})
+
+    assert len(drop_outliers(test_df, plant_stats)) == 1
+    assert plant_stats[1]["temperature"][:2] == [1, 40.0]
+
+
+def test_drop_outliers_cold_plants_use_batch_stats():
+    test_df = pd.DataFrame(data={
+        "plant_id": list(range(10)),
+        "soil_moisture": [50.0] * 9 + [500.0],
+        "temperature": [15.0] * 10
+    })
+
+    no_outlier_df = drop_outliers(test_df, {})
+
+    assert list(no_outlier_df["plant_id"]) == list(range(9))
+
+
+def test_drop_outliers_seeded_plants_warm():
+    seed_stats = {"Cactus": {"soil_moisture": get_stats_from_sums(100, 1000.0, 10100.0),
+                             "temperature": get_stats_from_sums(100, 1500.0, 22600.0)}}
+    plant_stats = {}
+    test_df = pd.DataFrame(data={
+        "plant_id": [9, 9],
+        "plant_name": ["Cactus", "Cactus"],
+        "soil_moisture": [10.5, 30.0],
+        "temperature": [15.0, 15.0]
+    })
+
+    no_outlier_df = drop_outliers(test_df, plant_stats, seed_stats)
+
+    assert list(no_outlier_df["soil_moisture"]) == [10.5]
+    assert plant_stats[9]["soil_moisture"][0] == 101
+    assert seed_stats["Cactus"]["soil_moisture"][0] == 100
+
+
+def test_get_stats_from_sums():
+    assert get_stats_from_sums(4, 8.0, 20.0) == [4, 2.0, 1.0, 0]
+    assert get_stats_from_sums(0, 0.0, 0.0) == [0, 0.0, 0.0, 0]
+
+
+def test_plant_stats_save_and_load(tmp_path):
+    plant_stats = {8: {"soil_moisture": [3, 95.0, 0.5], "temperature": [3, 16.0, 0.2]}}
+    path = str(tmp_path / "plant_stats.json")
+
+    save_plant_stats(path, plant_stats)
+    loaded_stats = {}
+
+    assert load_plant_stats(path, loaded_stats)
+    assert loaded_stats == plant_stats
+    assert not load_plant_stats(str(tmp_path / "missing.json"), {})
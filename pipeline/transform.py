@@ -1,93 +1,315 @@
 """Script for cleaning and modifying the extracted data."""
 
+import json
 from time import perf_counter
-from logging import getLogger, basicConfig, INFO
+from logging import getLogger, basicConfig, INFO, DEBUG
+from os import environ as ENV
 
 from extract import extract
+import numpy as np
 import pandas as pd
 
 logger = getLogger(__name__)
 
+# Dataframe columns, the (section, key) each is read from in an API record and the column dtype.
+# A section of None means the key is at the top level of the record.
+# Text columns are kept as object dtype, which skips pandas' string inference.
+RECORD_SCHEMA = {
+    "plant_id": (None, "plant_id", None),
+    "plant_name": (None, "name", "object"),
+    "scientific_name": (None, "scientific_name", "object"),
+
+    "botanist_name": ("botanist", "name", "object"),
+    "email": ("botanist", "email", "object"),
+    "phone": ("botanist", "phone", "object"),
+
+    "origin_city": ("origin_location", "city", "object"),
+    "origin_country": ("origin_location", "country", "object"),
+    "latitude": ("origin_location", "latitude", "object"),
+    "longitude": ("origin_location", "longitude", "object"),
+
+    "license": ("images", "license", None),
+    "license_name": ("images", "license_name", "object"),
+    "license_url": ("images", "license_url", "object"),
+    "thumbnail": ("images", "thumbnail", "object"),
+
+    "last_watered": (None, "last_watered", "object"),
+    "recording_taken": (None, "recording_taken", "object"),
+    "soil_moisture": (None, "soil_moisture", None),
+    "temperature": (None, "temperature", None),
+}
+
+DATETIME_FORMAT = "ISO8601"
+
+# How each column is converted: its dtype, the value nulls are replaced with ("null")
+# and the smallest valid value ("min"). Invalid values become null.
+# Sensor readings stay float64, as beta.recording stores them as FLOAT: a float32 value such as
+# 94.9 would be written as 94.9000015258789.
+COLUMN_SCHEMA = {
+    "last_watered": {"dtype": "datetime"},
+    "recording_taken": {"dtype": "datetime"},
+    "latitude": {"dtype": "float64"},
+    "longitude": {"dtype": "float64"},
+    "soil_moisture": {"dtype": "float64", "min": 0},
+    "temperature": {"dtype": "float64"},
+    "scientific_name": {"dtype": "object", "null": "None"},
+    "license": {"dtype": "int64", "null": 0},
+    "license_url": {"dtype": "object", "null": "None"},
+    "license_name": {"dtype": "category", "null": "None"},
+    "thumbnail": {"dtype": "object", "null": "None"},
+    "email": {"dtype": "object", "null": "None"},
+    "phone": {"dtype": "object", "null": "None"},
+    "origin_country": {"dtype": "category"},
+}
+
+OUTLIER_COLUMNS = ["soil_moisture", "temperature"]
+OUTLIER_STD_LIMIT = float(ENV.get("OUTLIER_STD_LIMIT", 2))
+# Readings a plant needs before any of its readings can count as outliers.
+OUTLIER_MIN_READINGS = 10
+# Smallest std used when scoring, so a plant with very steady readings is not flagged for tiny changes.
+OUTLIER_MIN_STD = 1.0
+# Weight of each new reading in the running mean and variance.
+OUTLIER_SMOOTHING = 0.05
+# Outliers in a row after which a plant's stats are started again, so a genuine change in its
+# readings, such as after watering, is learnt rather than rejected forever.
+OUTLIER_MAX_REJECTED = 5
+
+# Running [count, mean, variance, outliers in a row] of each outlier column per plant id.
+# Kept between warm Lambda invocations and optionally saved to a local file.
+PLANT_STATS = {}
+
+# Stats of each plant name from its recent readings in the database, which a plant id
+# without stats of its own starts from after a cold start.
+PLANT_STATS_SEED = {}
+
+
+def join_scientific_name(scientific_name: list[str] | None) -> str | None:
+    """Returns the scientific names of a plant joined into a single string, or None if there are none."""
+
+    return "; ".join(scientific_name) if scientific_name else None
+
 
 def build_dataframe(records: list[dict]) -> pd.DataFrame:
-    """Create pandas dataframe from API"""
-    rows = []
+    """Create pandas dataframe from API records, building each column directly from the records."""
+
+    sections = {
+        section: [r.get(section) or {} for r in records]
+        for section in ("botanist", "origin_location", "images")
+    }
+    sections[None] = records
+
+    columns = {
+        column: [item.get(key) for item in sections[section]]
+        for column, (section, key, _) in RECORD_SCHEMA.items()
+    }
+    columns["scientific_name"] = [join_scientific_name(name)
+                                  for name in columns["scientific_name"]]
+
+    return pd.DataFrame({
+        column: pd.Series(values, dtype=RECORD_SCHEMA[column][2])
+        for column, values in columns.items()
+    })
+
+
+def get_memory_per_row(df: pd.DataFrame) -> float:
+    """Returns the memory used by the dataframe in bytes per row."""
 
-    for r in records:
-        images = r.get("images") or {}
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
 
-        rows.append({
-            "plant_id": r["plant_id"],
-            "plant_name": r["name"],
-            "scientific_name": "; ".join(r["scientific_name"])
-            if "scientific_name" in r and r["scientific_name"]
-            else None,
 
-            "botanist_name": r["botanist"]["name"],
-            "email": r["botanist"]["email"],
-            "phone": r["botanist"]["phone"],
+def coerce_column(column: pd.Series, rules: dict) -> pd.Series:
+    """Returns the column converted to the dtype given by its schema rules,
+    with invalid values removed and nulls filled."""
 
-            "origin_city": r["origin_location"]["city"],
-            "origin_country": r["origin_location"]["country"],
-            "latitude": r["origin_location"]["latitude"],
-            "longitude": r["origin_location"]["longitude"],
+    dtype = rules["dtype"]
 
-            "license": images.get("license"),
-            "license_name": images.get("license_name"),
-            "license_url": images.get("license_url"),
-            "thumbnail": images.get("thumbnail"),
+    if dtype == "datetime":
+        column = pd.to_datetime(
+            column, format=DATETIME_FORMAT, errors="coerce")
+    elif dtype not in ("object", "category"):
+        column = pd.to_numeric(column, errors="coerce")
 
-            "last_watered": r["last_watered"],
-            "recording_taken": r["recording_taken"],
-            "soil_moisture": r["soil_moisture"],
-            "temperature": r["temperature"],
-        })
+    if "min" in rules:
+        column = column.where(column.isna() | (column >= rules["min"]))
 
-    return pd.DataFrame(rows)
+    if "null" in rules:
+        column = column.where(column.notna(), rules["null"])
+
+    if dtype != "datetime":
+        column = column.astype(dtype)
+
+    return column
 
 
 def convert_datatypes(df: pd.DataFrame) -> pd.DataFrame:
-    """Convert columns to correct pandas datatypes"""
-    df["last_watered"] = pd.to_datetime(df["last_watered"], errors="coerce")
-    df["recording_taken"] = pd.to_datetime(
-        df["recording_taken"], errors="coerce")
-    df["latitude"] = pd.to_numeric(df["latitude"], errors="coerce")
-    df["longitude"] = pd.to_numeric(df["longitude"], errors="coerce")
-    df["soil_moisture"] = pd.to_numeric(df["soil_moisture"], errors="coerce")
-    df.loc[df["soil_moisture"] < 0, "soil_moisture"] = pd.NA
-    df["temperature"] = pd.to_numeric(df["temperature"], errors="coerce")
-    df["scientific_name"] = df["scientific_name"].where(
-        df["scientific_name"].notna(), "None")
-    df["license"] = df["license"].where(
-        df["license"].notna(), 0)
-    df["license_url"] = df["license_url"].where(
-        df["license_url"].notna(), "None")
-    df["license_name"] = df["license_name"].where(
-        df["license_name"].notna(), "None")
-    df["thumbnail"] = df["thumbnail"].where(
-        df["thumbnail"].notna(), "None")
-    df["email"] = df["email"].where(
-        df["email"].notna(), "None")
-    df["phone"] = df["phone"].where(
-        df["phone"].notna(), "None")
+    """Convert columns to correct pandas datatypes in a single pass driven by COLUMN_SCHEMA.
+    The memory per row is only measured when debug logging is on, as it walks every value."""
+
+    measure_memory = logger.isEnabledFor(DEBUG)
+
+    if measure_memory:
+        memory_before = get_memory_per_row(df)
+
+    for column, rules in COLUMN_SCHEMA.items():
+        if column in df.columns:
+            df[column] = coerce_column(df[column], rules)
+
+    if measure_memory:
+        logger.debug(
+            f"Memory per row: {memory_before:.0f} bytes before conversion, {get_memory_per_row(df):.0f} bytes after.")
 
     return df
 
 
-def drop_outliers(df: pd.DataFrame) -> pd.DataFrame:
-    """Drop rows where soil moisture or temperature is + or - 2 std from mean"""
-    sm_mean = df["soil_moisture"].mean()
-    sm_std = df["soil_moisture"].std()
+def get_stats_from_sums(count: int, total: float, total_sq: float) -> list[float]:
+    """Returns [count, mean, variance, outliers in a row] stats of readings
+    from their count, sum and sum of squares."""
+
+    if not count:
+        return [0, 0.0, 0.0, 0]
+
+    mean = total / count
+
+    return [count, mean, max(total_sq / count - mean ** 2, 0.0), 0]
+
+
+def seed_plant_stats(stats_by_name: dict, seed_stats: dict | None = None) -> None:
+    """Sets the stats that plants without stats of their own start from, by plant name."""
+
+    if seed_stats is None:
+        seed_stats = PLANT_STATS_SEED
+
+    seed_stats.update(stats_by_name)
+
+
+def get_column_stats(plant_stats: dict, plant_id: int, column: str) -> list[float]:
+    """Returns the running stats of a plant's column, created empty if it has none."""
+
+    stats = plant_stats.setdefault(plant_id, {}).setdefault(column, [0, 0.0, 0.0, 0])
+
+    if len(stats) < 4:
+        stats.append(0)
+
+    return stats
+
+
+def update_reading_stats(stats: list[float], value: float) -> None:
+    """Updates running [count, mean, variance, outliers in a row] stats in place with a new
+    reading, using exponentially weighted updates so the stats follow gradual changes."""
+
+    stats[3] = 0
+
+    if stats[0] == 0:
+        stats[1] = value
+        stats[2] = 0.0
+    else:
+        difference = value - stats[1]
+        increment = OUTLIER_SMOOTHING * difference
+        stats[1] += increment
+        stats[2] = (1 - OUTLIER_SMOOTHING) * \
+            (stats[2] + difference * increment)
+
+    stats[0] += 1
+
+
+def reject_reading(stats: list[float]) -> None:
+    """Counts an outlier against running stats in place, without adding it to them.
+    After OUTLIER_MAX_REJECTED outliers in a row the stats are started again."""
+
+    stats[3] += 1
+
+    if stats[3] >= OUTLIER_MAX_REJECTED:
+        stats[:] = [0, 0.0, 0.0, 0]
+
+
+def adopt_seed_stats(df: pd.DataFrame, plant_stats: dict, seed_stats: dict) -> None:
+    """Gives each plant id in the dataframe without stats of its own a copy of the seed stats
+    of its plant name, if there are any."""
+
+    if not seed_stats or "plant_name" not in df.columns:
+        return
+
+    for plant_id, plant_name in zip(df["plant_id"].tolist(), df["plant_name"].tolist()):
+        if plant_id not in plant_stats and plant_name in seed_stats:
+            plant_stats[plant_id] = {column: list(stats)
+                                     for column, stats in seed_stats[plant_name].items()}
+
+
+def drop_outliers(df: pd.DataFrame, plant_stats: dict | None = None,
+                  seed_stats: dict | None = None) -> pd.DataFrame:
+    """Drop rows where soil moisture or temperature is more than OUTLIER_STD_LIMIT std from that
+    plant's running mean, or is missing. Each reading is scored against the plant's stats from
+    previous readings, then added to them unless it is an outlier. Plants with fewer than
+    OUTLIER_MIN_READINGS readings are scored against the mean and std of the whole batch instead.
+    Uses the module's PLANT_STATS and PLANT_STATS_SEED unless others are given."""
+
+    if plant_stats is None:
+        plant_stats = PLANT_STATS
+
+    if seed_stats is None:
+        seed_stats = PLANT_STATS_SEED
+
+    adopt_seed_stats(df, plant_stats, seed_stats)
+
+    keep = np.ones(len(df), dtype=bool)
+    plant_ids = df["plant_id"].tolist()
+
+    for column in OUTLIER_COLUMNS:
+        values = df[column].to_numpy(dtype="float64", na_value=np.nan)
+        stats = np.array([plant_stats.get(plant_id, {}).get(column, [0, 0.0, 0.0])[:3]
+                          for plant_id in plant_ids], dtype="float64").reshape(-1, 3)
+
+        is_warm = stats[:, 0] >= OUTLIER_MIN_READINGS
+        std = np.maximum(np.sqrt(stats[:, 2]), OUTLIER_MIN_STD)
+        is_outlier = is_warm & (np.abs(values - stats[:, 1]) > OUTLIER_STD_LIMIT * std)
+
+        if np.count_nonzero(~np.isnan(values)) > 1:
+            batch_mean = np.nanmean(values)
+            batch_std = np.nanstd(values, ddof=1)
+            is_outlier |= ~is_warm & (np.abs(values - batch_mean) > OUTLIER_STD_LIMIT * batch_std)
+
+        keep &= ~np.isnan(values) & ~is_outlier
+
+        for plant_id, value, outlier in zip(plant_ids, values, is_outlier):
+            if np.isnan(value):
+                continue
+
+            stats = get_column_stats(plant_stats, plant_id, column)
+
+            if outlier:
+                reject_reading(stats)
+            else:
+                update_reading_stats(stats, float(value))
+
+    return df[keep]
+
+
+def save_plant_stats(path: str, plant_stats: dict | None = None) -> None:
+    """Writes the per-plant reading stats to a local file."""
+
+    if plant_stats is None:
+        plant_stats = PLANT_STATS
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(plant_stats, f, separators=(",", ":"))
+
+
+def load_plant_stats(path: str, plant_stats: dict | None = None) -> bool:
+    """Fills the per-plant reading stats from a local file.
+    Returns False if there is no readable file."""
+
+    if plant_stats is None:
+        plant_stats = PLANT_STATS
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved_stats = json.load(f)
+    except (OSError, ValueError):
+        return False
 
-    temp_mean = df["temperature"].mean()
-    temp_std = df["temperature"].std()
+    plant_stats.update({int(plant_id): stats for plant_id, stats in saved_stats.items()})
 
-    return df[
-        df["soil_moisture"].between(sm_mean - 2 * sm_std, sm_mean + 2 * sm_std) &
-        df["temperature"].between(
-            temp_mean - 2 * temp_std, temp_mean + 2 * temp_std
-        )
-    ]
+    return True
 
 
 def transform_data(records: list[dict]) -> pd.DataFrame: